@@ -0,0 +1,48 @@
+"""
+Benchmark diff - compares two JSON reports from `benchmarks.run`.
+
+Usage (from backend/):
+    python -m benchmarks.compare baseline.json candidate.json
+"""
+import json
+import sys
+from typing import Any, Dict
+
+METRICS = [
+    ("throughput_rps", lambda r: r["throughput_rps"]),
+    ("p50_ms", lambda r: r["latency_ms"]["p50"]),
+    ("p95_ms", lambda r: r["latency_ms"]["p95"]),
+    ("p99_ms", lambda r: r["latency_ms"]["p99"]),
+    ("db_per_req", lambda r: r["db_queries_per_request"]),
+    ("llm_per_req", lambda r: r["llm_calls_per_request"]),
+]
+
+
+def _load(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _change(old: float, new: float) -> str:
+    if not old:
+        return "n/a"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def main(baseline_path: str, candidate_path: str) -> None:
+    baseline, candidate = _load(baseline_path), _load(candidate_path)
+    print(f"{'endpoint':<16}{'metric':<16}{'baseline':>12}{'candidate':>12}{'change':>10}")
+    for name in sorted(set(baseline["endpoints"]) | set(candidate["endpoints"])):
+        old, new = baseline["endpoints"].get(name), candidate["endpoints"].get(name)
+        if old is None or new is None:
+            print(f"{name:<16}{'(only in ' + ('candidate' if old is None else 'baseline') + ')'}")
+            continue
+        for metric, read in METRICS:
+            a, b = read(old), read(new)
+            print(f"{name:<16}{metric:<16}{a:>12}{b:>12}{_change(a, b):>10}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m benchmarks.compare BASELINE.json CANDIDATE.json")
+    main(sys.argv[1], sys.argv[2])
@@ -0,0 +1,163 @@
+"""Benchmark stand-ins - a fake Azure OpenAI client and synthetic call transcripts."""
+import asyncio
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+WORKED = [
+    "Acknowledged the budget concern before showing comparable sales",
+    "Offered two concrete viewing slots instead of an open question",
+    "Mirrored the customer's timeline and reduced pressure",
+    "Asked about must-have features before pitching listings",
+    "Shared a recent sale on the same street as social proof",
+    "Suggested a short 20-minute viewing to lower commitment",
+]
+FAILED = [
+    "Pushed for a booking before qualifying the budget",
+    "Ignored the customer's timing objection",
+    "Talked over the customer during the introduction",
+    "Listed too many properties at once",
+    "Did not offer an alternative when the first slot was declined",
+]
+OBJECTIONS = ["price", "timing", "not_interested", "location", "financing"]
+CUSTOMER_LINES = [
+    "I'm not sure the budget works for me.",
+    "We're only starting to look, maybe in a few months.",
+    "Which neighbourhood are these in?",
+    "Could you send me some photos first?",
+    "Saturday morning could work actually.",
+    "I already have an agent, thanks.",
+    "What are the schools like around there?",
+]
+
+
+def synthetic_transcript(rng: random.Random, turns: int = 6) -> str:
+    """A plausible agent/customer transcript of `turns` exchanges."""
+    lines = ["Agent: Hi! This is Sarah calling from Premier Realty. How are you doing today?"]
+    for _ in range(turns):
+        lines.append(f"Customer: {rng.choice(CUSTOMER_LINES)}")
+        lines.append(f"Agent: {rng.choice(WORKED + FAILED)}.")
+    return " ".join(lines)
+
+
+def _strategy(rng: random.Random) -> Dict[str, Any]:
+    return {
+        "description": "Benchmark strategy",
+        "opening": {"greeting": "Hi! This is Sarah from Premier Realty.", "intro": rng.choice(WORKED)},
+        "qualification": {"questions": ["What type of property are you looking for?", "What is your timeline?"]},
+        "objection_handling": {o: f"Handle {o} with empathy." for o in rng.sample(OBJECTIONS, 3)},
+        "call_to_action": {"main_cta": "Would Thursday or Saturday work better?", "alternative_cta": "I can send photos."},
+        "tone": {"style": "friendly", "pace": "moderate", "empathy": "high"},
+    }
+
+
+def fake_completion(messages: List[Dict[str, Any]], rng: random.Random) -> Dict[str, Any]:
+    """Schema-valid JSON for whichever prompt the app sent, keyed on its system message."""
+    system = str(messages[0].get("content", "")) if messages else ""
+    if "call analyst" in system:
+        return {
+            "what_worked": rng.choice(WORKED),
+            "what_failed": rng.choice(FAILED),
+            "key_phrase": rng.choice(CUSTOMER_LINES),
+            "objection_types": rng.sample(OBJECTIONS, rng.randint(0, 2)),
+            "engagement_level": rng.choice(["high", "medium", "low"]),
+            "comparison_to_successful": "Similar opening to booked calls.",
+            "comparison_to_failed": "Avoided the early hard close.",
+            "new_insights": rng.choice(WORKED),
+            "confirms_patterns": [],
+            "contradicts_patterns": [],
+            "conversion_factors": {"positive": [rng.choice(WORKED)], "negative": [rng.choice(FAILED)]},
+        }
+    if "optimize sales call strategy" in system:
+        return {"changes_made": ["Tightened call to action"], "reasoning": "Benchmark", "new_strategy": _strategy(rng)}
+    if "optimize sales strategies" in system:
+        return {**_strategy(rng), "changes_made": ["Reworked objection handling"], "reasoning": "Benchmark"}
+    if "optimize sales prompts" in system:
+        return {"suggestions": [{"area": "opening", "suggestion": rng.choice(WORKED), "expected_impact": "medium"}]}
+    return {
+        "key_insights": [rng.choice(WORKED) for _ in range(3)],
+        "success_formula": rng.choice(WORKED),
+        "failure_patterns": [rng.choice(FAILED)],
+        "recommendations": ["Offer concrete slots"],
+        "confidence_level": "medium",
+    }
+
+
+class FakeLLM:
+    """
+    Drop-in for the Azure OpenAI clients' `chat.completions.create`, with configurable
+    latency (mean +/- jitter, seconds). Counts calls and approximate tokens.
+    """
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, seed: int = 7) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def _delay(self) -> float:
+        with self._lock:
+            return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def _respond(self, params: Dict[str, Any]) -> SimpleNamespace:
+        messages = params.get("messages", [])
+        with self._lock:
+            content = json.dumps(fake_completion(messages, self._rng))
+            prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+            completion_tokens = len(content.split())
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens,
+            ),
+        )
+
+    def sync_client(self) -> SimpleNamespace:
+        def create(**params: Any) -> SimpleNamespace:
+            time.sleep(self._delay())
+            return self._respond(params)
+
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)), close=lambda: None)
+
+    def async_client(self) -> SimpleNamespace:
+        async def create(**params: Any) -> SimpleNamespace:
+            await asyncio.sleep(self._delay())
+            return self._respond(params)
+
+        async def close() -> None:
+            return None
+
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)), close=close)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+            }
+
+
+def vapi_call_payload(rng: random.Random, call_id: Optional[str] = None) -> Dict[str, Any]:
+    """A `call-completed` webhook body with a synthetic transcript."""
+    return {
+        "call": {
+            "id": call_id or f"bench-{rng.getrandbits(64):016x}",
+            "startedAt": "2026-02-14T10:00:00Z",
+            "endedAt": "2026-02-14T10:03:00Z",
+            "transcript": synthetic_transcript(rng),
+            "status": "ended",
+            "type": "webCall",
+        }
+    }
@@ -0,0 +1,316 @@
+"""
+Benchmark runner - boots the FastAPI app on the local SQLite backend with a fake LLM,
+seeds call history and drives the main endpoints, reporting latency percentiles,
+throughput, DB-query and LLM-call counts per endpoint.
+
+Usage (from backend/):
+    python -m benchmarks.run --history 10000 --requests 500 --concurrency 32 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = [
+    "webhook", "analysis_queue", "analyze", "prompt_current", "stats_overall", "calls_recent", "stats_versions", "synthesis"
+]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of `samples` (0 for an empty list)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    ms = [s * 1000.0 for s in samples]
+    return {
+        "p50": round(percentile(ms, 50), 3),
+        "p95": round(percentile(ms, 95), 3),
+        "p99": round(percentile(ms, 99), 3),
+        "mean": round(sum(ms) / len(ms), 3) if ms else 0.0,
+        "max": round(max(ms), 3) if ms else 0.0,
+    }
+
+
+def configure_environment(args: argparse.Namespace, workdir: str) -> None:
+    """Point the app at local stand-ins before `main` is imported (it reads env at import)."""
+    os.environ.update(
+        STORAGE_BACKEND="sqlite",
+        SQLITE_DB_PATH=args.db or os.path.join(workdir, "bench.db"),
+        ANALYSIS_QUEUE_PATH=os.path.join(workdir, "analysis_queue.db"),
+        ANALYSIS_CONCURRENCY=str(args.workers),
+        LLM_CACHE_ENABLED="true" if args.llm_cache else "false",
+        LLM_CACHE_PATH=os.path.join(workdir, "llm_cache.db"),
+        PATTERN_EMBEDDINGS_PATH=os.path.join(workdir, "pattern_embeddings"),
+        SIMILAR_CALLS_PATH=os.path.join(workdir, "call_embeddings"),
+        AZURE_OPENAI_API_KEY="benchmark",
+        AZURE_OPENAI_ENDPOINT="https://benchmark.invalid",
+        # Empty values win over backend/.env, so strategy mutations never reach Vapi
+        VAPI_API_KEY="",
+        serversideAPIVapi="",
+        VAPI_ASSISTANT_ID="",
+        assistant_id="",
+    )
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+
+
+class Phase:
+    """Collects latencies and the DB/LLM counter deltas for one benchmarked endpoint."""
+
+    def __init__(self, name: str, storage: Any, llm: Any) -> None:
+        self.name = name
+        self.storage = storage
+        self.llm = llm
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.status_codes: Counter = Counter()
+        self.response_bytes = 0
+
+    def __enter__(self) -> "Phase":
+        self._queries = Counter(self.storage.query_counts)
+        self._llm = self.llm.snapshot()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.wall = time.perf_counter() - self._started
+        self.queries = Counter(self.storage.query_counts) - self._queries
+        llm = self.llm.snapshot()
+        self.llm_delta = {k: llm[k] - self._llm[k] for k in llm}
+
+    def report(self, concurrency: int) -> Dict[str, Any]:
+        n = len(self.latencies)
+        db_queries = sum(self.queries.values())
+        return {
+            "requests": n,
+            "errors": self.errors,
+            "status_codes": {str(k): v for k, v in sorted(self.status_codes.items())},
+            "concurrency": concurrency,
+            "wall_seconds": round(self.wall, 3),
+            "throughput_rps": round(n / self.wall, 2) if self.wall else 0.0,
+            "latency_ms": latency_summary(self.latencies),
+            "db_queries": db_queries,
+            "db_queries_per_request": round(db_queries / n, 2) if n else 0.0,
+            "db_queries_by_table": dict(sorted(self.queries.items())),
+            "response_bytes_per_request": round(self.response_bytes / n) if n else 0,
+            "llm_calls": self.llm_delta["calls"],
+            "llm_calls_per_request": round(self.llm_delta["calls"] / n, 2) if n else 0.0,
+            "llm_tokens": self.llm_delta["prompt_tokens"] + self.llm_delta["completion_tokens"],
+        }
+
+
+async def drive(phase: Phase, count: int, concurrency: int, send: Callable[[int], Awaitable[Any]]) -> None:
+    """Issue `count` requests with at most `concurrency` in flight, recording latency per request."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await send(i)
+                phase.status_codes[response.status_code] += 1
+                phase.response_bytes += len(response.content)
+                if response.status_code >= 400:
+                    phase.errors += 1
+            except Exception:
+                phase.errors += 1
+                phase.status_codes["exception"] += 1
+            phase.latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(i) for i in range(count)))
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+
+    import main
+    from benchmarks.fakes import FakeLLM, vapi_call_payload
+    from benchmarks.seed import seed_history
+    from services.pagination import encode_cursor
+
+    llm = FakeLLM(latency=args.llm_latency / 1000.0, jitter=args.llm_jitter / 1000.0, seed=args.seed)
+    main.openai_client = llm.sync_client()
+    main.async_openai_client = llm.async_client()
+    storage = main.supabase
+    rng = random.Random(args.seed)
+
+    seed_started = time.perf_counter()
+    seeded = seed_history(storage, args.history, seed=args.seed)
+    seed_seconds = time.perf_counter() - seed_started
+    call_ids = [row[0] for row in storage.conn.execute("SELECT id FROM calls ORDER BY created_at DESC LIMIT 1000")]
+
+    selected = [e for e in ENDPOINTS if e in args.endpoints]
+    results: Dict[str, Any] = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app):
+        # Measure steady state, not the startup warm-up of the similar call index
+        if main.similar_calls_warmup is not None:
+            await main.similar_calls_warmup
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=300) as client:
+            # Webhook intake is measured with the workers paused, then the backlog is drained
+            await main.analysis_queue.stop()
+            if "webhook" in selected:
+                with Phase("webhook", storage, llm) as phase:
+                    await drive(
+                        phase,
+                        args.requests,
+                        args.concurrency,
+                        lambda i: client.post("/webhook/call-completed", json=vapi_call_payload(rng)),
+                    )
+                results["webhook"] = phase.report(args.concurrency)
+
+            job_latencies: List[float] = []
+            handler = main.analysis_queue.handler
+
+            async def timed_handler(**payload: Any) -> None:
+                started = time.perf_counter()
+                try:
+                    await handler(**payload)
+                finally:
+                    job_latencies.append(time.perf_counter() - started)
+
+            main.analysis_queue.handler = timed_handler
+            with Phase("analysis_queue", storage, llm) as phase:
+                await main.analysis_queue.start()
+                while True:
+                    stats = main.analysis_queue.stats()
+                    if stats["pending"] == 0 and stats["running"] == 0 and stats["in_flight"] == 0:
+                        break
+                    await asyncio.sleep(0.05)
+            phase.latencies = job_latencies
+            phase.errors = main.analysis_queue.stats()["dead"]
+            if "analysis_queue" in selected:
+                results["analysis_queue"] = phase.report(args.workers)
+
+            if "analyze" in selected:
+                with Phase("analyze", storage, llm) as phase:
+                    await drive(
+                        phase,
+                        args.requests,
+                        args.concurrency,
+                        lambda i: client.post(
+                            "/api/analyze",
+                            json={
+                                "call_id": call_ids[i % len(call_ids)] if call_ids else "none",
+                                "transcript": vapi_call_payload(rng)["call"]["transcript"],
+                                "outcome": rng.choice(["booked", "not_booked"]),
+                            },
+                        ),
+                    )
+                results["analyze"] = phase.report(args.concurrency)
+
+            if "prompt_current" in selected:
+                with Phase("prompt_current", storage, llm) as phase:
+                    await drive(phase, args.requests, args.concurrency, lambda i: client.get("/api/prompt/current"))
+                results["prompt_current"] = phase.report(args.concurrency)
+
+            if "stats_overall" in selected:
+                with Phase("stats_overall", storage, llm) as phase:
+                    await drive(phase, args.requests, args.concurrency, lambda i: client.get("/api/stats/overall"))
+                results["stats_overall"] = phase.report(args.concurrency)
+
+            if "calls_recent" in selected:
+                # Alternate the dashboard's first page with one near the end of the history
+                oldest = storage.conn.execute(
+                    "SELECT created_at, id FROM calls ORDER BY created_at, id LIMIT 1 OFFSET 20"
+                ).fetchone()
+                deep = encode_cursor({"created_at": oldest[0], "id": oldest[1]}) if oldest else None
+                with Phase("calls_recent", storage, llm) as phase:
+                    await drive(
+                        phase,
+                        args.requests,
+                        args.concurrency,
+                        lambda i: client.get(
+                            "/api/calls/recent", params={"limit": 20, **({"cursor": deep} if i % 2 and deep else {})}
+                        ),
+                    )
+                results["calls_recent"] = phase.report(args.concurrency)
+
+            if "stats_versions" in selected:
+                with Phase("stats_versions", storage, llm) as phase:
+                    await drive(phase, args.requests, args.concurrency, lambda i: client.get("/api/stats/versions"))
+                results["stats_versions"] = phase.report(args.concurrency)
+
+            if "synthesis" in selected:
+                count = max(1, args.requests // 10)
+                with Phase("synthesis", storage, llm) as phase:
+                    await drive(phase, count, args.concurrency, lambda i: client.get("/api/learnings/synthesis"))
+                results["synthesis"] = phase.report(args.concurrency)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "history_calls": args.history,
+            "seed_seconds": round(seed_seconds, 3),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "analysis_workers": args.workers,
+            "llm_latency_ms": args.llm_latency,
+            "llm_jitter_ms": args.llm_jitter,
+            "llm_cache": args.llm_cache,
+            "seed": args.seed,
+            "seeded": seeded,
+        },
+        "endpoints": results,
+    }
+
+
+def print_table(report: Dict[str, Any]) -> None:
+    print(
+        f"{'endpoint':<16}{'reqs':>7}{'err':>5}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        f"{'db/req':>9}{'llm/req':>9}"
+    )
+    for name, r in report["endpoints"].items():
+        lat = r["latency_ms"]
+        print(
+            f"{name:<16}{r['requests']:>7}{r['errors']:>5}{r['throughput_rps']:>10}{lat['p50']:>10}"
+            f"{lat['p95']:>10}{lat['p99']:>10}{r['db_queries_per_request']:>9}{r['llm_calls_per_request']:>9}"
+        )
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Ruya end-to-end benchmark")
+    parser.add_argument("--history", type=int, default=1000, help="historical calls to seed")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint (synthesis runs a tenth)")
+    parser.add_argument("--concurrency", type=int, default=16, help="in-flight requests per endpoint")
+    parser.add_argument("--workers", type=int, default=4, help="analysis queue workers")
+    parser.add_argument("--llm-latency", type=float, default=50.0, help="fake LLM latency in ms")
+    parser.add_argument("--llm-jitter", type=float, default=10.0, help="fake LLM latency jitter in ms")
+    parser.add_argument("--llm-cache", action="store_true", help="enable the completion cache")
+    parser.add_argument("--endpoints", nargs="+", default=ENDPOINTS, choices=ENDPOINTS)
+    parser.add_argument("--db", help="SQLite file to use instead of a fresh temporary one")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report here")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="ruya-bench-") as workdir:
+        configure_environment(args, workdir)
+        report = asyncio.run(run(args))
+    print_table(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"📄 Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main_cli()
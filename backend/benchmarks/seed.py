@@ -0,0 +1,108 @@
+"""Benchmark fixtures - bulk-loads synthetic call history into the local SQLite backend."""
+import json
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from services.storage import LOCAL_SCHEMA, REBUILD_STATS_SQL, LocalStorageClient
+
+from .fakes import FAILED, OBJECTIONS, WORKED, synthetic_transcript
+
+BATCH_SIZE = 5000
+
+
+def _timestamp(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+
+
+def seed_history(client: LocalStorageClient, calls: int, seed: int = 7, booked_rate: float = 0.3, days: int = 60) -> Dict[str, Any]:
+    """
+    Insert `calls` decided calls (each with a learning) against the active version, spread
+    over the last `days`, plus a set of learning patterns. Rows go straight to SQLite with the
+    per-row stats triggers dropped (like a COPY with triggers disabled); version and global
+    totals are recomputed once at the end and the triggers restored.
+    """
+    rng = random.Random(seed)
+    conn = client.conn
+    now = datetime.now(timezone.utc)
+    with client.lock:
+        version = conn.execute("SELECT version FROM agent_versions WHERE is_active = 1 LIMIT 1").fetchone()[0]
+        for trigger in ("insert", "update", "delete"):
+            conn.execute(f"DROP TRIGGER IF EXISTS trigger_update_agent_stats_{trigger}")
+        conn.execute("BEGIN")
+        try:
+            for start in range(0, calls, BATCH_SIZE):
+                call_rows: List[tuple] = []
+                learning_rows: List[tuple] = []
+                for i in range(start, min(calls, start + BATCH_SIZE)):
+                    call_id = str(uuid.uuid4())
+                    created_at = _timestamp(now - timedelta(seconds=(calls - i) * days * 86400 / max(calls, 1)))
+                    outcome = "booked" if rng.random() < booked_rate else "not_booked"
+                    learning = {
+                        "what_worked": rng.choice(WORKED),
+                        "what_failed": rng.choice(FAILED),
+                        "key_phrase": "seeded",
+                        "objection_types": rng.sample(OBJECTIONS, rng.randint(0, 2)),
+                        "engagement_level": rng.choice(["high", "medium", "low"]),
+                        "conversion_factors": {"positive": [], "negative": []},
+                    }
+                    call_rows.append(
+                        (
+                            call_id,
+                            f"seed-{i}",
+                            version,
+                            synthetic_transcript(rng),
+                            outcome,
+                            rng.randint(30, 600),
+                            json.dumps(learning),
+                            created_at,
+                        )
+                    )
+                    learning_rows.append(
+                        (
+                            str(uuid.uuid4()),
+                            call_id,
+                            outcome,
+                            learning["what_worked"],
+                            learning["what_failed"],
+                            learning["key_phrase"],
+                            json.dumps(learning["objection_types"]),
+                            learning["engagement_level"],
+                            json.dumps(learning["conversion_factors"]),
+                            created_at,
+                        )
+                    )
+                conn.executemany(
+                    "INSERT INTO calls (id, vapi_call_id, agent_version, transcript, outcome, duration_seconds, "
+                    "analysis_json, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    call_rows,
+                )
+                conn.executemany(
+                    "INSERT INTO call_learnings (id, call_id, outcome, what_worked, what_failed, key_phrase, "
+                    "objection_types, engagement_level, conversion_factors, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    learning_rows,
+                )
+            conn.executemany(
+                "INSERT INTO learning_patterns (pattern_type, pattern_description, pattern_data, frequency, "
+                "success_rate, confidence_score) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    ("success_pattern", description, json.dumps({"source": "seed"}), rng.randint(1, 50), 1.0, rng.random())
+                    for description in WORKED
+                ]
+                + [
+                    ("failure_pattern", description, json.dumps({"source": "seed"}), rng.randint(1, 50), 0.0, rng.random())
+                    for description in FAILED
+                ],
+            )
+            for statement in REBUILD_STATS_SQL.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.executescript(LOCAL_SCHEMA)
+    return {"calls": calls, "learnings": calls, "patterns": len(WORKED) + len(FAILED), "version": version}
@@ -1,15 +1,45 @@
+import asyncio
 import json
 import os
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import httpx
 from dotenv import load_dotenv
-from fastapi import BackgroundTasks, FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from openai import AzureOpenAI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from openai import AsyncAzureOpenAI, AzureOpenAI, DefaultAsyncHttpxClient
 from pydantic import BaseModel
-from supabase import Client, create_client
+from supabase import Client
+
+from services import metrics, repositories
+from services.call_index import similar_calls
+from services.context_store import historical_context
+from services.counters import call_counters
+from services.embedding_index import EmbeddingIndex, create_embedder
+from services.event_bus import event_bus, format_sse
+from services.idempotency import lookup_call, seen_calls
+from services.job_queue import AnalysisQueue
+from services.llm import (
+    complete_json,
+    complete_json_async,
+    completion_cache_stats,
+    rate_limiter_status,
+    set_completion_cache,
+    set_rate_limiter,
+)
+from services.llm_cache import MemoryCompletionCache, SQLiteCompletionCache, TieredCompletionCache
+from services.pagination import decode_cursor, encode_cursor
+from services.pattern_index import pattern_index
+from services.rate_limiter import AdaptiveRateLimiter, Priority, llm_priority
+from services.storage import create_storage_client
+from services.strategy_lock import LeaseHeld, StrategyLock, insert_version, strategy_lock
+from services.synthesis_store import synthesis_store
+from services.trend_engine import trend_aggregator
+from services.vapi_client import VapiAssistantUpdater
+from services.version_cache import get_active_version, invalidate_active_version
 
 load_dotenv()
 
@@ -18,28 +48,172 @@ PORT = int(os.getenv("PORT", "3000"))
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("service_role_key")
 
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase").lower()
+SQLITE_DB_PATH = os.getenv(
+    "SQLITE_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "ruya.db")
+)
+
 AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
 AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
 AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2025-01-01-preview")
 AZURE_OPENAI_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o")
+AZURE_OPENAI_MAX_CONNECTIONS = int(os.getenv("AZURE_OPENAI_MAX_CONNECTIONS", "20"))
+# Client-side limits; set the per-minute quotas to the deployment's (0 = unlimited)
+AZURE_OPENAI_REQUESTS_PER_MINUTE = float(os.getenv("AZURE_OPENAI_REQUESTS_PER_MINUTE", "0"))
+AZURE_OPENAI_TOKENS_PER_MINUTE = float(os.getenv("AZURE_OPENAI_TOKENS_PER_MINUTE", "0"))
+AZURE_OPENAI_MAX_CONCURRENCY = int(os.getenv("AZURE_OPENAI_MAX_CONCURRENCY", str(AZURE_OPENAI_MAX_CONNECTIONS)))
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "5"))
+AZURE_OPENAI_EMBEDDING_DEPLOYMENT = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
 
 VAPI_API_KEY = os.getenv("VAPI_API_KEY") or os.getenv("serversideAPIVapi")
 VAPI_ASSISTANT_ID = os.getenv("VAPI_ASSISTANT_ID") or os.getenv("assistant_id")
+VAPI_UPDATE_DEBOUNCE_SECONDS = float(os.getenv("VAPI_UPDATE_DEBOUNCE_SECONDS", "2.0"))
+VAPI_UPDATE_MAX_ATTEMPTS = int(os.getenv("VAPI_UPDATE_MAX_ATTEMPTS", "5"))
+VAPI_HTTP2 = os.getenv("VAPI_HTTP2", "false").lower() in {"1", "true", "yes"}
+
+ANALYSIS_QUEUE_PATH = os.getenv(
+    "ANALYSIS_QUEUE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "analysis_queue.db")
+)
+ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "4"))
+ANALYSIS_MAX_ATTEMPTS = int(os.getenv("ANALYSIS_MAX_ATTEMPTS", "5"))
+ANALYSIS_RETRY_BACKOFF = float(os.getenv("ANALYSIS_RETRY_BACKOFF", "2.0"))
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_cache.db")
+)
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512"))
+LLM_CACHE_DISK_ENTRIES = int(os.getenv("LLM_CACHE_DISK_ENTRIES", "10000"))
+
+PATTERN_EMBEDDINGS_ENABLED = os.getenv("PATTERN_EMBEDDINGS_ENABLED", "true").lower() in {"1", "true", "yes"}
+PATTERN_EMBEDDINGS_PATH = os.getenv(
+    "PATTERN_EMBEDDINGS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "pattern_embeddings")
+)
+PATTERN_SIMILARITY_THRESHOLD = (
+    float(os.environ["PATTERN_SIMILARITY_THRESHOLD"]) if os.getenv("PATTERN_SIMILARITY_THRESHOLD") else None
+)
+
+SIMILAR_CALLS_ENABLED = os.getenv("SIMILAR_CALLS_ENABLED", "true").lower() in {"1", "true", "yes"}
+SIMILAR_CALLS_PATH = os.getenv(
+    "SIMILAR_CALLS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "call_embeddings")
+)
+SIMILAR_CALLS_MAX = int(os.getenv("SIMILAR_CALLS_MAX", "20000"))
+
+# Dashboard list projections: transcripts, webhook payloads and strategy bodies are detail-only
+CALLS_PAGE_MAX = 100
+CALL_LIST_COLUMNS = "id, vapi_call_id, agent_version, outcome, duration_seconds, customer_phone, created_at"
+CALL_LIST_FIELDS = [column.strip() for column in CALL_LIST_COLUMNS.split(",")]
+VERSION_LIST_COLUMNS = (
+    "id, version, total_calls, total_bookings, conversion_rate, is_active, created_at, updated_at, "
+    "description:strategy_json->>description"
+)
+
+# Dashboard event stream: keepalive comment interval and client reconnect delay
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+EVENTS_RETRY_MS = int(os.getenv("EVENTS_RETRY_MS", "3000"))
 
-if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
+if STORAGE_BACKEND == "supabase" and (not SUPABASE_URL or not SUPABASE_SERVICE_KEY):
     raise RuntimeError("Missing SUPABASE_URL or SUPABASE_SERVICE_KEY/service_role_key")
 if not AZURE_OPENAI_API_KEY or not AZURE_OPENAI_ENDPOINT:
     raise RuntimeError("Missing Azure OpenAI configuration")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+# Every query made through this client is timed for /metrics
+supabase: Client = metrics.instrument_storage(
+    create_storage_client(STORAGE_BACKEND, SUPABASE_URL, SUPABASE_SERVICE_KEY, SQLITE_DB_PATH)
+)
 
 openai_client = AzureOpenAI(
     api_key=AZURE_OPENAI_API_KEY,
     api_version=AZURE_OPENAI_API_VERSION,
     azure_endpoint=AZURE_OPENAI_ENDPOINT,
+    # 429s and transient errors are retried in services.llm, under the shared rate limiter
+    max_retries=0,
+)
+
+# Shared async client: one connection pool reused by every awaited completion
+async_openai_client = AsyncAzureOpenAI(
+    api_key=AZURE_OPENAI_API_KEY,
+    api_version=AZURE_OPENAI_API_VERSION,
+    azure_endpoint=AZURE_OPENAI_ENDPOINT,
+    max_retries=0,
+    http_client=DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=AZURE_OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=AZURE_OPENAI_MAX_CONNECTIONS,
+        )
+    ),
+)
+
+embedder = create_embedder(openai_client, AZURE_OPENAI_EMBEDDING_DEPLOYMENT)
+
+if PATTERN_EMBEDDINGS_ENABLED:
+    # Semantic near-duplicate matching for learning patterns
+    pattern_index.attach_embeddings(EmbeddingIndex(PATTERN_EMBEDDINGS_PATH, embedder, PATTERN_SIMILARITY_THRESHOLD))
+
+if SIMILAR_CALLS_ENABLED:
+    # Analysis examples are the past calls closest to the one being analyzed
+    similar_calls.max_calls = SIMILAR_CALLS_MAX
+    similar_calls.attach_embeddings(EmbeddingIndex(SIMILAR_CALLS_PATH, embedder))
+
+# Long-lived pooled Vapi client; strategy pushes are debounced and retried
+vapi_updater = VapiAssistantUpdater(
+    VAPI_API_KEY,
+    VAPI_ASSISTANT_ID,
+    debounce_seconds=VAPI_UPDATE_DEBOUNCE_SECONDS,
+    max_attempts=VAPI_UPDATE_MAX_ATTEMPTS,
+    http2=VAPI_HTTP2,
+)
+
+if LLM_CACHE_ENABLED:
+    set_completion_cache(
+        TieredCompletionCache(
+            MemoryCompletionCache(LLM_CACHE_MEMORY_ENTRIES, LLM_CACHE_TTL_SECONDS),
+            SQLiteCompletionCache(LLM_CACHE_PATH, LLM_CACHE_DISK_ENTRIES, LLM_CACHE_TTL_SECONDS),
+        )
+    )
+
+# Every completion waits here: live analysis first, then dashboard requests, then background work
+set_rate_limiter(
+    AdaptiveRateLimiter(
+        AZURE_OPENAI_REQUESTS_PER_MINUTE,
+        AZURE_OPENAI_TOKENS_PER_MINUTE,
+        max_concurrency=AZURE_OPENAI_MAX_CONCURRENCY,
+    ),
+    max_attempts=LLM_MAX_ATTEMPTS,
 )
 
-app = FastAPI(title="Ruya Self-Improving Voice Agent")
+
+similar_calls_warmup: Optional[asyncio.Future] = None
+
+
+def warm_similar_calls() -> None:
+    try:
+        similar_calls.ensure_seeded(supabase)
+    except Exception as e:
+        print(f"⚠️ Similar call index warm-up failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    event_bus.bind(asyncio.get_running_loop())
+    await vapi_updater.start()
+    await analysis_queue.start()
+    global similar_calls_warmup
+    if SIMILAR_CALLS_ENABLED:
+        # Embeds transcripts missing from the index; analyses use the latest calls until it is ready
+        similar_calls_warmup = asyncio.get_running_loop().run_in_executor(None, warm_similar_calls)
+    try:
+        yield
+    finally:
+        if synthesis_refreshing():
+            synthesis_task.cancel()
+        await analysis_queue.stop()
+        await vapi_updater.stop()
+        await async_openai_client.close()
+
+
+app = FastAPI(title="Ruya Self-Improving Voice Agent", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -65,17 +239,50 @@ class AnalyzePayload(BaseModel):
 
 
 def get_current_agent_version() -> Optional[Dict[str, Any]]:
+    return get_active_version(supabase)
+
+
+def overall_stats() -> Dict[str, Any]:
+    # Totals are kept up to date by the stats triggers in one agent_stats row
     result = (
-        supabase.table("agent_versions")
-        .select("*")
-        .eq("is_active", True)
-        .order("created_at", desc=True)
+        supabase.table("agent_stats")
+        .select("total_calls, total_bookings, versions_created, current_version")
+        .eq("id", 1)
         .limit(1)
         .execute()
     )
-    if not result.data:
-        return None
-    return result.data[0]
+    stats = result.data[0] if result.data else {}
+    total_calls = stats.get("total_calls") or 0
+    total_bookings = stats.get("total_bookings") or 0
+    conversion = (total_bookings / total_calls) if total_calls else 0.0
+    return {
+        "total_calls": total_calls,
+        "total_bookings": total_bookings,
+        "overall_conversion_rate": conversion,
+        "versions_created": stats.get("versions_created") or 0,
+        "current_version": stats.get("current_version") or "none",
+    }
+
+
+def publish_event(event_type: str, data: Dict[str, Any], version: Optional[str] = None) -> None:
+    """
+    Push a pipeline event to the dashboard streams with the totals it changed. The totals
+    are read once per event (and only while someone is listening), never per viewer.
+    """
+    if not event_bus.has_subscribers():
+        return
+    data = {**data, "stats": overall_stats()}
+    if version:
+        row = repositories.get_version(supabase, version, VERSION_LIST_COLUMNS)
+        if row:
+            data["version_stats"] = row
+    event_bus.publish(event_type, data)
+
+
+async def publish_event_async(event_type: str, data: Dict[str, Any], version: Optional[str] = None) -> None:
+    """`publish_event` from async handlers: the totals are read in a worker thread, not on the loop."""
+    if event_bus.has_subscribers():
+        await asyncio.to_thread(publish_event, event_type, data, version)
 
 
 def analyze_call(transcript: str, outcome: str) -> Dict[str, Any]:
@@ -100,21 +307,19 @@ Provide a detailed JSON analysis with this structure:
 
 Return valid JSON only."""
 
-    response = openai_client.chat.completions.create(
+    return complete_json(
+        openai_client,
         model=AZURE_OPENAI_DEPLOYMENT_NAME,
         messages=[
             {"role": "system", "content": "You are an expert sales call analyst. Return JSON only."},
             {"role": "user", "content": analysis_prompt},
         ],
-        response_format={"type": "json_object"},
         temperature=0.7,
         max_tokens=1800,
     )
-    content = response.choices[0].message.content or "{}"
-    return json.loads(content)
 
 
-def generate_strategy_mutation(
+async def generate_strategy_mutation(
     current_strategy: Dict[str, Any], recent_analyses: List[Dict[str, Any]], conversion_rate: float
 ) -> Dict[str, Any]:
     mutation_prompt = f"""You optimize conversion for a real-estate phone sales agent.
@@ -138,18 +343,16 @@ Return JSON:
 
 Return valid JSON only."""
 
-    response = openai_client.chat.completions.create(
+    return await complete_json_async(
+        async_openai_client,
         model=AZURE_OPENAI_DEPLOYMENT_NAME,
         messages=[
             {"role": "system", "content": "You optimize sales call strategy. Return JSON only."},
             {"role": "user", "content": mutation_prompt},
         ],
-        response_format={"type": "json_object"},
         temperature=0.8,
         max_tokens=2600,
     )
-    content = response.choices[0].message.content or "{}"
-    return json.loads(content)
 
 
 def convert_strategy_to_prompt(strategy_json: Dict[str, Any]) -> str:
@@ -187,25 +390,9 @@ TONE GUIDELINES:
 Be natural, concise, and conversion-focused."""
 
 
-async def update_vapi_assistant(strategy: Dict[str, Any]) -> Dict[str, Any]:
-    if not VAPI_API_KEY or not VAPI_ASSISTANT_ID:
-        raise RuntimeError("Missing VAPI_API_KEY or VAPI_ASSISTANT_ID/assistant_id")
-
-    system_prompt = convert_strategy_to_prompt(strategy)
-    url = f"https://api.vapi.ai/assistant/{VAPI_ASSISTANT_ID}"
-    payload = {
-        "model": {
-            "provider": "openai",
-            "model": "gpt-4",
-            "messages": [{"role": "system", "content": system_prompt}],
-        }
-    }
-    headers = {"Authorization": f"Bearer {VAPI_API_KEY}", "Content-Type": "application/json"}
-
-    async with httpx.AsyncClient(timeout=30) as client:
-        res = await client.patch(url, json=payload, headers=headers)
-        res.raise_for_status()
-        return res.json()
+def update_vapi_assistant(version: str, strategy: Dict[str, Any]) -> None:
+    """Queue `strategy` for the Vapi assistant; rapid successive versions are coalesced."""
+    vapi_updater.submit(version, convert_strategy_to_prompt(strategy))
 
 
 def increment_version(version: str) -> str:
@@ -218,30 +405,64 @@ def increment_version(version: str) -> str:
         return "v1.1"
 
 
-async def check_and_mutate_strategy() -> None:
+def mutation_due(version: Dict[str, Any]) -> bool:
+    """Mutate every 5 decided calls on a version (its trigger-maintained, cross-worker total)."""
+    total_calls = version.get("total_calls") or 0
+    return total_calls > 0 and total_calls % 5 == 0
+
+
+def auto_optimize_due(version: Dict[str, Any]) -> bool:
+    """Optimize from learnings every 3 decided calls, once the version has 3+ learnings."""
+    total_calls = version.get("total_calls") or 0
+    return total_calls > 0 and total_calls % 3 == 0 and call_counters.learnings_for(supabase, version) >= 3
+
+
+def current_mutation_due() -> bool:
     current_version = get_current_agent_version()
-    if not current_version:
-        return
+    return bool(current_version) and mutation_due(current_version)
 
-    threshold = 5
-    total_calls = current_version.get("total_calls", 0)
-    if total_calls <= 0 or total_calls % threshold != 0:
+
+async def check_and_mutate_strategy() -> None:
+    if not await asyncio.to_thread(current_mutation_due):
         return
+    await strategy_lock.run(supabase, "mutate", mutate_strategy)
 
-    recent_calls = (
-        supabase.table("calls")
-        .select("analysis_json,outcome")
-        .eq("agent_version", current_version["version"])
-        .not_.is_("analysis_json", "null")
-        .order("created_at", desc=True)
-        .limit(10)
-        .execute()
+
+def load_mutation_inputs() -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """The active version and its recent analyses, or None if no mutation is due any more."""
+    # Re-check under the strategy lock: another task or worker may have replaced the version
+    invalidate_active_version()
+    current_version = get_current_agent_version()
+    if not current_version or not mutation_due(current_version):
+        return None
+
+    recent_calls = repositories.recent_calls(
+        supabase, "analysis_json,outcome", 10, agent_version=current_version["version"], analyzed=True
     )
-    analyses = [row["analysis_json"] for row in (recent_calls.data or []) if row.get("analysis_json")]
+    analyses = [row["analysis_json"] for row in recent_calls if row.get("analysis_json")]
     if not analyses:
+        return None
+    return current_version, analyses
+
+
+def store_mutated_version(current_version: Dict[str, Any], new_version: str, new_strategy: Dict[str, Any]) -> bool:
+    if not insert_version(supabase, {"version": new_version, "strategy_json": new_strategy, "is_active": True}):
+        return False
+
+    repositories.deactivate_version(supabase, current_version["version"])
+    invalidate_active_version()
+    call_counters.version_created(new_version)
+    return True
+
+
+async def mutate_strategy() -> None:
+    # Supabase reads and writes run in a worker thread; only the completion is awaited here
+    inputs = await asyncio.to_thread(load_mutation_inputs)
+    if inputs is None:
         return
+    current_version, analyses = inputs
 
-    mutation = generate_strategy_mutation(
+    mutation = await generate_strategy_mutation(
         current_version,
         analyses,
         float(current_version.get("conversion_rate", 0)),
@@ -251,64 +472,159 @@ async def check_and_mutate_strategy() -> None:
     if not new_strategy:
         return
 
-    insert_res = (
-        supabase.table("agent_versions")
-        .insert({"version": new_version, "strategy_json": new_strategy, "is_active": True})
-        .execute()
-    )
-    if not insert_res.data:
+    if not await asyncio.to_thread(store_mutated_version, current_version, new_version, new_strategy):
         return
+    # Announce the committed version first: the Vapi push raises when Vapi is not configured
+    await publish_event_async(
+        "version_created", {"version": new_version, "previous_version": current_version["version"]}, new_version
+    )
+    update_vapi_assistant(new_version, new_strategy)
+
 
-    supabase.table("agent_versions").update({"is_active": False}).eq("version", current_version["version"]).execute()
-    await update_vapi_assistant(new_strategy)
+def outcome_before_write(call_id: str) -> Optional[str]:
+    """The call's stored outcome, read only when the trend engine no longer remembers the call."""
+    if trend_aggregator.remembers(call_id):
+        return None
+    row = repositories.get_call(supabase, call_id, "outcome")
+    return row.get("outcome") if row else None
 
 
-async def analyze_call_async(call_id: str, transcript: str) -> None:
+def record_analysis(
+    call_id: str, transcript: str, outcome: str, learning: Dict[str, Any], agent_version: Optional[str]
+) -> Dict[str, bool]:
+    """Store a finished analysis and fold it into the in-process aggregates; says which follow-ups are due."""
+    previous_outcome = outcome_before_write(call_id)
+    # Update call with outcome and store analysis
+    repositories.update_call(supabase, call_id, {"outcome": outcome, "analysis_json": learning})
+    # The stats trigger just changed the active version's totals
+    invalidate_active_version()
+    historical_context.record_call(call_id, outcome, transcript)
+    # Embedding the transcript may be an Azure round trip
+    similar_calls.record_call(call_id, outcome, transcript)
+    trend_aggregator.record_outcome(call_id, outcome, agent_version, previous_outcome=previous_outcome)
+    publish_event(
+        "analysis_stored", {"call_id": call_id, "outcome": outcome, "agent_version": agent_version}, agent_version
+    )
+
+    # Check if we should auto-optimize strategy (every 3 calls with outcomes); re-read after
+    # the invalidation above, so the version's total includes this call
+    current_version = get_current_agent_version()
+    optimize = bool(current_version) and auto_optimize_due(current_version)
+    return {"synthesis": synthesis_store.due(supabase), "auto_optimize": optimize}
+
+
+async def analyze_call_async(call_id: str, transcript: str, agent_version: Optional[str] = None) -> None:
     # For demo, default outcome until external system sets it.
     outcome = "not_booked"
     
     # Use advanced context-aware analysis
-    from services.analyzer import analyze_call_with_context
+    from services.analyzer import analyze_call_with_context_async
     
-    learning = analyze_call_with_context(
-        transcript=transcript,
-        outcome=outcome,
-        openai_client=openai_client,
-        supabase=supabase,
-        call_id=call_id,
-        model_name=AZURE_OPENAI_DEPLOYMENT_NAME,
-    )
+    with llm_priority(Priority.LIVE):
+        learning = await analyze_call_with_context_async(
+            transcript=transcript,
+            outcome=outcome,
+            openai_client=async_openai_client,
+            supabase=supabase,
+            call_id=call_id,
+            model_name=AZURE_OPENAI_DEPLOYMENT_NAME,
+        )
     
-    # Update call with outcome and store analysis
-    (
-        supabase.table("calls")
-        .update({"outcome": outcome, "analysis_json": learning})
-        .eq("id", call_id)
-        .execute()
-    )
+    # Database work runs in a worker thread so finished analyses never stall webhook intake
+    due = await asyncio.to_thread(record_analysis, call_id, transcript, outcome, learning, agent_version)
+    if due["synthesis"]:
+        schedule_synthesis_refresh()
+
+    if due["auto_optimize"]:
+        try:
+            with llm_priority(Priority.BATCH):
+                await strategy_lock.run(supabase, "auto_optimize", auto_optimize_strategy)
+        except LeaseHeld:
+            pass  # another worker is already changing the strategy
+        except Exception as e:
+            print(f"⚠️ Auto-optimization failed: {e}")
     
-    # Check if we should auto-optimize strategy (every 3 calls with outcomes)
+    # Mutation failures must not fail the job, or the retry would re-run the analysis
+    try:
+        with llm_priority(Priority.BATCH):
+            await check_and_mutate_strategy()
+    except LeaseHeld:
+        pass
+    except Exception as e:
+        print(f"⚠️ Strategy mutation failed: {e}")
+
+
+def current_auto_optimize_due() -> bool:
+    # Re-check under the strategy lock: another task or worker may have optimized already
+    invalidate_active_version()
     current_version = get_current_agent_version()
-    if current_version:
-        total_calls = current_version.get("total_calls", 0)
-        # Auto-optimize every 3 calls if we have enough learnings
-        if total_calls > 0 and total_calls % 3 == 0:
-            # Check if we have enough learnings (get all and count)
-            learnings_result = (
-                supabase.table("call_learnings")
-                .select("id")
-                .execute()
-            )
-            learnings_count = len(learnings_result.data or [])
-            if learnings_count >= 3:
-                try:
-                    from services.strategy_optimizer import optimize_strategy_from_learnings
-                    result = await optimize_strategy_from_learnings(supabase, openai_client, AZURE_OPENAI_DEPLOYMENT_NAME)
-                    print(f"✨ Auto-optimized strategy: {result['old_version']} -> {result['new_version']}")
-                except Exception as e:
-                    print(f"⚠️ Auto-optimization failed: {e}")
-    
-    await check_and_mutate_strategy()
+    return bool(current_version) and auto_optimize_due(current_version)
+
+
+async def auto_optimize_strategy() -> None:
+    if not await asyncio.to_thread(current_auto_optimize_due):
+        return
+    result = await optimize_and_announce()
+    print(f"✨ Auto-optimized strategy: {result['old_version']} -> {result['new_version']}")
+
+
+async def optimize_and_announce() -> Dict[str, Any]:
+    """Optimize the strategy from learnings (under the strategy lock) and announce the new version."""
+    from services.strategy_optimizer import optimize_strategy_from_learnings
+
+    result = await optimize_strategy_from_learnings(supabase, async_openai_client, AZURE_OPENAI_DEPLOYMENT_NAME)
+    new_version = result["new_version"]
+    await publish_event_async(
+        "version_created", {"version": new_version, "previous_version": result["old_version"]}, new_version
+    )
+    return result
+
+
+# Synthesis regenerations are single-flight, in-process and across workers
+synthesis_lock = StrategyLock("synthesis")
+synthesis_task: Optional[asyncio.Task] = None
+
+
+async def regenerate_synthesis() -> Dict[str, Any]:
+    """Synthesize all learnings and store the result as the next synthesis version."""
+    from services.learning_synthesis import synthesize_all_learnings_async
+
+    marker = synthesis_store.begin()
+    synthesis = await synthesize_all_learnings_async(supabase, async_openai_client, AZURE_OPENAI_DEPLOYMENT_NAME)
+    row = await asyncio.to_thread(synthesis_store.save, supabase, marker, synthesis, AZURE_OPENAI_DEPLOYMENT_NAME)
+    print(f"🧠 Learning synthesis v{row['version']} generated")
+    await publish_event_async("synthesis_updated", {"version": row["version"], "generated_at": row["generated_at"]})
+    return row
+
+
+async def refresh_synthesis_in_background() -> None:
+    try:
+        with llm_priority(Priority.BATCH):
+            await synthesis_lock.run(supabase, "synthesis", regenerate_synthesis)
+    except LeaseHeld:
+        pass  # another worker is regenerating it
+    except Exception as e:
+        print(f"⚠️ Synthesis refresh failed: {e}")
+
+
+def synthesis_refreshing() -> bool:
+    return synthesis_task is not None and not synthesis_task.done()
+
+
+def schedule_synthesis_refresh() -> None:
+    """Regenerate the synthesis in the background unless this process already is."""
+    global synthesis_task
+    if not synthesis_refreshing():
+        synthesis_task = asyncio.get_running_loop().create_task(refresh_synthesis_in_background())
+
+
+analysis_queue = AnalysisQueue(
+    ANALYSIS_QUEUE_PATH,
+    handler=analyze_call_async,
+    concurrency=ANALYSIS_CONCURRENCY,
+    max_attempts=ANALYSIS_MAX_ATTEMPTS,
+    base_backoff=ANALYSIS_RETRY_BACKOFF,
+)
 
 
 @app.get("/health")
@@ -320,10 +636,65 @@ def health() -> Dict[str, str]:
     }
 
 
+def ingest_call(call: Dict[str, Any], transcript: str, duration: int) -> Tuple[Dict[str, Any], bool]:
+    """
+    Store a delivered call and make sure its analysis is queued; returns the call row and
+    whether an earlier delivery had already stored it. Blocking I/O: run in a worker thread.
+    """
+    vapi_call_id = call.get("id")
+    current_version = get_current_agent_version()
+    if not current_version:
+        raise HTTPException(status_code=500, detail="No active agent version found")
+
+    inserted = repositories.insert_call_once(
+        supabase,
+        {
+            "vapi_call_id": vapi_call_id,
+            "agent_version": current_version["version"],
+            "transcript": transcript,
+            "outcome": "pending",
+            "duration_seconds": duration,
+            "call_metadata": call,
+        },
+    )
+    duplicate = inserted is None
+    if duplicate:
+        # Conflict on vapi_call_id: an earlier delivery (possibly on another worker) stored it
+        record = lookup_call(supabase, vapi_call_id) if vapi_call_id else None
+        if not record:
+            raise HTTPException(status_code=500, detail="Failed to insert call")
+    else:
+        record = inserted
+
+    # That earlier delivery may have failed before queueing: a call still pending is queued
+    # again, and the queue ignores calls that already have a job
+    if record.get("outcome") == "pending":
+        analysis_queue.enqueue(
+            {
+                "call_id": record["id"],
+                "transcript": record.get("transcript") or "",
+                "agent_version": record.get("agent_version"),
+            }
+        )
+    # Only now may retries be acknowledged from memory
+    if vapi_call_id:
+        seen_calls.add(vapi_call_id, record["id"])
+    if not duplicate:
+        trend_aggregator.record_call(record["id"], record.get("agent_version"), record.get("created_at"))
+    return record, duplicate
+
+
 @app.post("/webhook/call-completed")
-async def webhook_call_completed(payload: WebhookPayload, background_tasks: BackgroundTasks) -> Dict[str, Any]:
+async def webhook_call_completed(payload: WebhookPayload) -> Dict[str, Any]:
     call = payload.call
     vapi_call_id = call.get("id")
+
+    # Vapi retries deliveries; a call we already stored and queued is acknowledged without new work
+    if vapi_call_id:
+        known_call_id = seen_calls.get(vapi_call_id)
+        if known_call_id:
+            return {"success": True, "message": "Call already received", "callId": known_call_id, "duplicate": True}
+
     transcript = call.get("transcript", "")
     duration = 0
     started_at = call.get("startedAt")
@@ -336,60 +707,131 @@ async def webhook_call_completed(payload: WebhookPayload, background_tasks: Back
         except Exception:
             duration = 0
 
-    current_version = get_current_agent_version()
-    if not current_version:
-        raise HTTPException(status_code=500, detail="No active agent version found")
+    record, duplicate = await asyncio.to_thread(ingest_call, call, transcript, duration)
+    if duplicate:
+        return {"success": True, "message": "Call already received", "callId": record["id"], "duplicate": True}
 
-    insert_res = (
-        supabase.table("calls")
-        .insert(
-            {
-                "vapi_call_id": vapi_call_id,
-                "agent_version": current_version["version"],
-                "transcript": transcript,
-                "outcome": "pending",
-                "duration_seconds": duration,
-                "call_metadata": call,
-            }
-        )
-        .execute()
+    await publish_event_async(
+        "call_ingested",
+        {"call": {column: record.get(column) for column in CALL_LIST_FIELDS}},
+        record.get("agent_version"),
     )
-    if not insert_res.data:
-        raise HTTPException(status_code=500, detail="Failed to insert call")
-
-    record = insert_res.data[0]
-    background_tasks.add_task(analyze_call_async, record["id"], transcript)
 
     return {"success": True, "message": "Call received and queued for analysis", "callId": record["id"]}
 
 
+@app.get("/api/queue/status")
+def queue_status() -> Dict[str, Any]:
+    """Analysis queue depth, in-flight work and dead letters."""
+    return {**analysis_queue.stats(), "dead_letters": analysis_queue.dead_letters()}
+
+
+@app.post("/api/queue/dead/{job_id}/retry")
+def retry_dead_job(job_id: int) -> Dict[str, Any]:
+    """Re-queue a dead-lettered analysis job."""
+    if not analysis_queue.retry_dead(job_id):
+        raise HTTPException(status_code=404, detail="Dead job not found")
+    return {"success": True, "job_id": job_id}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics() -> PlainTextResponse:
+    """Prometheus text exposition of query, LLM, Vapi and queue metrics."""
+    stats = analysis_queue.stats()
+    for status in ("pending", "running", "dead"):
+        metrics.queue_jobs.set(stats[status], status=status)
+    metrics.queue_in_flight.set(stats["in_flight"])
+    metrics.event_subscribers.set(event_bus.stats()["subscribers"])
+    limiter = rate_limiter_status()
+    if limiter["enabled"]:
+        metrics.llm_concurrency_limit.set(limiter["concurrency_limit"])
+        metrics.llm_in_flight.set(limiter["in_flight"])
+        for priority, waiting in limiter["waiting"].items():
+            metrics.llm_waiting.set(waiting, priority=priority)
+    return PlainTextResponse(metrics.render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/vapi/status")
+def vapi_status() -> Dict[str, Any]:
+    """Last strategy version pushed to the Vapi assistant, pending push and failures."""
+    return vapi_updater.status()
+
+
+@app.get("/api/llm/cache")
+def llm_cache_stats() -> Dict[str, Any]:
+    """Completion cache hit/miss counters and tier sizes."""
+    return completion_cache_stats()
+
+
+@app.get("/api/llm/limits")
+def llm_limits() -> Dict[str, Any]:
+    """Rate limiter state: adaptive concurrency limit, in-flight and waiting completions."""
+    return rate_limiter_status()
+
+
+@app.get("/api/events")
+async def events_stream(request: Request, last_event_id: Optional[str] = Header(None)) -> StreamingResponse:
+    """
+    Server-sent events for the dashboard: call_ingested, analysis_stored, outcome_updated,
+    version_created and synthesis_updated, with the updated totals; resync means refetch.
+    """
+    resume = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+
+    async def stream():
+        subscription = event_bus.subscribe(resume)
+        try:
+            yield f"retry: {EVENTS_RETRY_MS}\n\n"
+            while not await request.is_disconnected():
+                event = await subscription.next(EVENTS_HEARTBEAT_SECONDS)
+                yield format_sse(event) if event else ": keepalive\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/api/stats/overall")
 def stats_overall() -> Dict[str, Any]:
-    result = supabase.table("agent_versions").select("*").order("created_at", desc=True).execute()
-    versions = result.data or []
-    total_calls = sum(v.get("total_calls", 0) for v in versions)
-    total_bookings = sum(v.get("total_bookings", 0) for v in versions)
-    conversion = (total_bookings / total_calls) if total_calls else 0.0
-    current = next((v for v in versions if v.get("is_active")), None)
-    return {
-        "total_calls": total_calls,
-        "total_bookings": total_bookings,
-        "overall_conversion_rate": conversion,
-        "versions_created": len(versions),
-        "current_version": current["version"] if current else "none",
-    }
+    return overall_stats()
 
 
 @app.get("/api/stats/versions")
 def stats_versions() -> Dict[str, Any]:
-    result = supabase.table("agent_versions").select("*").order("created_at", desc=True).execute()
-    return {"versions": result.data or []}
+    # Strategy bodies stay out of the list; fetch one with /api/stats/versions/{version}
+    return {"versions": repositories.list_versions(supabase, VERSION_LIST_COLUMNS)}
+
+
+@app.get("/api/stats/versions/{version}")
+def stats_version(version: str) -> Dict[str, Any]:
+    row = repositories.get_version(supabase, version)
+    if not row:
+        raise HTTPException(status_code=404, detail="Version not found")
+    return row
 
 
 @app.get("/api/calls/recent")
-def calls_recent(limit: int = 20) -> Dict[str, Any]:
-    result = supabase.table("calls").select("*").order("created_at", desc=True).limit(limit).execute()
-    return {"calls": result.data or []}
+def calls_recent(limit: int = 20, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """Newest calls first, without transcripts; pass `next_cursor` back as `cursor` for older ones."""
+    limit = max(1, min(limit, CALLS_PAGE_MAX))
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # One extra row tells whether another page follows
+    calls = repositories.calls_page(supabase, CALL_LIST_COLUMNS, after, limit + 1, desc=True)
+    next_cursor = encode_cursor(calls[limit - 1]) if len(calls) > limit else None
+    return {"calls": calls[:limit], "next_cursor": next_cursor}
+
+
+@app.get("/api/calls/{call_id}")
+def call_detail(call_id: str) -> Dict[str, Any]:
+    """One call with its transcript, analysis and webhook metadata."""
+    row = repositories.get_call(supabase, call_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Call not found")
+    return row
 
 
 @app.get("/api/strategy/current")
@@ -402,7 +844,10 @@ def strategy_current() -> Dict[str, Any]:
 
 @app.post("/api/strategy/mutate")
 async def strategy_mutate() -> Dict[str, Any]:
-    await check_and_mutate_strategy()
+    try:
+        await check_and_mutate_strategy()
+    except LeaseHeld as e:
+        raise HTTPException(status_code=409, detail=str(e))
     return {"success": True, "message": "Strategy mutation triggered"}
 
 
@@ -410,29 +855,43 @@ async def strategy_mutate() -> Dict[str, Any]:
 def update_outcome(call_id: str, payload: OutcomePayload) -> Dict[str, Any]:
     if payload.outcome not in {"booked", "not_booked"}:
         raise HTTPException(status_code=400, detail='Invalid outcome. Must be "booked" or "not_booked"')
-    result = supabase.table("calls").update({"outcome": payload.outcome}).eq("id", call_id).execute()
-    if not result.data:
+    previous_outcome = outcome_before_write(call_id)
+    call = repositories.update_call(supabase, call_id, {"outcome": payload.outcome})
+    if not call:
         raise HTTPException(status_code=404, detail="Call not found")
-    return {"success": True, "call": result.data[0]}
+    invalidate_active_version()
+    historical_context.record_call(call["id"], payload.outcome, call.get("transcript") or "", call.get("created_at"))
+    similar_calls.record_call(call["id"], payload.outcome, call.get("transcript") or "")
+    trend_aggregator.record_outcome(
+        call["id"], payload.outcome, call.get("agent_version"), call.get("created_at"), previous_outcome
+    )
+    publish_event(
+        "outcome_updated",
+        {"call_id": call["id"], "outcome": payload.outcome, "agent_version": call.get("agent_version")},
+        call.get("agent_version"),
+    )
+    return {"success": True, "call": call}
 
 
 @app.post("/api/analyze")
-def analyze_call_endpoint(payload: AnalyzePayload) -> Dict[str, Any]:
+async def analyze_call_endpoint(payload: AnalyzePayload) -> Dict[str, Any]:
     """Analyze a call with full historical context and store learning."""
-    from services.analyzer import analyze_call_with_context
+    from services.analyzer import analyze_call_with_context_async
 
     if payload.outcome not in {"booked", "not_booked"}:
         raise HTTPException(status_code=400, detail='Invalid outcome. Must be "booked" or "not_booked"')
 
     try:
-        learning = analyze_call_with_context(
+        learning = await analyze_call_with_context_async(
             transcript=payload.transcript,
             outcome=payload.outcome,
-            openai_client=openai_client,
+            openai_client=async_openai_client,
             supabase=supabase,
             call_id=payload.call_id,
             model_name=AZURE_OPENAI_DEPLOYMENT_NAME,
         )
+        if await asyncio.to_thread(synthesis_store.due, supabase):
+            schedule_synthesis_refresh()
         return {"success": True, "learning": learning}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
@@ -451,12 +910,14 @@ def get_current_prompt() -> Dict[str, Any]:
 
 
 @app.get("/api/prompt/suggestions")
-def get_prompt_suggestions() -> Dict[str, Any]:
+async def get_prompt_suggestions() -> Dict[str, Any]:
     """Get AI-generated suggestions for prompt improvements."""
-    from services.prompt_builder import get_prompt_improvement_suggestions
+    from services.prompt_builder import get_prompt_improvement_suggestions_async
 
     try:
-        suggestions = get_prompt_improvement_suggestions(supabase, openai_client)
+        suggestions = await get_prompt_improvement_suggestions_async(
+            supabase, async_openai_client, AZURE_OPENAI_DEPLOYMENT_NAME
+        )
         return {"success": True, "suggestions": suggestions}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get suggestions: {str(e)}")
@@ -475,15 +936,37 @@ def get_trends() -> Dict[str, Any]:
 
 
 @app.get("/api/learnings/synthesis")
-def get_learning_synthesis() -> Dict[str, Any]:
-    """Get comprehensive synthesis of all learnings - most agentic endpoint."""
-    from services.learning_synthesis import synthesize_all_learnings
-
+async def get_learning_synthesis() -> Dict[str, Any]:
+    """
+    Latest stored synthesis of all learnings, with when it was generated and how many learnings
+    arrived since. A stale synthesis is still served while it is regenerated in the background.
+    """
+    row = await asyncio.to_thread(synthesis_store.latest, supabase)
+    if row is None:
+        # Nothing materialized yet: the first request generates it, concurrent ones share that run
+        try:
+            row = await synthesis_lock.run(supabase, "synthesis", regenerate_synthesis)
+        except LeaseHeld:
+            raise HTTPException(status_code=503, detail="Learning synthesis is being generated")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to synthesize learnings: {str(e)}")
+    status = await asyncio.to_thread(synthesis_store.status, supabase)
+    if status["stale"]:
+        schedule_synthesis_refresh()
+    return {"success": True, "synthesis": row["synthesis"], **status, "refreshing": synthesis_refreshing()}
+
+
+@app.post("/api/learnings/synthesis/refresh")
+async def refresh_learning_synthesis() -> Dict[str, Any]:
+    """Regenerate the synthesis now (joins a regeneration already in progress)."""
     try:
-        synthesis = synthesize_all_learnings(supabase, openai_client)
-        return {"success": True, "synthesis": synthesis}
+        row = await synthesis_lock.run(supabase, "synthesis", regenerate_synthesis)
+    except LeaseHeld as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to synthesize learnings: {str(e)}")
+    status = await asyncio.to_thread(synthesis_store.status, supabase)
+    return {"success": True, "synthesis": row["synthesis"], **status}
 
 
 @app.get("/api/learnings/summary")
@@ -504,10 +987,9 @@ async def optimize_strategy() -> Dict[str, Any]:
     Agentic endpoint: Analyzes all learnings and creates improved strategy version in database.
     This actually updates agent_versions table with new optimized version.
     """
-    from services.strategy_optimizer import optimize_strategy_from_learnings
-
     try:
-        result = await optimize_strategy_from_learnings(supabase, openai_client, AZURE_OPENAI_DEPLOYMENT_NAME)
+        # Concurrent requests share one optimization run instead of racing on is_active
+        result = await strategy_lock.run(supabase, "optimize", optimize_and_announce)
         return {
             "success": True,
             "message": f"Strategy optimized: {result['old_version']} -> {result['new_version']}",
@@ -516,6 +998,8 @@ async def optimize_strategy() -> Dict[str, Any]:
             "changes_made": result["changes_made"],
             "reasoning": result["reasoning"],
         }
+    except LeaseHeld as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Strategy optimization failed: {str(e)}")
 
@@ -0,0 +1,167 @@
+"""
+One-shot compaction of learning_patterns: collapses near-duplicate patterns into one row.
+
+Active patterns of each type are embedded and greedily clustered around the most frequent
+pattern; every pattern whose cosine similarity to that canonical row reaches the threshold
+(or that matches it lexically) is merged into it. Canonical rows keep the summed frequency,
+the highest confidence, a frequency-weighted success rate and the widest first/last-seen
+window; duplicates are deactivated with `merged_into` recorded in pattern_data. The pattern
+embedding index is rebuilt to match. Restart the API afterwards so it reloads patterns.
+
+Usage (from backend/, same .env as the API):
+    python scripts/compact_patterns.py            # dry run: print the merge plan
+    python scripts/compact_patterns.py --apply
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import numpy as np  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+
+from services.embedding_index import EmbeddingIndex, create_embedder  # noqa: E402
+from services.pattern_index import PatternIndex  # noqa: E402
+from services.repositories import iter_active_patterns, upsert_patterns  # noqa: E402
+from services.storage import create_storage_client  # noqa: E402
+
+UPSERT_BATCH_SIZE = 500
+
+
+def load_patterns(supabase: Any) -> List[Dict[str, Any]]:
+    return list(iter_active_patterns(supabase))
+
+
+def plan_merges(patterns: List[Dict[str, Any]], vectors: np.ndarray, threshold: float) -> List[List[int]]:
+    """Groups of row indexes (canonical first), per pattern type, most frequent patterns first."""
+    lexical = PatternIndex()
+    groups: List[List[int]] = []
+    order = sorted(
+        range(len(patterns)),
+        key=lambda i: (-(patterns[i].get("frequency") or 1), -(patterns[i].get("confidence_score") or 0), i),
+    )
+    assigned = np.zeros(len(patterns), dtype=bool)
+    types = np.array([p.get("pattern_type", "") for p in patterns])
+    for i in order:
+        if assigned[i]:
+            continue
+        assigned[i] = True
+        group = [i]
+        lexical.reset()
+        lexical.upsert({**patterns[i], "is_active": True})
+        scores = vectors @ vectors[i]
+        for j in order:
+            if assigned[j] or types[j] != types[i]:
+                continue
+            if scores[j] >= threshold or lexical.find_similar(patterns[j].get("pattern_description", ""), types[i]):
+                assigned[j] = True
+                group.append(j)
+        groups.append(group)
+    return groups
+
+
+def merge_group(patterns: List[Dict[str, Any]], group: List[int], now: str) -> List[Dict[str, Any]]:
+    canonical, duplicates = patterns[group[0]], [patterns[i] for i in group[1:]]
+    members = [canonical] + duplicates
+    frequency = sum(p.get("frequency") or 1 for p in members)
+    rated = [(p.get("success_rate"), p.get("frequency") or 1) for p in members if p.get("success_rate") is not None]
+    success_rate = sum(r * f for r, f in rated) / sum(f for _, f in rated) if rated else canonical.get("success_rate")
+    first_seen = [p.get("first_seen_at") for p in members if p.get("first_seen_at")]
+    last_seen = [p.get("last_seen_at") for p in members if p.get("last_seen_at")]
+    merged = {
+        **canonical,
+        "frequency": frequency,
+        "success_rate": success_rate,
+        "confidence_score": max(p.get("confidence_score") or 0 for p in members),
+        "first_seen_at": min(first_seen) if first_seen else canonical.get("first_seen_at"),
+        "last_seen_at": max(last_seen) if last_seen else canonical.get("last_seen_at"),
+        "pattern_data": {
+            **(canonical.get("pattern_data") or {}),
+            "merged_ids": sorted(
+                set((canonical.get("pattern_data") or {}).get("merged_ids", [])) | {p["id"] for p in duplicates}
+            ),
+        },
+        "updated_at": now,
+    }
+    retired = [
+        {
+            **p,
+            "is_active": False,
+            "pattern_data": {**(p.get("pattern_data") or {}), "merged_into": canonical["id"]},
+            "updated_at": now,
+        }
+        for p in duplicates
+    ]
+    return [merged] + retired
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Collapse near-duplicate learning patterns")
+    parser.add_argument("--apply", action="store_true", help="write the merges (default is a dry run)")
+    parser.add_argument("--threshold", type=float, help="cosine similarity threshold (defaults to the embedder's)")
+    args = parser.parse_args()
+
+    load_dotenv(os.path.join(BACKEND_DIR, ".env"))
+    backend = os.getenv("STORAGE_BACKEND", "supabase").lower()
+    supabase = create_storage_client(
+        backend,
+        os.getenv("SUPABASE_URL"),
+        os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("service_role_key"),
+        os.getenv("SQLITE_DB_PATH", os.path.join(BACKEND_DIR, "ruya.db")),
+    )
+    openai_client = None
+    deployment = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
+    if deployment:
+        from openai import AzureOpenAI
+
+        openai_client = AzureOpenAI(
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2025-01-01-preview"),
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        )
+    embedder = create_embedder(openai_client, deployment)
+    threshold = args.threshold
+    if threshold is None and os.getenv("PATTERN_SIMILARITY_THRESHOLD"):
+        threshold = float(os.environ["PATTERN_SIMILARITY_THRESHOLD"])
+    if threshold is None:
+        threshold = embedder.default_threshold
+
+    patterns = load_patterns(supabase)
+    if not patterns:
+        print("No active patterns")
+        return
+    vectors = embedder.embed([p.get("pattern_description", "") for p in patterns])
+    groups = [g for g in plan_merges(patterns, vectors, threshold) if len(g) > 1]
+    merged_away = sum(len(g) - 1 for g in groups)
+    print(f"🧹 {len(patterns)} active patterns, {len(groups)} duplicate groups, {merged_away} to merge ({embedder.name}, threshold {threshold})")
+    for group in groups:
+        print(f"  ✔ {patterns[group[0]].get('pattern_description', '')[:80]}")
+        for i in group[1:]:
+            print(f"      ← {patterns[i].get('pattern_description', '')[:80]} ({float(vectors[i] @ vectors[group[0]]):.2f})")
+
+    if not args.apply:
+        print("Dry run; pass --apply to write these merges")
+        return
+
+    now = datetime.now(timezone.utc).isoformat()
+    rows = [row for group in groups for row in merge_group(patterns, group, now)]
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        upsert_patterns(supabase, rows[start:start + UPSERT_BATCH_SIZE])
+
+    retired = {row["id"] for row in rows if row.get("is_active") is False}
+    index = EmbeddingIndex(
+        os.getenv("PATTERN_EMBEDDINGS_PATH", os.path.join(BACKEND_DIR, "pattern_embeddings")), embedder, threshold
+    )
+    index.sync(
+        [(p["id"], p.get("pattern_type", ""), p.get("pattern_description", "")) for p in patterns if p["id"] not in retired]
+    )
+    index.compact()
+    print(f"✅ Merged {merged_away} patterns into {len(groups)}; {len(patterns) - merged_away} active patterns remain")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Batch re-analysis of historical calls with the current analysis prompt.
+
+Decided calls (booked / not_booked) are read oldest first in keyset pages. Each page is analyzed
+concurrently through the shared LLM rate limiter (requests and tokens per minute, concurrency
+backing off on 429s) at batch priority. A call's previous learnings are replaced
+by the new one, one bulk delete + insert per page, and a checkpoint file records the last page
+written so an interrupted run resumes where it stopped. Once every page is done, the learning
+patterns produced by call analysis are rebuilt from the full call_learnings table.
+Restart the API afterwards so it reloads learnings and patterns.
+
+Usage (from backend/, same .env as the API):
+    python scripts/reanalyze.py --dry-run
+    python scripts/reanalyze.py --concurrency 8 --rpm 120 --tpm 200000
+    python scripts/reanalyze.py --resume
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx  # noqa: E402
+import openai  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+
+from services.analyzer import build_analysis_request, learning_row, plan_pattern_updates  # noqa: E402
+from services.call_index import DECIDED, similar_calls  # noqa: E402
+from services.embedding_index import EmbeddingIndex, create_embedder  # noqa: E402
+from services.llm import complete_json_async, rate_limiter_status, set_rate_limiter  # noqa: E402
+from services.pagination import fetch_keyset_page  # noqa: E402
+from services.pattern_index import PatternIndex  # noqa: E402
+from services.repositories import (  # noqa: E402
+    delete_learnings_for_calls,
+    insert_learnings,
+    iter_active_patterns,
+    iter_learnings,
+    upsert_patterns,
+)
+from services.rate_limiter import AdaptiveRateLimiter, Priority, estimate_tokens, llm_priority  # noqa: E402
+from services.storage import create_storage_client  # noqa: E402
+
+WRITE_BATCH_SIZE = 500
+DEFAULT_CHECKPOINT = os.path.join(BACKEND_DIR, "reanalyze_checkpoint.json")
+
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    checkpoint["updated_at"] = datetime.now(timezone.utc).isoformat()
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def calls_query(
+    supabase: Any, agent_version: Optional[str], columns: str = "id, transcript, outcome, created_at", **select: Any
+):
+    query = supabase.table("calls").select(columns, **select).in_("outcome", list(DECIDED))
+    if agent_version:
+        query = query.eq("agent_version", agent_version)
+    return query
+
+
+def fetch_page(
+    supabase: Any, after: Optional[Dict[str, str]], page_size: int, agent_version: Optional[str]
+) -> List[Dict[str, Any]]:
+    """Next page ordered by (created_at, id), strictly after the `after` key."""
+    return fetch_keyset_page(lambda: calls_query(supabase, agent_version), after, page_size)
+
+
+async def analyze(
+    call: Dict[str, Any], supabase: Any, openai_client: openai.AsyncAzureOpenAI, model: str
+) -> Tuple[Optional[Dict[str, Any]], int]:
+    """(call_learnings row or None on failure, estimated tokens)."""
+    request = await asyncio.to_thread(
+        build_analysis_request, supabase, call.get("transcript") or "", call["outcome"], model, call["id"]
+    )
+    try:
+        # Waits for the shared rate limiter; 429s and transient errors are retried there
+        learning = await complete_json_async(openai_client, **request)
+    except (openai.APIError, json.JSONDecodeError) as e:
+        print(f"❌ {call['id']}: {e}")
+        return None, estimate_tokens(request)
+    return learning_row(call["id"], call["outcome"], learning), estimate_tokens(request)
+
+
+def write_learnings(supabase: Any, rows: List[Dict[str, Any]]) -> None:
+    """Replace the learnings of these calls: one delete and one insert per batch."""
+    for start in range(0, len(rows), WRITE_BATCH_SIZE):
+        batch = rows[start:start + WRITE_BATCH_SIZE]
+        delete_learnings_for_calls(supabase, [row["call_id"] for row in batch])
+        insert_learnings(supabase, batch)
+
+
+def rebuild_patterns(supabase: Any, embeddings: Optional[EmbeddingIndex]) -> None:
+    """
+    Replace every call-analysis pattern by replaying all call learnings, oldest first,
+    through the same matching the API uses. A learning close to an existing pattern
+    confirms it; otherwise it starts a new one. Patterns from other sources are kept.
+    """
+    index = PatternIndex()
+    if embeddings is not None:
+        index.attach_embeddings(embeddings)
+    index.load([], [])
+    rows: Dict[str, Dict[str, Any]] = {}
+    learnings = iter_learnings(supabase, "what_worked, what_failed, key_phrase, outcome, created_at")
+    with index.lock:
+        for learning in learnings:
+            outcome = learning.get("outcome")
+            index.record_learning(learning.get("what_worked") or "", outcome)
+            text, pattern_type = (
+                (learning.get("what_worked"), "success_pattern")
+                if outcome == "booked"
+                else (learning.get("what_failed"), "failure_pattern")
+            )
+            similar = index.find_similar(text, pattern_type) if text else None
+            confirms = [similar["pattern_description"]] if similar else []
+            now = learning.get("created_at") or datetime.now(timezone.utc).isoformat()
+            for row in plan_pattern_updates(index, {**learning, "confirms_patterns": confirms}, outcome, now):
+                index.upsert(row)
+                rows[row["id"]] = row
+
+    now = datetime.now(timezone.utc).isoformat()
+    retired = [
+        {**row, "is_active": False, "updated_at": now}
+        for row in iter_active_patterns(supabase)
+        if (row.get("pattern_data") or {}).get("source") == "call_analysis"
+    ]
+    writes = retired + list(rows.values())
+    for start in range(0, len(writes), WRITE_BATCH_SIZE):
+        upsert_patterns(supabase, writes[start:start + WRITE_BATCH_SIZE])
+    print(f"🧩 Rebuilt learning patterns: {len(retired)} retired, {len(rows)} active")
+
+
+async def run(args: argparse.Namespace, supabase: Any, openai_client: Optional[openai.AsyncAzureOpenAI]) -> None:
+    if args.resume:
+        checkpoint = load_checkpoint(args.checkpoint)
+        if checkpoint.get("agent_version") != args.agent_version:
+            sys.exit(f"Checkpoint was written for agent version {checkpoint.get('agent_version')!r}")
+        print(f"↩️ Resuming after {checkpoint['after']} ({checkpoint['analyzed']} calls done)")
+    else:
+        checkpoint = {
+            "agent_version": args.agent_version,
+            "model": args.model,
+            "after": None,
+            "analyzed": 0,
+            "failed": [],
+            "estimated_tokens": 0,
+            "completed": False,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+    if not checkpoint["completed"]:
+        semaphore = asyncio.Semaphore(args.concurrency)
+        started = time.perf_counter()
+        analyzed_this_run = 0
+
+        async def bounded(call: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], int]:
+            async with semaphore:
+                return await analyze(call, supabase, openai_client, args.model)
+
+        while args.limit is None or analyzed_this_run < args.limit:
+            page_size = args.page_size if args.limit is None else min(args.page_size, args.limit - analyzed_this_run)
+            page = await asyncio.to_thread(fetch_page, supabase, checkpoint["after"], page_size, args.agent_version)
+            if not page:
+                checkpoint["completed"] = True
+                break
+            results = await asyncio.gather(*(bounded(call) for call in page))
+            rows = [row for row, _ in results if row is not None]
+            await asyncio.to_thread(write_learnings, supabase, rows)
+
+            checkpoint["after"] = {"created_at": page[-1]["created_at"], "id": page[-1]["id"]}
+            checkpoint["analyzed"] += len(rows)
+            checkpoint["failed"] += [call["id"] for call, (row, _) in zip(page, results) if row is None]
+            checkpoint["estimated_tokens"] += sum(tokens for _, tokens in results)
+            save_checkpoint(args.checkpoint, checkpoint)
+            analyzed_this_run += len(page)
+            elapsed = time.perf_counter() - started
+            limiter = rate_limiter_status()
+            print(
+                f"📄 {checkpoint['analyzed']} analyzed, {len(checkpoint['failed'])} failed, "
+                f"~{checkpoint['estimated_tokens']} tokens ({analyzed_this_run / elapsed:.1f} calls/s"
+                + (
+                    f", concurrency {limiter['concurrency_limit']}, {limiter['rate_limited']} rate limited)"
+                    if limiter["enabled"]
+                    else ")"
+                )
+            )
+        save_checkpoint(args.checkpoint, checkpoint)
+
+    if not checkpoint["completed"]:
+        print("⏸️ Stopped at --limit; pass --resume to continue")
+        return
+    if checkpoint["failed"]:
+        print(f"⚠️ {len(checkpoint['failed'])} calls failed and kept their previous learnings: see {args.checkpoint}")
+    if args.skip_patterns:
+        return
+    embeddings = None
+    if os.getenv("PATTERN_EMBEDDINGS_ENABLED", "true").lower() in {"1", "true", "yes"}:
+        threshold = os.getenv("PATTERN_SIMILARITY_THRESHOLD")
+        embeddings = EmbeddingIndex(None, args.embedder, float(threshold) if threshold else None)
+    await asyncio.to_thread(rebuild_patterns, supabase, embeddings)
+    print("✅ Re-analysis complete; restart the API to reload learnings and patterns")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-run call analysis over historical calls")
+    parser.add_argument("--concurrency", type=int, default=8, help="analyses in flight at once")
+    parser.add_argument("--rpm", type=int, default=60, help="completion requests per minute")
+    parser.add_argument("--tpm", type=int, default=90000, help="estimated tokens per minute")
+    parser.add_argument("--page-size", type=int, default=100, help="calls read, analyzed and written per page")
+    parser.add_argument("--max-attempts", type=int, default=5, help="tries per call on rate limits and transient errors")
+    parser.add_argument("--limit", type=int, help="stop after this many calls (resume later with --resume)")
+    parser.add_argument("--agent-version", help="only calls made with this agent version")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="progress file")
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint file")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint and start over")
+    parser.add_argument("--skip-patterns", action="store_true", help="do not rebuild learning patterns at the end")
+    parser.add_argument("--dry-run", action="store_true", help="count the calls and estimate tokens, then exit")
+    args = parser.parse_args()
+
+    load_dotenv(os.path.join(BACKEND_DIR, ".env"))
+    if os.path.exists(args.checkpoint) and not (args.resume or args.restart or args.dry_run):
+        sys.exit(f"{args.checkpoint} exists: pass --resume to continue it or --restart to start over")
+    if args.resume and not os.path.exists(args.checkpoint):
+        sys.exit(f"No checkpoint at {args.checkpoint}")
+
+    backend = os.getenv("STORAGE_BACKEND", "supabase").lower()
+    supabase = create_storage_client(
+        backend,
+        os.getenv("SUPABASE_URL"),
+        os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("service_role_key"),
+        os.getenv("SQLITE_DB_PATH", os.path.join(BACKEND_DIR, "ruya.db")),
+    )
+    args.model = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o")
+    api_key, endpoint = os.getenv("AZURE_OPENAI_API_KEY"), os.getenv("AZURE_OPENAI_ENDPOINT")
+    api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2025-01-01-preview")
+    deployment = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
+    embeddings_client = None
+    if deployment:
+        embeddings_client = openai.AzureOpenAI(api_key=api_key, api_version=api_version, azure_endpoint=endpoint)
+    args.embedder = create_embedder(embeddings_client, deployment)
+
+    if args.dry_run:
+        total = calls_query(supabase, args.agent_version, "id", count="exact", head=True).execute().count or 0
+        sample = calls_query(supabase, args.agent_version).order("created_at", desc=True).limit(20).execute().data or []
+        estimates = [
+            estimate_tokens(build_analysis_request(supabase, c.get("transcript") or "", c["outcome"], args.model))
+            for c in sample
+        ]
+        per_call = sum(estimates) / len(estimates) if estimates else 0
+        print(f"🔎 {total} calls to re-analyze, ~{int(per_call)} tokens each (~{int(per_call * total)} total)")
+        if per_call:
+            minutes = max(total / args.rpm, per_call * total / args.tpm)
+            print(f"   at {args.rpm} rpm / {args.tpm} tpm: ~{minutes:.0f} minutes")
+        return
+
+    if not api_key or not endpoint:
+        sys.exit("Missing Azure OpenAI configuration")
+    if os.getenv("SIMILAR_CALLS_ENABLED", "true").lower() in {"1", "true", "yes"}:
+        # In memory: the API process owns the persisted call index
+        similar_calls.attach_embeddings(EmbeddingIndex(None, args.embedder))
+    openai_client = openai.AsyncAzureOpenAI(
+        api_key=api_key,
+        api_version=api_version,
+        azure_endpoint=endpoint,
+        # Retried in services.llm, under the rate limiter
+        max_retries=0,
+        http_client=openai.DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        ),
+    )
+
+    set_rate_limiter(AdaptiveRateLimiter(args.rpm, args.tpm, max_concurrency=args.concurrency), args.max_attempts)
+
+    async def run_and_close() -> None:
+        try:
+            with llm_priority(Priority.BATCH):
+                await run(args, supabase, openai_client)
+        finally:
+            await openai_client.close()
+
+    asyncio.run(run_and_close())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,274 @@
+"""
+Webhook test and load generator for POST /webhook/call-completed.
+
+With no options it sends one synthetic call and prints the response. With --requests or
+--duration it becomes an open-loop load generator: requests are dispatched on an arrival
+schedule (constant, ramp or burst) regardless of how fast the server answers, optionally
+re-sending earlier call ids to mimic Vapi retries, and a latency histogram plus an error
+breakdown are printed at the end.
+
+Examples:
+    python scripts/test_webhook.py
+    python scripts/test_webhook.py --rps 50 --duration 60 --concurrency 200
+    python scripts/test_webhook.py --schedule ramp --rps 10 --ramp-to 200 --duration 120
+    python scripts/test_webhook.py --schedule burst --burst-size 500 --burst-interval 10 --duration 60
+    python scripts/test_webhook.py --rps 100 --duration 30 --duplicate-rate 0.1 --json report.json
+"""
+import argparse
+import asyncio
 import json
+import math
+import random
 import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
 
 import httpx
 
+AGENT_LINES = [
+    "Hi! This is Sarah calling from Premier Realty. How are you doing today?",
+    "I saw you expressed interest in viewing properties in the area.",
+    "What type of property are you looking for - a house, condo, or townhouse?",
+    "What is your ideal timeline for moving?",
+    "I completely understand budget is important.",
+    "I have openings this week - would Thursday afternoon or Saturday morning work better?",
+    "No pressure at all! Even if you are just starting to look, a viewing helps.",
+    "I can send you photos and schedule something for next week.",
+]
+CUSTOMER_LINES = [
+    "Not interested right now.",
+    "Maybe, what's the price range?",
+    "We're only starting to look.",
+    "Saturday morning works.",
+    "Can you send me some photos first?",
+    "I already have an agent.",
+    "How far is it from the station?",
+    "That sounds good, let's do Thursday.",
+]
 
-def main() -> None:
-    payload = {
+# Histogram bucket upper bounds in milliseconds
+BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, math.inf]
+
+
+def synthetic_transcript(rng: random.Random, median_turns: float = 12.0, sigma: float = 0.6) -> str:
+    """Agent/customer transcript whose length follows a log-normal distribution of turns."""
+    turns = int(min(200, max(1, rng.lognormvariate(math.log(median_turns), sigma))))
+    lines = []
+    for _ in range(turns):
+        lines.append(f"Agent: {rng.choice(AGENT_LINES)}")
+        lines.append(f"Customer: {rng.choice(CUSTOMER_LINES)}")
+    return " ".join(lines)
+
+
+def build_payload(rng: random.Random, call_id: Optional[str] = None) -> Dict[str, Any]:
+    started = datetime.now(timezone.utc) - timedelta(seconds=rng.randint(60, 900))
+    ended = started + timedelta(seconds=rng.randint(30, 600))
+    return {
         "call": {
-            "id": f"test-call-{int(time.time())}",
-            "startedAt": "2026-02-14T10:00:00Z",
-            "endedAt": "2026-02-14T10:03:00Z",
-            "transcript": "Agent: Hi there. Customer: Not interested right now.",
+            "id": call_id or f"test-call-{uuid.uuid4()}",
+            "startedAt": started.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "endedAt": ended.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "transcript": synthetic_transcript(rng),
             "status": "ended",
             "type": "webCall",
         }
     }
 
+
+def arrival_times(args: argparse.Namespace) -> List[float]:
+    """Dispatch offsets in seconds from the start of the run, for the chosen schedule."""
+    if args.schedule == "burst":
+        times: List[float] = []
+        t = 0.0
+        while t < args.duration and (not args.requests or len(times) < args.requests):
+            times.extend([t] * args.burst_size)
+            t += args.burst_interval
+        return times[: args.requests] if args.requests else times
+
+    times = []
+    t = 0.0
+    limit = args.requests or math.inf
+    while len(times) < limit:
+        if args.schedule == "ramp" and args.duration:
+            rate = args.rps + (args.ramp_to - args.rps) * min(1.0, t / args.duration)
+        else:
+            rate = args.rps
+        if rate <= 0:
+            break
+        if args.duration and t >= args.duration:
+            break
+        times.append(t)
+        t += 1.0 / rate
+    return times
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered), max(1, math.ceil(pct / 100.0 * len(ordered)))) - 1]
+
+
+class LoadReport:
+    def __init__(self) -> None:
+        self.latencies_ms: List[float] = []
+        self.lag_ms: List[float] = []
+        self.outcomes: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.duplicates_sent = 0
+        self.duplicates_acknowledged = 0
+        self.retries = 0
+
+    def record(self, latency_ms: float, lag_ms: float, outcome: str, body: Optional[Dict[str, Any]]) -> None:
+        self.latencies_ms.append(latency_ms)
+        self.lag_ms.append(lag_ms)
+        self.outcomes[outcome] += 1
+        if outcome != "200":
+            self.errors[outcome] += 1
+        if body and body.get("duplicate"):
+            self.duplicates_acknowledged += 1
+
+    def histogram(self) -> List[Dict[str, Any]]:
+        counts = [0] * len(BUCKETS_MS)
+        for value in self.latencies_ms:
+            counts[next(i for i, bound in enumerate(BUCKETS_MS) if value <= bound)] += 1
+        return [{"le_ms": bound if bound != math.inf else "inf", "count": c} for bound, c in zip(BUCKETS_MS, counts)]
+
+    def summary(self, wall_seconds: float) -> Dict[str, Any]:
+        total = len(self.latencies_ms)
+        return {
+            "requests": total,
+            "wall_seconds": round(wall_seconds, 3),
+            "achieved_rps": round(total / wall_seconds, 2) if wall_seconds else 0.0,
+            "success": self.outcomes.get("200", 0),
+            "errors": dict(self.errors),
+            "error_rate": round(sum(self.errors.values()) / total, 4) if total else 0.0,
+            "duplicates_sent": self.duplicates_sent,
+            "duplicates_acknowledged": self.duplicates_acknowledged,
+            "retries": self.retries,
+            "latency_ms": {f"p{p}": round(percentile(self.latencies_ms, p), 2) for p in (50, 90, 95, 99, 99.9)},
+            "max_latency_ms": round(max(self.latencies_ms), 2) if self.latencies_ms else 0.0,
+            # How far behind schedule requests were dispatched (client saturation / concurrency cap)
+            "dispatch_lag_ms": {f"p{p}": round(percentile(self.lag_ms, p), 2) for p in (50, 99)},
+            "histogram": self.histogram(),
+        }
+
+
+def print_report(summary: Dict[str, Any]) -> None:
+    print(
+        f"\n{summary['requests']} requests in {summary['wall_seconds']}s "
+        f"({summary['achieved_rps']} req/s), {summary['success']} OK, error rate {summary['error_rate']:.2%}"
+    )
+    print("Latency ms: " + "  ".join(f"{k}={v}" for k, v in summary["latency_ms"].items()))
+    print("Dispatch lag ms: " + "  ".join(f"{k}={v}" for k, v in summary["dispatch_lag_ms"].items()))
+    print(
+        f"Duplicates: sent {summary['duplicates_sent']}, acknowledged as duplicate "
+        f"{summary['duplicates_acknowledged']}; retries {summary['retries']}"
+    )
+    peak = max((b["count"] for b in summary["histogram"]), default=0) or 1
+    print("\nLatency histogram:")
+    for bucket in summary["histogram"]:
+        label = f"<= {bucket['le_ms']} ms" if bucket["le_ms"] != "inf" else "> 10000 ms"
+        print(f"  {label:>12} | {'#' * int(40 * bucket['count'] / peak):<40} {bucket['count']}")
+    if summary["errors"]:
+        print("\nErrors:")
+        for kind, count in sorted(summary["errors"].items(), key=lambda item: -item[1]):
+            print(f"  {kind}: {count}")
+
+
+async def run_load(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    url = f"{args.url.rstrip('/')}/webhook/call-completed"
+    schedule = arrival_times(args)
+    report = LoadReport()
+    sent_ids: List[str] = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+
+        async def send(payload: Dict[str, Any], scheduled: float, start: float) -> None:
+            async with semaphore:
+                dispatched = time.perf_counter()
+                outcome, body = "", None
+                for attempt in range(args.retries + 1):
+                    try:
+                        res = await client.post(url, json=payload)
+                        outcome = str(res.status_code)
+                        try:
+                            body = res.json()
+                        except ValueError:
+                            body = None
+                    except httpx.HTTPError as e:
+                        outcome = type(e).__name__
+                    if outcome == "200" or (outcome.isdigit() and int(outcome) < 500):
+                        break
+                    if attempt < args.retries:
+                        report.retries += 1
+                        await asyncio.sleep(min(10.0, 0.5 * 2**attempt))
+                done = time.perf_counter()
+                report.record((done - dispatched) * 1000, (dispatched - start - scheduled) * 1000, outcome, body)
+
+        tasks = []
+        start = time.perf_counter()
+        for offset in schedule:
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if sent_ids and rng.random() < args.duplicate_rate:
+                payload = build_payload(rng, call_id=rng.choice(sent_ids))
+                report.duplicates_sent += 1
+            else:
+                payload = build_payload(rng)
+                sent_ids.append(payload["call"]["id"])
+            tasks.append(asyncio.create_task(send(payload, offset, start)))
+        await asyncio.gather(*tasks)
+        wall = time.perf_counter() - start
+    return report.summary(wall)
+
+
+def send_single(url: str) -> None:
+    payload = build_payload(random.Random())
     with httpx.Client(timeout=20) as client:
-        res = client.post("http://localhost:3000/webhook/call-completed", json=payload)
+        res = client.post(f"{url.rstrip('/')}/webhook/call-completed", json=payload)
         print(res.status_code)
         print(json.dumps(res.json(), indent=2))
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Send test calls to the call-completed webhook")
+    parser.add_argument("--url", default="http://localhost:3000", help="backend base URL")
+    parser.add_argument("--requests", type=int, default=0, help="total requests (0 = bounded by --duration)")
+    parser.add_argument("--duration", type=float, default=0.0, help="run length in seconds")
+    parser.add_argument("--rps", type=float, default=10.0, help="arrival rate (start rate for ramps)")
+    parser.add_argument("--schedule", choices=["constant", "ramp", "burst"], default="constant")
+    parser.add_argument("--ramp-to", type=float, default=100.0, help="final arrival rate for --schedule ramp")
+    parser.add_argument("--burst-size", type=int, default=100, help="requests per burst")
+    parser.add_argument("--burst-interval", type=float, default=5.0, help="seconds between bursts")
+    parser.add_argument("--concurrency", type=int, default=100, help="max requests in flight")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0, help="fraction of requests re-sending an earlier call id")
+    parser.add_argument("--retries", type=int, default=0, help="client retries on 5xx/connection errors")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", dest="json_path", help="also write the report as JSON")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if not args.requests and not args.duration:
+        send_single(args.url)
+        return
+    if args.schedule == "burst" and not args.duration:
+        args.duration = args.burst_interval * math.ceil(args.requests / max(1, args.burst_size))
+    summary = asyncio.run(run_load(args))
+    print_report(summary)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
 if __name__ == "__main__":
     main()
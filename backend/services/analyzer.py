@@ -1,82 +1,58 @@
 """Advanced call analysis service - agentic learning from historical patterns."""
-import json
+import asyncio
+import os
+import uuid
 from collections import Counter
-from typing import Dict, List, Optional
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
 
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI, AzureOpenAI
 from supabase import Client
 
+from .call_index import similar_calls
+from .context_store import historical_context
+from .counters import call_counters
+from .learning_stats import learning_stats
+from .llm import complete_json, complete_json_async
+from .pattern_index import PatternIndex, pattern_index
+from .prompt_builder import invalidate_prompt
+from .repositories import active_patterns, insert_learnings, upsert_patterns
+from .synthesis_store import synthesis_store
+from .trend_engine import trend_aggregator
 
-def get_historical_context(supabase: Client, limit: int = 20) -> Dict:
-    """Get historical context from past calls for comparative analysis."""
-    # Get recent successful calls
-    successful_calls = (
-        supabase.table("calls")
-        .select("transcript, outcome, created_at")
-        .eq("outcome", "booked")
-        .order("created_at", desc=True)
-        .limit(limit)
-        .execute()
-    )
-
-    # Get recent failed calls
-    failed_calls = (
-        supabase.table("calls")
-        .select("transcript, outcome, created_at")
-        .eq("outcome", "not_booked")
-        .order("created_at", desc=True)
-        .limit(limit)
-        .execute()
-    )
+SIMILAR_CALLS_K = int(os.getenv("SIMILAR_CALLS_K", "3"))
 
-    # Get existing patterns
-    patterns = (
-        supabase.table("learning_patterns")
-        .select("*")
-        .eq("is_active", True)
-        .order("confidence_score", desc=True)
-        .limit(10)
-        .execute()
-    )
 
-    # Get historical learnings
-    learnings = (
-        supabase.table("call_learnings")
-        .select("what_worked, what_failed, key_phrase, objection_types, engagement_level")
-        .order("created_at", desc=True)
-        .limit(30)
-        .execute()
-    )
-
-    return {
-        "successful_calls": successful_calls.data or [],
-        "failed_calls": failed_calls.data or [],
-        "patterns": patterns.data or [],
-        "learnings": learnings.data or [],
-    }
+def get_historical_context(supabase: Client, limit: int = 20) -> Dict:
+    """Get historical context from past calls for comparative analysis (served from memory)."""
+    return historical_context.snapshot(supabase, limit)
 
 
-def analyze_call_with_context(
+def build_analysis_request(
+    supabase: Client,
     transcript: str,
     outcome: str,
-    openai_client: AzureOpenAI,
-    supabase: Client,
-    call_id: str,
     model_name: str = "gpt-4o",
-) -> Dict:
-    """
-    Analyze call with full historical context - compares against past patterns.
-    This is the agentic, self-improving analysis that learns from all previous calls.
-    """
+    call_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Build the completion request for a context-aware call analysis."""
     # Get historical context
     history = get_historical_context(supabase, limit=15)
 
+    # Example calls: the past calls most similar to this one when the call index is enabled,
+    # otherwise the most recent ones
+    similar = similar_calls.similar(supabase, transcript, k=SIMILAR_CALLS_K, exclude=call_id)
+    if similar is not None:
+        examples, label = similar, f"most similar {SIMILAR_CALLS_K}"
+    else:
+        examples, label = history, "last 5"
+
     # Build context summary for GPT
     successful_examples = "\n".join(
-        [f"SUCCESS {i+1}: {call.get('transcript', '')[:200]}..." for i, call in enumerate(history["successful_calls"][:5])]
+        [f"SUCCESS {i+1}: {call.get('transcript', '')[:200]}..." for i, call in enumerate(examples["successful_calls"][:5])]
     )
     failed_examples = "\n".join(
-        [f"FAILED {i+1}: {call.get('transcript', '')[:200]}..." for i, call in enumerate(history["failed_calls"][:5])]
+        [f"FAILED {i+1}: {call.get('transcript', '')[:200]}..." for i, call in enumerate(examples["failed_calls"][:5])]
     )
 
     # Extract common patterns from learnings
@@ -104,10 +80,10 @@ CURRENT CALL TRANSCRIPT:
 {transcript}
 
 HISTORICAL CONTEXT:
-Successful calls (last 5):
+Successful calls ({label}):
 {successful_examples}
 
-Failed calls (last 5):
+Failed calls ({label}):
 {failed_examples}
 
 Common patterns that worked (from {len(what_worked_list)} past calls):
@@ -146,133 +122,169 @@ Return detailed JSON:
 
 Be specific and reference historical patterns."""
 
-    response = openai_client.chat.completions.create(
-        model=model_name,
-        messages=[
+    return {
+        "model": model_name,
+        "messages": [
             {
                 "role": "system",
                 "content": "You are an advanced sales call analyst that learns from historical patterns. Return detailed JSON only.",
             },
             {"role": "user", "content": analysis_prompt},
         ],
-        response_format={"type": "json_object"},
-        temperature=0.7,
-        max_tokens=2000,
-    )
+        "temperature": 0.7,
+        "max_tokens": 2000,
+    }
+
+
+def analyze_call_with_context(
+    transcript: str,
+    outcome: str,
+    openai_client: AzureOpenAI,
+    supabase: Client,
+    call_id: str,
+    model_name: str = "gpt-4o",
+) -> Dict:
+    """
+    Analyze call with full historical context - compares against past patterns.
+    This is the agentic, self-improving analysis that learns from all previous calls.
+    """
+    request = build_analysis_request(supabase, transcript, outcome, model_name, call_id)
+    learning = complete_json(openai_client, **request)
+    store_learning(supabase, call_id, outcome, learning)
+    return learning
+
+
+async def analyze_call_with_context_async(
+    transcript: str,
+    outcome: str,
+    openai_client: AsyncAzureOpenAI,
+    supabase: Client,
+    call_id: str,
+    model_name: str = "gpt-4o",
+) -> Dict:
+    """Async variant of `analyze_call_with_context`; Supabase work runs in a worker thread."""
+    request = await asyncio.to_thread(build_analysis_request, supabase, transcript, outcome, model_name, call_id)
+    learning = await complete_json_async(openai_client, **request)
+    await asyncio.to_thread(store_learning, supabase, call_id, outcome, learning)
+    return learning
 
-    content = response.choices[0].message.content or "{}"
-    learning = json.loads(content)
 
+def learning_row(call_id: str, outcome: str, learning: Dict) -> Dict[str, Any]:
+    """call_learnings row for an analysis result."""
+    return {
+        "call_id": call_id,
+        "outcome": outcome,
+        "what_worked": learning.get("what_worked", ""),
+        "what_failed": learning.get("what_failed", ""),
+        "key_phrase": learning.get("key_phrase", ""),
+        "objection_types": learning.get("objection_types", []),
+        "engagement_level": learning.get("engagement_level", "medium"),
+        "conversion_factors": learning.get("conversion_factors", {}),
+    }
+
+
+def store_learning(supabase: Client, call_id: str, outcome: str, learning: Dict) -> None:
+    """Persist an analysis as a call learning and fold it into the pattern table."""
     # Store detailed learning
-    supabase.table("call_learnings").insert(
-        {
-            "call_id": call_id,
-            "outcome": outcome,
-            "what_worked": learning.get("what_worked", ""),
-            "what_failed": learning.get("what_failed", ""),
-            "key_phrase": learning.get("key_phrase", ""),
-            "objection_types": learning.get("objection_types", []),
-            "engagement_level": learning.get("engagement_level", "medium"),
-            "conversion_factors": learning.get("conversion_factors", {}),
-        }
-    ).execute()
+    row = learning_row(call_id, outcome, learning)
+    inserted = insert_learnings(supabase, [row])
+    learning_stats.record_learning((inserted or [row])[0])
+    historical_context.record_learning(row)
+    pattern_index.record_learning(row["what_worked"], outcome)
+    trend_aggregator.record_learning(row["objection_types"])
+    call_counters.record_learning(supabase)
+    synthesis_store.record_learning()
+    invalidate_prompt()
 
     # Update or create patterns based on this learning
     update_patterns_from_learning(supabase, learning, outcome)
 
-    return learning
-
 
 def update_patterns_from_learning(supabase: Client, learning: Dict, outcome: str) -> None:
-    """Update learning patterns database based on new call analysis."""
+    """
+    Update learning patterns database based on new call analysis.
+    Matching runs against the in-memory pattern index; every resulting insert and update
+    goes to Supabase as one batched upsert.
+    """
+    pattern_index.ensure_seeded(supabase)
+    now = datetime.now(timezone.utc).isoformat()
+
+    with pattern_index.lock:
+        rows = plan_pattern_updates(pattern_index, learning, outcome, now)
+        if not rows:
+            return
+
+        upsert_patterns(supabase, rows)
+        for row in rows:
+            pattern_index.upsert(row)
+            historical_context.record_pattern(row)
+    invalidate_prompt()
+
+
+def plan_pattern_updates(index: PatternIndex, learning: Dict, outcome: str, now: str) -> List[Dict]:
+    """
+    Pattern rows to insert or update for one analysis, matched against `index` (which is
+    left unchanged). Call with `index.lock` held and apply the rows once they are written.
+    """
     what_worked = learning.get("what_worked", "")
     what_failed = learning.get("what_failed", "")
     confirms = learning.get("confirms_patterns", [])
-    contradicts = learning.get("contradicts_patterns", [])
+    changed: Dict[str, Dict] = {}
 
     # Update confirmed patterns (increase confidence)
     for pattern_desc in confirms:
-        existing = (
-            supabase.table("learning_patterns")
-            .select("*")
-            .eq("pattern_description", pattern_desc)
-            .eq("is_active", True)
-            .limit(1)
-            .execute()
-        )
-
-        if existing.data:
-            pattern = existing.data[0]
-            new_frequency = pattern.get("frequency", 1) + 1
-            # Update confidence based on frequency and outcome
-            confidence_boost = 0.1 if outcome == "booked" else 0.05
-            new_confidence = min(1.0, pattern.get("confidence_score", 0) + confidence_boost)
-
-            supabase.table("learning_patterns").update(
-                {
-                    "frequency": new_frequency,
-                    "confidence_score": new_confidence,
-                    "last_seen_at": "now()",
-                    "updated_at": "now()",
-                }
-            ).eq("id", pattern["id"]).execute()
+        existing = index.find_by_description(pattern_desc)
+        if not existing:
+            continue
+        pattern = changed.get(existing["id"], existing)
+        new_frequency = (pattern.get("frequency") or 1) + 1
+        # Update confidence based on frequency and outcome
+        confidence_boost = 0.1 if outcome == "booked" else 0.05
+        new_confidence = min(1.0, (pattern.get("confidence_score") or 0) + confidence_boost)
+        changed[pattern["id"]] = {
+            **pattern,
+            "frequency": new_frequency,
+            "confidence_score": new_confidence,
+            "last_seen_at": now,
+            "updated_at": now,
+        }
 
     # Create new pattern if what_worked is significant
-    if what_worked and outcome == "booked":
-        # Check if similar pattern exists
-        similar = (
-            supabase.table("learning_patterns")
-            .select("*")
-            .ilike("pattern_description", f"%{what_worked[:50]}%")
-            .eq("pattern_type", "success_pattern")
-            .limit(1)
-            .execute()
+    if what_worked and outcome == "booked" and not index.find_similar(what_worked, "success_pattern"):
+        new_pattern = _new_pattern_row(
+            "success_pattern",
+            what_worked,
+            {"source": "call_analysis", "key_phrase": learning.get("key_phrase", "")},
+            # Success rate across similar past learnings
+            index.learning_success_rate(what_worked),
+            now,
         )
-
-        if not similar.data:
-            # Calculate success rate for this pattern
-            similar_learnings = (
-                supabase.table("call_learnings")
-                .select("outcome")
-                .ilike("what_worked", f"%{what_worked[:50]}%")
-                .execute()
-            )
-            similar_outcomes = [l.get("outcome") for l in (similar_learnings.data or [])]
-            success_rate = sum(1 for o in similar_outcomes if o == "booked") / len(similar_outcomes) if similar_outcomes else 0.5
-
-            supabase.table("learning_patterns").insert(
-                {
-                    "pattern_type": "success_pattern",
-                    "pattern_description": what_worked,
-                    "pattern_data": {"source": "call_analysis", "key_phrase": learning.get("key_phrase", "")},
-                    "frequency": 1,
-                    "success_rate": success_rate,
-                    "confidence_score": 0.3,  # Start with low confidence, increases with confirmations
-                }
-            ).execute()
+        changed[new_pattern["id"]] = new_pattern
 
     # Create failure pattern
-    if what_failed and outcome == "not_booked":
-        similar = (
-            supabase.table("learning_patterns")
-            .select("*")
-            .ilike("pattern_description", f"%{what_failed[:50]}%")
-            .eq("pattern_type", "failure_pattern")
-            .limit(1)
-            .execute()
-        )
+    if what_failed and outcome == "not_booked" and not index.find_similar(what_failed, "failure_pattern"):
+        new_pattern = _new_pattern_row("failure_pattern", what_failed, {"source": "call_analysis"}, 0.0, now)
+        changed[new_pattern["id"]] = new_pattern
 
-        if not similar.data:
-            supabase.table("learning_patterns").insert(
-                {
-                    "pattern_type": "failure_pattern",
-                    "pattern_description": what_failed,
-                    "pattern_data": {"source": "call_analysis"},
-                    "frequency": 1,
-                    "success_rate": 0.0,
-                    "confidence_score": 0.3,
-                }
-            ).execute()
+    return list(changed.values())
+
+
+def _new_pattern_row(pattern_type: str, description: str, pattern_data: Dict, success_rate: float, now: str) -> Dict:
+    """Full learning_patterns row; ids are generated client-side so inserts batch with updates."""
+    return {
+        "id": str(uuid.uuid4()),
+        "pattern_type": pattern_type,
+        "pattern_description": description,
+        "pattern_data": pattern_data,
+        "frequency": 1,
+        "success_rate": success_rate,
+        "confidence_score": 0.3,  # Start with low confidence, increases with confirmations
+        "first_seen_at": now,
+        "last_seen_at": now,
+        "is_active": True,
+        "created_at": now,
+        "updated_at": now,
+    }
 
 
 def get_learnings(supabase: Client, limit: int = 10) -> Dict[str, List[str]]:
@@ -280,41 +292,26 @@ def get_learnings(supabase: Client, limit: int = 10) -> Dict[str, List[str]]:
     Get comprehensive learnings from historical data, weighted by confidence.
     """
     # Get high-confidence patterns
-    patterns = (
-        supabase.table("learning_patterns")
-        .select("*")
-        .eq("is_active", True)
-        .order("confidence_score", desc=True)
-        .order("frequency", desc=True)
-        .limit(20)
-        .execute()
-    )
+    patterns = active_patterns(supabase, order=("confidence_score", "frequency"), limit=20)
 
     success_patterns = [
         p.get("pattern_description", "")
-        for p in (patterns.data or [])
+        for p in patterns
         if p.get("pattern_type") == "success_pattern" and p.get("confidence_score", 0) > 0.4
     ]
 
     failure_patterns = [
         p.get("pattern_description", "")
-        for p in (patterns.data or [])
+        for p in patterns
         if p.get("pattern_type") == "failure_pattern" and p.get("confidence_score", 0) > 0.4
     ]
 
-    # Also get recent learnings as fallback
-    recent_learnings = (
-        supabase.table("call_learnings")
-        .select("what_worked, what_failed")
-        .order("created_at", desc=True)
-        .limit(limit)
-        .execute()
-    )
+    # Then the phrases most often behind bookings / lost calls across the whole history
+    stats = learning_stats.summary(supabase, top=limit)
+    what_worked = [entry["value"] for entry in stats["what_worked"]]
+    what_failed = [entry["value"] for entry in stats["what_failed"]]
 
-    what_worked = [l.get("what_worked", "") for l in (recent_learnings.data or []) if l.get("what_worked")]
-    what_failed = [l.get("what_failed", "") for l in (recent_learnings.data or []) if l.get("what_failed")]
-
-    # Combine patterns (high confidence) with recent learnings
+    # Combine patterns (high confidence) with the most frequent learnings
     combined_worked = list(dict.fromkeys(success_patterns + what_worked))  # Remove duplicates, preserve order
     combined_failed = list(dict.fromkeys(failure_patterns + what_failed))
 
@@ -329,47 +326,5 @@ def get_learnings(supabase: Client, limit: int = 10) -> Dict[str, List[str]]:
 
 
 def detect_trends(supabase: Client) -> Dict:
-    """Detect trends across multiple calls - agentic pattern detection."""
-    # Get conversion rates by time period
-    recent_calls = (
-        supabase.table("calls")
-        .select("outcome, created_at")
-        .order("created_at", desc=True)
-        .limit(50)
-        .execute()
-    )
-
-    if not recent_calls.data or len(recent_calls.data) < 10:
-        return {"trend": "insufficient_data", "message": "Need at least 10 calls to detect trends"}
-
-    # Analyze objection trends
-    recent_learnings = (
-        supabase.table("call_learnings")
-        .select("objection_types, outcome")
-        .order("created_at", desc=True)
-        .limit(30)
-        .execute()
-    )
-
-    objection_counter = Counter()
-    for learning in recent_learnings.data or []:
-        for obj_type in learning.get("objection_types", []):
-            objection_counter[obj_type] += 1
-
-    # Calculate recent conversion rate
-    recent_outcomes = [call.get("outcome") for call in recent_calls.data[:20]]
-    recent_conversion = sum(1 for o in recent_outcomes if o == "booked") / len(recent_outcomes) if recent_outcomes else 0
-
-    # Compare to older calls
-    older_outcomes = [call.get("outcome") for call in recent_calls.data[20:40]]
-    older_conversion = sum(1 for o in older_outcomes if o == "booked") / len(older_outcomes) if older_outcomes else 0
-
-    trend_direction = "improving" if recent_conversion > older_conversion else "declining" if recent_conversion < older_conversion else "stable"
-
-    return {
-        "trend": trend_direction,
-        "recent_conversion_rate": recent_conversion,
-        "previous_conversion_rate": older_conversion,
-        "top_objections": [obj for obj, count in objection_counter.most_common(5)],
-        "total_calls_analyzed": len(recent_calls.data),
-    }
+    """Detect trends across multiple calls - agentic pattern detection (served from the trend engine)."""
+    return trend_aggregator.detect(supabase)
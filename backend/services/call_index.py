@@ -0,0 +1,111 @@
+"""Similar call index - nearest-neighbour retrieval of past booked and failed calls by transcript."""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from supabase import Client
+
+from .repositories import iter_decided_calls
+
+DECIDED = ("booked", "not_booked")
+
+
+class SimilarCallIndex:
+    """
+    Embeddings of the most recent `max_calls` decided call transcripts, keyed by call id
+    and typed by outcome, so analysis can show the model the past calls closest to the one
+    it is analyzing instead of simply the latest ones. Seeded once (only transcripts missing
+    from the persisted embedding index are embedded), then updated as outcomes are recorded.
+    The API seeds it at startup in the background; until that finishes `similar` returns None
+    rather than waiting for it.
+    """
+
+    def __init__(self, max_calls: int = 20000, excerpt_chars: int = 200, embed_chars: int = 2000) -> None:
+        self.max_calls = max_calls
+        self.excerpt_chars = excerpt_chars
+        self.embed_chars = embed_chars
+        self.embeddings = None
+        self._lock = threading.RLock()
+        self._seeded = False
+        # call id -> {"id", "outcome", "transcript" (excerpt)}, oldest first
+        self._calls: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def attach_embeddings(self, embeddings) -> None:
+        with self._lock:
+            self.embeddings = embeddings
+
+    def ensure_seeded(self, supabase: Client) -> None:
+        if self._seeded or self.embeddings is None:
+            return
+        with self._lock:
+            if self._seeded:
+                return
+            rows: List[Dict[str, Any]] = []
+            for row in iter_decided_calls(supabase, "id, outcome, transcript", newest_first=True):
+                if row.get("transcript"):
+                    rows.append(row)
+                if len(rows) >= self.max_calls:
+                    break
+            for row in reversed(rows):
+                self._calls[row["id"]] = self._entry(row["id"], row["outcome"], row["transcript"])
+            self.embeddings.sync(
+                [(row["id"], row["outcome"], row["transcript"][: self.embed_chars]) for row in rows]
+            )
+            self._seeded = True
+
+    def _entry(self, call_id: str, outcome: str, transcript: str) -> Dict[str, Any]:
+        return {"id": call_id, "outcome": outcome, "transcript": transcript[: self.excerpt_chars]}
+
+    def record_call(self, call_id: str, outcome: str, transcript: str) -> None:
+        """Index a call once it has a decided outcome (re-indexed if the outcome changes)."""
+        if self.embeddings is None or not self._seeded or outcome not in DECIDED or not transcript:
+            return
+        with self._lock:
+            previous = self._calls.pop(call_id, None)
+            if previous is not None and previous["outcome"] != outcome:
+                self.embeddings.remove(call_id)
+            self._calls[call_id] = self._entry(call_id, outcome, transcript)
+            self.embeddings.add(call_id, outcome, transcript[: self.embed_chars])
+            while len(self._calls) > self.max_calls:
+                evicted, _ = self._calls.popitem(last=False)
+                self.embeddings.remove(evicted)
+            if self.embeddings.removed_rows() > max(1000, len(self._calls)):
+                self.embeddings.compact()
+
+    def similar(
+        self, supabase: Client, transcript: str, k: int = 3, exclude: Optional[str] = None
+    ) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        """
+        Up to `k` most similar booked and failed calls, as `{"successful_calls", "failed_calls"}`
+        excerpts, or None when no embedding index is attached.
+        """
+        if self.embeddings is None:
+            return None
+        if not self._seeded:
+            # Seeding in another thread: don't hold this analysis behind it
+            if not self._lock.acquire(blocking=False):
+                return None
+            try:
+                self.ensure_seeded(supabase)
+            finally:
+                self._lock.release()
+        result: Dict[str, List[Dict[str, Any]]] = {}
+        text = transcript[: self.embed_chars]
+        for outcome, key in (("booked", "successful_calls"), ("not_booked", "failed_calls")):
+            hits = self.embeddings.search(text, outcome, k=k + 1)
+            calls = []
+            for call_id, score in hits:
+                call = self._calls.get(call_id)
+                if call is None or call_id == exclude:
+                    continue
+                calls.append({**call, "similarity": round(score, 3)})
+            result[key] = calls[:k]
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._seeded = False
+            self._calls.clear()
+
+
+similar_calls = SimilarCallIndex()
@@ -0,0 +1,145 @@
+"""Historical context store - rolling in-memory window of the context fed to call analysis."""
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from supabase import Client
+
+from .repositories import active_patterns, recent_calls, recent_learnings
+
+LEARNING_FIELDS = ("what_worked", "what_failed", "key_phrase", "objection_types", "engagement_level")
+
+
+class HistoricalContextStore:
+    """
+    Keeps the recent booked/failed calls, recent learnings and top active patterns in memory.
+    It is seeded from Supabase once, then kept current by the code paths that write calls,
+    learnings and patterns, so analyses read context without any queries.
+    Transcripts are stored as short excerpts only.
+    """
+
+    def __init__(
+        self,
+        call_window: int = 30,
+        learning_window: int = 30,
+        pattern_window: int = 50,
+        excerpt_chars: int = 200,
+    ) -> None:
+        self.call_window = call_window
+        self.learning_window = learning_window
+        self.pattern_window = pattern_window
+        self.excerpt_chars = excerpt_chars
+
+        self._lock = threading.Lock()
+        self._seeded = False
+        self._calls: Dict[str, Deque[Dict[str, Any]]] = {
+            "booked": deque(maxlen=call_window),
+            "not_booked": deque(maxlen=call_window),
+        }
+        self._learnings: Deque[Dict[str, Any]] = deque(maxlen=learning_window)
+        self._patterns: Dict[str, Dict[str, Any]] = {}
+
+    def ensure_seeded(self, supabase: Client) -> None:
+        if self._seeded:
+            return
+        history = load_historical_context(supabase, self.call_window, self.learning_window, self.pattern_window)
+        with self._lock:
+            if self._seeded:
+                return
+            for outcome, key in (("booked", "successful_calls"), ("not_booked", "failed_calls")):
+                for call in reversed(history[key]):
+                    self._push_call(call.get("id"), outcome, call.get("transcript") or "", call.get("created_at"))
+            for learning in reversed(history["learnings"]):
+                self._learnings.appendleft({field: learning.get(field) for field in LEARNING_FIELDS})
+            for pattern in history["patterns"]:
+                self._patterns[pattern["id"]] = dict(pattern)
+            self._seeded = True
+
+    def snapshot(self, supabase: Client, limit: int = 20) -> Dict[str, List[Dict[str, Any]]]:
+        """Same shape as the old four-query context: newest calls/learnings first, patterns by confidence."""
+        self.ensure_seeded(supabase)
+        with self._lock:
+            patterns = sorted(self._patterns.values(), key=lambda p: p.get("confidence_score") or 0, reverse=True)
+            return {
+                "successful_calls": list(self._calls["booked"])[:limit],
+                "failed_calls": list(self._calls["not_booked"])[:limit],
+                "patterns": patterns[:10],
+                "learnings": list(self._learnings),
+            }
+
+    def _push_call(self, call_id: Optional[str], outcome: str, transcript: str, created_at: Optional[str]) -> None:
+        for calls in self._calls.values():
+            for existing in calls:
+                if call_id is not None and existing.get("id") == call_id:
+                    calls.remove(existing)
+                    break
+        if outcome in self._calls:
+            self._calls[outcome].appendleft(
+                {
+                    "id": call_id,
+                    "transcript": transcript[: self.excerpt_chars],
+                    "outcome": outcome,
+                    "created_at": created_at,
+                }
+            )
+
+    def record_call(self, call_id: Optional[str], outcome: str, transcript: str, created_at: Optional[str] = None) -> None:
+        """Record a call whose outcome was just set (moves it if the outcome changed)."""
+        with self._lock:
+            if self._seeded:
+                self._push_call(call_id, outcome, transcript or "", created_at)
+
+    def record_learning(self, learning: Dict[str, Any]) -> None:
+        with self._lock:
+            if self._seeded:
+                self._learnings.appendleft({field: learning.get(field) for field in LEARNING_FIELDS})
+
+    def record_pattern(self, pattern: Dict[str, Any]) -> None:
+        """Insert or merge a written pattern row; inactive patterns are dropped."""
+        pattern_id = pattern.get("id")
+        if pattern_id is None:
+            return
+        with self._lock:
+            if not self._seeded:
+                return
+            if pattern.get("is_active") is False:
+                self._patterns.pop(pattern_id, None)
+                return
+            self._patterns[pattern_id] = {**self._patterns.get(pattern_id, {}), **pattern}
+            if len(self._patterns) > self.pattern_window:
+                weakest = min(self._patterns.values(), key=lambda p: p.get("confidence_score") or 0)
+                self._patterns.pop(weakest["id"], None)
+
+    def reset(self) -> None:
+        """Forget everything; the next snapshot re-seeds from the database."""
+        with self._lock:
+            for calls in self._calls.values():
+                calls.clear()
+            self._learnings.clear()
+            self._patterns.clear()
+            self._seeded = False
+
+
+def load_historical_context(supabase: Client, call_limit: int, learning_limit: int, pattern_limit: int) -> Dict:
+    """Load historical context straight from the database (used to seed the store)."""
+    # Get recent successful calls
+    successful_calls = recent_calls(supabase, "id, transcript, outcome, created_at", call_limit, outcome="booked")
+
+    # Get recent failed calls
+    failed_calls = recent_calls(supabase, "id, transcript, outcome, created_at", call_limit, outcome="not_booked")
+
+    # Get existing patterns
+    patterns = active_patterns(supabase, limit=pattern_limit)
+
+    # Get historical learnings
+    learnings = recent_learnings(supabase, ", ".join(LEARNING_FIELDS), learning_limit)
+
+    return {
+        "successful_calls": successful_calls,
+        "failed_calls": failed_calls,
+        "patterns": patterns,
+        "learnings": learnings,
+    }
+
+
+historical_context = HistoricalContextStore()
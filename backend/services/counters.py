@@ -0,0 +1,58 @@
+"""Counter service - incrementally maintained counts that drive automatic strategy updates."""
+import threading
+from typing import Any, Dict
+
+from supabase import Client
+
+from .repositories import count_learnings
+from .version_cache import get_active_version
+
+
+class CallCounters:
+    """
+    Per-version counts of learnings stored since the version was created.
+    A version's count is seeded on first use (one head-only COUNT over call_learnings), reset
+    when a new version is created, and then only incremented, so the auto-optimize trigger
+    never scans tables. Decided calls are not counted here: the stats triggers keep them in
+    `agent_versions.total_calls`, counting each call once when it leaves `pending`, so the
+    call-based cadence is the same on every worker. Learnings stored by other workers after
+    the seed are not seen, which only delays the "3+ learnings" threshold.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._learnings: Dict[str, int] = {}
+
+    def learnings_for(self, supabase: Client, version: Dict[str, Any]) -> int:
+        """Learnings stored while `version` (an agent_versions row) was active."""
+        name = version["version"]
+        if name not in self._learnings:
+            learnings = count_learnings(supabase, since=version["created_at"])
+            with self._lock:
+                self._learnings.setdefault(name, learnings)
+        return self._learnings[name]
+
+    def record_learning(self, supabase: Client) -> None:
+        """Count a stored learning against the active version."""
+        current = get_active_version(supabase)
+        if not current:
+            return
+        with self._lock:
+            if current["version"] in self._learnings:
+                self._learnings[current["version"]] += 1
+
+    def version_created(self, version: str) -> None:
+        """A new version starts with zero learnings."""
+        with self._lock:
+            self._learnings[version] = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"learnings": dict(self._learnings)}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._learnings.clear()
+
+
+call_counters = CallCounters()
@@ -0,0 +1,301 @@
+"""
+Embedding index - cosine top-k over short texts (pattern descriptions, call transcripts).
+
+Vectors live in one float32 NumPy matrix. On disk the index is append-only: `<path>.f32`
+holds raw vectors and `<path>.jsonl` a header plus one line per added or removed row, so
+each new entry costs one append; `compact()` rewrites both files.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .pattern_index import normalize_text, tokenize
+
+EMBED_BATCH_SIZE = 256
+
+
+class Embedder:
+    """Maps texts to L2-normalized float32 vectors."""
+
+    name = "embedder"
+    # Cosine similarity at which two pattern descriptions count as the same insight
+    default_threshold = 0.85
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class HashingEmbedder(Embedder):
+    """
+    Offline embedder: signed feature hashing of words, word bigrams and character trigrams.
+    Catches reworded and reordered phrasings without an API call, but not true synonyms.
+    """
+
+    default_threshold = 0.6
+
+    def __init__(self, dim: int = 512) -> None:
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> Iterable[Tuple[str, float]]:
+        words = sorted(tokenize(text))
+        for word in words:
+            yield f"w:{word}", 1.0
+        vocabulary = set(words)
+        ordered = [w for w in normalize_text(text).split() if w in vocabulary]
+        for a, b in zip(ordered, ordered[1:]):
+            yield f"b:{a} {b}", 0.5
+        for word in words:
+            padded = f" {word} "
+            for i in range(len(padded) - 2):
+                yield f"c:{padded[i:i + 3]}", 0.25
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                matrix[row, digest % self.dim] += weight if (digest >> 63) & 1 else -weight
+        return _normalize_rows(matrix)
+
+
+class AzureEmbedder(Embedder):
+    """Azure OpenAI embeddings deployment (e.g. text-embedding-3-small)."""
+
+    default_threshold = 0.85
+
+    def __init__(self, openai_client: Any, deployment: str) -> None:
+        self.openai_client = openai_client
+        self.deployment = deployment
+        self.name = f"azure-{deployment}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            batch = [text or " " for text in texts[start:start + EMBED_BATCH_SIZE]]
+            response = self.openai_client.embeddings.create(model=self.deployment, input=batch)
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        return _normalize_rows(np.asarray(vectors, dtype=np.float32))
+
+
+def create_embedder(openai_client: Any = None, deployment: Optional[str] = None) -> Embedder:
+    """Azure embeddings when a deployment is configured, otherwise the offline hashing embedder."""
+    if openai_client is not None and deployment:
+        return AzureEmbedder(openai_client, deployment)
+    return HashingEmbedder()
+
+
+class EmbeddingIndex:
+    """
+    Id -> embedding of its text (a pattern description, a call transcript), with cosine
+    top-k search filtered by type (pattern type, call outcome). Thread-safe; a small LRU
+    keeps recent query embeddings so checking a text and then adding it embeds it once.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str],
+        embedder: Embedder,
+        threshold: Optional[float] = None,
+        query_cache_size: int = 256,
+    ) -> None:
+        self.path = path
+        self.embedder = embedder
+        self.threshold = threshold if threshold is not None else embedder.default_threshold
+        self.query_cache_size = query_cache_size
+        self._lock = threading.RLock()
+        self._ids: List[str] = []
+        self._types: List[str] = []
+        self._row_of: Dict[str, int] = {}
+        self._active = np.zeros(0, dtype=bool)
+        self._matrix: Optional[np.ndarray] = None
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        if path:
+            self._load()
+
+    # --- persistence ---------------------------------------------------------------
+
+    def _files(self) -> Tuple[str, str]:
+        return f"{self.path}.f32", f"{self.path}.jsonl"
+
+    def _load(self) -> None:
+        vectors_path, log_path = self._files()
+        if not os.path.exists(vectors_path) or not os.path.exists(log_path):
+            return
+        with open(log_path, encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+        if not lines or lines[0].get("embedder") != self.embedder.name:
+            # Written by a different embedder: vectors are not comparable, start over. The files
+            # go too, or the next append would add rows under the stale header
+            print(f"⚠️ Discarding {self.path} embeddings from {lines[0].get('embedder') if lines else 'unknown'}")
+            for path in (vectors_path, log_path):
+                os.remove(path)
+            return
+        dim = int(lines[0]["dim"])
+        vectors = np.fromfile(vectors_path, dtype=np.float32)
+        vectors = vectors[: (vectors.size // dim) * dim].reshape(-1, dim)
+        ids: List[str] = []
+        types: List[str] = []
+        row_of: Dict[str, int] = {}
+        inactive = set()
+        for entry in lines[1:]:
+            if "remove" in entry:
+                if entry["remove"] in row_of:
+                    inactive.add(row_of[entry["remove"]])
+            elif len(ids) < len(vectors):
+                # A re-added id supersedes its earlier row
+                if entry["id"] in row_of:
+                    inactive.add(row_of[entry["id"]])
+                row_of[entry["id"]] = len(ids)
+                ids.append(entry["id"])
+                types.append(entry.get("type", ""))
+        self._matrix = vectors[: len(ids)].copy()
+        self._ids, self._types = ids, types
+        self._row_of = row_of
+        self._active = np.array([row not in inactive for row in range(len(ids))], dtype=bool)
+
+    def _append(self, entries: List[Dict[str, Any]], vectors: Optional[np.ndarray] = None) -> None:
+        if not self.path:
+            return
+        vectors_path, log_path = self._files()
+        new_file = not os.path.exists(log_path)
+        if vectors is not None and len(vectors):
+            # A fresh log starts a fresh vector file, so rows stay aligned with log entries
+            with open(vectors_path, "wb" if new_file else "ab") as f:
+                f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(log_path, "a", encoding="utf-8") as f:
+            if new_file:
+                f.write(json.dumps({"embedder": self.embedder.name, "dim": self._dim()}) + "\n")
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+
+    def compact(self) -> None:
+        """Drop removed rows from memory and rewrite the files with only active vectors."""
+        with self._lock:
+            keep = np.flatnonzero(self._active)
+            self._ids = [self._ids[i] for i in keep]
+            self._types = [self._types[i] for i in keep]
+            self._matrix = self._matrix[keep] if self._matrix is not None else None
+            self._row_of = {pattern_id: row for row, pattern_id in enumerate(self._ids)}
+            self._active = np.ones(len(self._ids), dtype=bool)
+            if not self.path:
+                return
+            vectors_path, log_path = self._files()
+            # Write both files aside, then swap them in
+            with open(f"{vectors_path}.tmp", "wb") as f:
+                if self._matrix is not None:
+                    f.write(np.ascontiguousarray(self._matrix, dtype=np.float32).tobytes())
+            with open(f"{log_path}.tmp", "w", encoding="utf-8") as f:
+                f.write(json.dumps({"embedder": self.embedder.name, "dim": self._dim()}) + "\n")
+                for pattern_id, pattern_type in zip(self._ids, self._types):
+                    f.write(json.dumps({"id": pattern_id, "type": pattern_type}) + "\n")
+            os.replace(f"{vectors_path}.tmp", vectors_path)
+            os.replace(f"{log_path}.tmp", log_path)
+
+    # --- updates -------------------------------------------------------------------
+
+    def _dim(self) -> int:
+        return int(self._matrix.shape[1]) if self._matrix is not None else 0
+
+    def _embed(self, texts: Sequence[str]) -> np.ndarray:
+        keys = [normalize_text(text) for text in texts]
+        missing = [key for key in dict.fromkeys(keys) if key not in self._query_cache]
+        if missing:
+            for key, vector in zip(missing, self.embedder.embed(missing)):
+                self._query_cache[key] = vector
+        vectors = []
+        for key in keys:
+            self._query_cache.move_to_end(key)
+            vectors.append(self._query_cache[key])
+        while len(self._query_cache) > self.query_cache_size:
+            self._query_cache.popitem(last=False)
+        return np.vstack(vectors)
+
+    def add_many(self, items: Sequence[Tuple[str, str, str]]) -> None:
+        """Index `(id, type, text)` items not already present."""
+        with self._lock:
+            items = [item for item in items if not self.contains(item[0])]
+            if not items:
+                return
+            vectors = self._embed([description for _, _, description in items])
+            revived = [(item, vector) for item, vector in zip(items, vectors) if item[0] in self._row_of]
+            fresh = [(item, vector) for item, vector in zip(items, vectors) if item[0] not in self._row_of]
+            for (pattern_id, _, _), vector in revived:
+                row = self._row_of[pattern_id]
+                self._matrix[row] = vector
+                self._active[row] = True
+            if fresh:
+                block = np.vstack([vector for _, vector in fresh])
+                self._matrix = block if self._matrix is None else np.vstack([self._matrix, block])
+                for (pattern_id, pattern_type, _), _ in fresh:
+                    self._row_of[pattern_id] = len(self._ids)
+                    self._ids.append(pattern_id)
+                    self._types.append(pattern_type)
+                self._active = np.concatenate([self._active, np.ones(len(fresh), dtype=bool)])
+            entries = [{"id": item[0], "type": item[1]} for item, _ in revived + fresh]
+            self._append(entries, np.vstack([vector for _, vector in revived + fresh]))
+
+    def add(self, pattern_id: str, pattern_type: str, description: str) -> None:
+        self.add_many([(pattern_id, pattern_type, description)])
+
+    def remove(self, pattern_id: str) -> None:
+        with self._lock:
+            row = self._row_of.get(pattern_id)
+            if row is None or not self._active[row]:
+                return
+            self._active[row] = False
+            self._append([{"remove": pattern_id}])
+
+    def contains(self, pattern_id: str) -> bool:
+        row = self._row_of.get(pattern_id)
+        return row is not None and bool(self._active[row])
+
+    def sync(self, items: Iterable[Tuple[str, str, str]]) -> None:
+        """Make the index hold exactly these `(id, type, text)` items, embedding only missing ones."""
+        items = list(items)
+        wanted = {item[0] for item in items}
+        with self._lock:
+            for item_id in [i for i in self._ids if i not in wanted]:
+                self.remove(item_id)
+            self.add_many(items)
+
+    def removed_rows(self) -> int:
+        """Rows kept in memory and on disk only until the next `compact()`."""
+        return len(self._ids) - len(self)
+
+    # --- queries -------------------------------------------------------------------
+
+    def search(self, text: str, pattern_type: Optional[str] = None, k: int = 5) -> List[Tuple[str, float]]:
+        """Top-k active ids by cosine similarity to `text`, best first."""
+        with self._lock:
+            if self._matrix is None or not self._active.any():
+                return []
+            query = self._embed([text])[0]
+            scores = self._matrix @ query
+            mask = self._active.copy()
+            if pattern_type is not None:
+                mask &= np.array([t == pattern_type for t in self._types], dtype=bool)
+            candidates = np.flatnonzero(mask)
+            if candidates.size == 0:
+                return []
+            top = candidates[np.argsort(-scores[candidates], kind="stable")[:k]]
+            return [(self._ids[i], float(scores[i])) for i in top]
+
+    def most_similar(self, text: str, pattern_type: Optional[str] = None) -> Optional[Tuple[str, float]]:
+        """Best match at or above the similarity threshold, if any."""
+        hits = self.search(text, pattern_type, k=1)
+        return hits[0] if hits and hits[0][1] >= self.threshold else None
+
+    def __len__(self) -> int:
+        return int(self._active.sum())
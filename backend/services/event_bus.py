@@ -0,0 +1,125 @@
+"""Event bus - in-process fan-out of pipeline events to streaming dashboard clients."""
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set
+
+
+class Subscription:
+    """One client's bounded queue of events; see `EventBus.subscribe`."""
+
+    def __init__(self, bus: "EventBus", queue_size: int) -> None:
+        self._bus = bus
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=queue_size)
+
+    def offer(self, event: Dict[str, Any]) -> None:
+        if self.queue.full():
+            # A client this far behind refetches everything instead of draining stale deltas
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(self._bus.resync_event())
+            self._bus.dropped += 1
+            return
+        self.queue.put_nowait(event)
+
+    async def next(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """The next event, or None if none arrives within `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self._bus.unsubscribe(self)
+
+
+class EventBus:
+    """
+    Publishes call ingested / analysis stored / outcome updated / version created events
+    once, however many dashboards are connected: each subscriber only gets a queue put, so
+    viewers add no queries. `publish` is safe from worker threads (sync endpoints). The last
+    `history` events are kept so a reconnecting client resumes from its Last-Event-ID.
+    """
+
+    def __init__(self, history: int = 256, queue_size: int = 256) -> None:
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: Set[Subscription] = set()
+        self._history: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self._last_id = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Deliver on `loop`; events published before binding (or from scripts) are dropped."""
+        self._loop = loop
+
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> None:
+        if self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        # Ids are assigned on the loop, so events from threads and tasks arrive in id order
+        if running is self._loop:
+            self._emit(event_type, data, time.time())
+        else:
+            self._loop.call_soon_threadsafe(self._emit, event_type, data, time.time())
+
+    def _emit(self, event_type: str, data: Dict[str, Any], at: float) -> None:
+        with self._lock:
+            self._last_id += 1
+            event = {"id": self._last_id, "type": event_type, "data": data, "at": at}
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.offer(event)
+
+    def resync_event(self) -> Dict[str, Any]:
+        """Tells a client its deltas are incomplete and it should refetch its views."""
+        return {"id": self._last_id, "type": "resync", "data": {}, "at": time.time()}
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Subscription:
+        """
+        Start receiving events (call from the bound loop). With `last_event_id`, events
+        published since are queued first, or a resync if some are no longer in history
+        (or the ids are from before a restart).
+        """
+        subscription = Subscription(self, self.queue_size)
+        with self._lock:
+            missed: List[Dict[str, Any]] = []
+            if last_event_id is not None and last_event_id != self._last_id:
+                missed = [event for event in self._history if event["id"] > last_event_id]
+                if last_event_id > self._last_id or not missed or missed[0]["id"] != last_event_id + 1:
+                    missed = [self.resync_event()]
+            self._subscribers.add(subscription)
+        for event in missed:
+            subscription.offer(event)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "last_event_id": self._last_id,
+                "dropped": self.dropped,
+            }
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """One event in text/event-stream framing."""
+    payload = json.dumps({**event["data"], "at": event["at"]}, default=str)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {payload}\n\n"
+
+
+event_bus = EventBus()
@@ -0,0 +1,50 @@
+"""Webhook idempotency - remembers recently ingested Vapi call ids so retries are no-ops."""
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from supabase import Client
+
+from .repositories import get_call_by_vapi_id
+
+SEEN_CALLS_CAPACITY = int(os.getenv("SEEN_CALLS_CAPACITY", "10000"))
+
+
+class SeenCalls:
+    """
+    LRU map of `vapi_call_id` -> `calls.id` for recently ingested calls.
+    This is only the fast path: the `vapi_call_id` UNIQUE constraint (via upsert with
+    ignore-duplicates) stays the source of truth across restarts and workers.
+    """
+
+    def __init__(self, capacity: int = SEEN_CALLS_CAPACITY) -> None:
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._ids: "OrderedDict[str, str]" = OrderedDict()
+
+    def get(self, vapi_call_id: str) -> Optional[str]:
+        with self._lock:
+            call_id = self._ids.get(vapi_call_id)
+            if call_id is not None:
+                self._ids.move_to_end(vapi_call_id)
+            return call_id
+
+    def add(self, vapi_call_id: str, call_id: str) -> None:
+        with self._lock:
+            self._ids[vapi_call_id] = call_id
+            self._ids.move_to_end(vapi_call_id)
+            while len(self._ids) > self.capacity:
+                self._ids.popitem(last=False)
+
+
+seen_calls = SeenCalls()
+
+
+def lookup_call(supabase: Client, vapi_call_id: str) -> Optional[Dict[str, Any]]:
+    """
+    The stored call for a Vapi call id, with its outcome, so the caller can tell whether an
+    earlier delivery got as far as queueing its analysis. Not added to `seen_calls` here:
+    only a delivery whose analysis is queued may be acknowledged from memory.
+    """
+    return get_call_by_vapi_id(supabase, vapi_call_id, "id, agent_version, transcript, outcome, created_at")
@@ -0,0 +1,341 @@
+"""Durable analysis job queue - SQLite-backed worker pool with retries and dead-lettering."""
+import asyncio
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+JobHandler = Callable[..., Awaitable[Any]]
+
+
+class AnalysisQueue:
+    """
+    Persistent queue for call analyses.
+    Jobs are written to a local SQLite file before the webhook returns, so pending work
+    survives restarts. A fixed pool of workers drains it, which caps concurrent LLM calls.
+    Failed jobs are retried with exponential backoff and parked as dead letters after
+    `max_attempts`.
+
+    Several processes may share one queue file. Each claims jobs atomically under its own
+    owner id and heartbeats them while they run; a job whose owner stopped heartbeating for
+    `lease_seconds` (the process died) is put back to pending by whichever worker notices.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        handler: JobHandler,
+        concurrency: int = 4,
+        max_attempts: int = 5,
+        base_backoff: float = 2.0,
+        max_backoff: float = 300.0,
+        poll_interval: float = 1.0,
+        lease_seconds: float = 60.0,
+    ) -> None:
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._workers: List[asyncio.Task] = []
+        self._heartbeat: Optional[asyncio.Task] = None
+        # Jobs this process is running; only these are heartbeated
+        self._held: Set[int] = set()
+        self._in_flight = 0
+        self._init_schema()
+
+    def _init_schema(self) -> None:
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS analysis_jobs (
+                  id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  payload TEXT NOT NULL,
+                  status TEXT NOT NULL DEFAULT 'pending', -- 'pending', 'running', 'dead'
+                  attempts INTEGER NOT NULL DEFAULT 0,
+                  next_run_at REAL NOT NULL,
+                  last_error TEXT,
+                  call_id TEXT,
+                  owner TEXT,
+                  heartbeat_at REAL,
+                  created_at REAL NOT NULL,
+                  updated_at REAL NOT NULL
+                )
+                """
+            )
+            # Queue files created before jobs had owners
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(analysis_jobs)")}
+            for column, kind in (("call_id", "TEXT"), ("owner", "TEXT"), ("heartbeat_at", "REAL")):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE analysis_jobs ADD COLUMN {column} {kind}")
+            if "call_id" not in columns:
+                self._conn.execute(
+                    "UPDATE OR IGNORE analysis_jobs SET call_id = json_extract(payload, '$.call_id')"
+                )
+            # At most one job per call, so a webhook retry can re-enqueue safely
+            self._conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_analysis_jobs_call_id ON analysis_jobs(call_id)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_analysis_jobs_due ON analysis_jobs(status, next_run_at)"
+            )
+
+    def enqueue(self, payload: Dict[str, Any]) -> Optional[int]:
+        """
+        Persist a job and wake an idle worker. Returns the job id, or None when the payload's
+        `call_id` already has a job (pending, running or dead).
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                """
+                INSERT OR IGNORE INTO analysis_jobs (payload, call_id, next_run_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (json.dumps(payload), payload.get("call_id"), now, now, now),
+            )
+        if not cursor.rowcount:
+            return None
+        self._wake()
+        return int(cursor.lastrowid)
+
+    def _wake(self) -> None:
+        if self._wakeup is None or self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def start(self) -> None:
+        """Recover jobs orphaned by a dead process and start the worker pool."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._requeue_orphans()
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        """Cancel workers; interrupted jobs are put back to pending for the next start."""
+        tasks = self._workers + ([self._heartbeat] if self._heartbeat else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._heartbeat = None
+
+    def _requeue_orphans(self) -> int:
+        """Put back running jobs whose owner stopped heartbeating (other live owners keep theirs)."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                """
+                UPDATE analysis_jobs SET status = 'pending', owner = NULL, heartbeat_at = NULL, updated_at = ?
+                WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)
+                """,
+                (now, now - self.lease_seconds),
+            )
+        if cursor.rowcount:
+            self._wake()
+        return cursor.rowcount
+
+    def _beat(self) -> None:
+        held = list(self._held)
+        if held:
+            with self._lock:
+                self._conn.execute(
+                    f"""
+                    UPDATE analysis_jobs SET heartbeat_at = ?
+                    WHERE status = 'running' AND owner = ? AND id IN ({", ".join("?" * len(held))})
+                    """,
+                    (time.time(), self.owner, *held),
+                )
+        self._requeue_orphans()
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await asyncio.to_thread(self._beat)
+            except Exception as e:
+                print(f"⚠️ Analysis queue heartbeat failed: {e}")
+
+    def _claim(self) -> Optional[Tuple[int, Dict[str, Any], int]]:
+        now = time.time()
+        with self._lock:
+            # One statement, so two processes sharing the file can never claim the same job
+            rows = self._conn.execute(
+                """
+                UPDATE analysis_jobs SET status = 'running', owner = ?, heartbeat_at = ?, updated_at = ?
+                WHERE id = (
+                  SELECT id FROM analysis_jobs
+                  WHERE status = 'pending' AND next_run_at <= ?
+                  ORDER BY next_run_at, id
+                  LIMIT 1
+                ) AND status = 'pending'
+                RETURNING id, payload, attempts
+                """,
+                (self.owner, now, now, now),
+            ).fetchall()
+        if not rows:
+            return None
+        row = rows[0]
+        return row["id"], json.loads(row["payload"]), row["attempts"]
+
+    def _complete(self, job_id: int) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM analysis_jobs WHERE id = ? AND owner = ?", (job_id, self.owner))
+
+    def _release(self, job_id: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                """
+                UPDATE analysis_jobs SET status = 'pending', owner = NULL, heartbeat_at = NULL, updated_at = ?
+                WHERE id = ? AND owner = ?
+                """,
+                (time.time(), job_id, self.owner),
+            )
+
+    def _fail(self, job_id: int, attempts: int, error: Exception) -> None:
+        now = time.time()
+        if attempts >= self.max_attempts:
+            status, next_run_at = "dead", now
+        else:
+            delay = min(self.max_backoff, self.base_backoff * (2 ** (attempts - 1)))
+            status, next_run_at = "pending", now + delay * random.uniform(0.5, 1.0)
+        with self._lock:
+            self._conn.execute(
+                """
+                UPDATE analysis_jobs
+                SET status = ?, attempts = ?, next_run_at = ?, last_error = ?, owner = NULL, heartbeat_at = NULL,
+                    updated_at = ?
+                WHERE id = ? AND owner = ?
+                """,
+                (status, attempts, next_run_at, f"{type(error).__name__}: {error}", now, job_id, self.owner),
+            )
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                await self._run_next()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Queue file errors (locked, disk full) must not end the worker. A job whose
+                # bookkeeping failed is no longer heartbeated, so it is requeued once its lease expires
+                print(f"⚠️ Analysis worker error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _run_next(self) -> None:
+        job = await asyncio.to_thread(self._claim)
+        if job is None:
+            await self._wait_for_work()
+            return
+
+        job_id, payload, attempts = job
+        self._held.add(job_id)
+        self._in_flight += 1
+        try:
+            try:
+                await self.handler(**payload)
+            except asyncio.CancelledError:
+                self._release(job_id)
+                raise
+            except Exception as e:
+                print(f"⚠️ Analysis job {job_id} failed (attempt {attempts + 1}): {e}")
+                await asyncio.to_thread(self._fail, job_id, attempts + 1, e)
+            else:
+                await asyncio.to_thread(self._complete, job_id)
+        finally:
+            self._held.discard(job_id)
+            self._in_flight -= 1
+
+    def _next_due(self) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_run_at) AS due FROM analysis_jobs WHERE status = 'pending'"
+            ).fetchone()
+        return row["due"]
+
+    async def _wait_for_work(self) -> None:
+        timeout = self.poll_interval
+        due = await asyncio.to_thread(self._next_due)
+        if due is not None:
+            timeout = max(0.0, min(timeout, due - time.time()))
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Job counts by status plus the number of analyses currently running."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS n FROM analysis_jobs GROUP BY status"
+            ).fetchall()
+        counts = {row["status"]: row["n"] for row in rows}
+        return {
+            "pending": counts.get("pending", 0),
+            "running": counts.get("running", 0),
+            "dead": counts.get("dead", 0),
+            "in_flight": self._in_flight,
+            "concurrency": self.concurrency,
+        }
+
+    def dead_letters(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Jobs that exhausted their retries, newest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT id, payload, attempts, last_error, created_at, updated_at FROM analysis_jobs
+                WHERE status = 'dead'
+                ORDER BY updated_at DESC
+                LIMIT ?
+                """,
+                (limit,),
+            ).fetchall()
+        return [
+            {
+                "id": row["id"],
+                "call_id": json.loads(row["payload"]).get("call_id"),
+                "attempts": row["attempts"],
+                "last_error": row["last_error"],
+                "created_at": row["created_at"],
+                "failed_at": row["updated_at"],
+            }
+            for row in rows
+        ]
+
+    def retry_dead(self, job_id: int) -> bool:
+        """Move a dead letter back to pending with a fresh attempt budget."""
+        with self._lock:
+            cursor = self._conn.execute(
+                """
+                UPDATE analysis_jobs SET status = 'pending', attempts = 0, next_run_at = ?, updated_at = ?
+                WHERE id = ? AND status = 'dead'
+                """,
+                (time.time(), time.time(), job_id),
+            )
+        if cursor.rowcount:
+            self._wake()
+        return bool(cursor.rowcount)
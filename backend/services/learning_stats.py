@@ -0,0 +1,180 @@
+"""Learning statistics - constant-memory aggregates over every call learning ever stored."""
+import heapq
+import itertools
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from supabase import Client
+
+from .pattern_index import normalize_text
+from .repositories import learnings_page
+
+SCAN_PAGE_SIZE = 1000
+SCAN_COLUMNS = "id, outcome, what_worked, what_failed, objection_types, engagement_level, created_at"
+ENGAGEMENT_LEVELS = ("high", "medium", "low")
+
+
+def scan_learnings(
+    supabase: Client, columns: str = SCAN_COLUMNS, page_size: int = SCAN_PAGE_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """Every call_learnings row, oldest first, one keyset page in memory at a time."""
+    after: Optional[Dict[str, Any]] = None
+    while True:
+        page = learnings_page(supabase, columns, after, page_size)
+        yield from page
+        if len(page) < page_size:
+            return
+        after = {"created_at": page[-1]["created_at"], "id": page[-1]["id"]}
+
+
+class SpaceSaving:
+    """
+    Approximate top-k frequencies of an unbounded stream in O(capacity) memory (Metwally et
+    al.). Counts are exact while fewer than `capacity` distinct keys have been seen; after
+    that a newcomer replaces the smallest counter and inherits its count as `error`, so any
+    key more frequent than total / capacity is guaranteed to be kept.
+    """
+
+    def __init__(self, capacity: int = 500) -> None:
+        self.capacity = max(1, capacity)
+        self.total = 0
+        # key -> [count, error, label]
+        self._counters: Dict[str, List[Any]] = {}
+        # (count, seq, key) with stale entries skipped lazily; rebuilt when it grows too large
+        self._heap: List[Tuple[int, int, str]] = []
+        self._seq = itertools.count()
+
+    def add(self, key: str, label: Optional[str] = None, count: int = 1) -> None:
+        self.total += count
+        counter = self._counters.get(key)
+        if counter is None:
+            error = 0
+            if len(self._counters) >= self.capacity:
+                error = self._evict_min()
+            counter = self._counters[key] = [error, error, label if label is not None else key]
+        counter[0] += count
+        heapq.heappush(self._heap, (counter[0], next(self._seq), key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c[0], next(self._seq), k) for k, c in self._counters.items()]
+            heapq.heapify(self._heap)
+
+    def _evict_min(self) -> int:
+        while True:
+            count, _, key = heapq.heappop(self._heap)
+            counter = self._counters.get(key)
+            if counter is not None and counter[0] == count:
+                del self._counters[key]
+                return count
+
+    def top(self, n: int) -> List[Dict[str, Any]]:
+        """Up to `n` most frequent keys, highest count first."""
+        ranked = heapq.nlargest(n, self._counters.values(), key=lambda c: c[0])
+        return [{"value": label, "count": count, "error": error} for count, error, label in ranked]
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+
+class LearningStats:
+    """
+    Objection counts, engagement-level conversion and what_worked / what_failed frequencies
+    over the full call_learnings history. Seeded by one streaming scan (memory stays flat
+    however many rows there are), then updated as learnings are stored. Learnings recorded
+    while the scan runs are applied afterwards unless the scan already saw them.
+    """
+
+    def __init__(self, phrase_capacity: int = 1000, objection_capacity: int = 200) -> None:
+        self.phrase_capacity = phrase_capacity
+        self.objection_capacity = objection_capacity
+        self._lock = threading.Lock()
+        self._seed_lock = threading.Lock()
+        self._seeded = False
+        self._seeding = False
+        self._pending: Dict[Any, Dict[str, Any]] = {}
+        self._clear()
+
+    def _clear(self) -> None:
+        self.learnings = 0
+        self.booked = 0
+        self.objections = SpaceSaving(self.objection_capacity)
+        self.what_worked = SpaceSaving(self.phrase_capacity)
+        self.what_failed = SpaceSaving(self.phrase_capacity)
+        # level -> [total, booked]; unexpected levels share one bucket so this stays bounded
+        self.engagement: Dict[str, List[int]] = {level: [0, 0] for level in ENGAGEMENT_LEVELS + ("other",)}
+
+    def _add(self, row: Dict[str, Any]) -> None:
+        booked = row.get("outcome") == "booked"
+        self.learnings += 1
+        self.booked += booked
+        for objection in row.get("objection_types") or []:
+            if objection:
+                self.objections.add(normalize_text(str(objection)), str(objection))
+        level = str(row.get("engagement_level") or "medium").strip().lower()
+        bucket = self.engagement[level if level in ENGAGEMENT_LEVELS else "other"]
+        bucket[0] += 1
+        bucket[1] += booked
+        if booked and row.get("what_worked"):
+            self.what_worked.add(normalize_text(row["what_worked"]), row["what_worked"])
+        if row.get("outcome") == "not_booked" and row.get("what_failed"):
+            self.what_failed.add(normalize_text(row["what_failed"]), row["what_failed"])
+
+    def ensure_seeded(self, supabase: Client) -> None:
+        if self._seeded:
+            return
+        with self._seed_lock:
+            if self._seeded:
+                return
+            with self._lock:
+                self._clear()
+                self._seeding = True
+            try:
+                for row in scan_learnings(supabase):
+                    with self._lock:
+                        self._pending.pop(row.get("id"), None)
+                        self._add(row)
+            except Exception:
+                with self._lock:
+                    self._pending.clear()
+                    self._seeding = False
+                raise
+            with self._lock:
+                for row in self._pending.values():
+                    self._add(row)
+                self._pending.clear()
+                self._seeding = False
+                self._seeded = True
+
+    def record_learning(self, row: Dict[str, Any]) -> None:
+        """Fold in a stored call_learnings row (with its id, so a running scan counts it once)."""
+        with self._lock:
+            if self._seeded:
+                self._add(row)
+            elif self._seeding:
+                self._pending[row.get("id") or object()] = row
+
+    def summary(self, supabase: Client, top: int = 10) -> Dict[str, Any]:
+        self.ensure_seeded(supabase)
+        with self._lock:
+            return {
+                "total_learnings": self.learnings,
+                "booked": self.booked,
+                "not_booked": self.learnings - self.booked,
+                "conversion": self.booked / self.learnings if self.learnings else 0.0,
+                "objections": self.objections.top(top),
+                "engagement_conversion": {
+                    level: {"total": total, "booked": booked}
+                    for level, (total, booked) in self.engagement.items()
+                    if total
+                },
+                "what_worked": self.what_worked.top(top),
+                "what_failed": self.what_failed.top(top),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._seeded = False
+            self._pending.clear()
+            self._clear()
+
+
+learning_stats = LearningStats()
@@ -1,99 +1,66 @@
 """Learning synthesis service - agentic synthesis of all learnings into actionable insights."""
-import json
-from collections import Counter
-from typing import Dict, List
+import asyncio
+from typing import Any, Dict, List, Tuple
 
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI, AzureOpenAI
 from supabase import Client
 
+from .learning_stats import learning_stats
+from .llm import complete_json, complete_json_async
+from .repositories import active_patterns, list_versions
 
-def synthesize_all_learnings(supabase: Client, openai_client: AzureOpenAI) -> Dict:
+
+def synthesize_all_learnings(supabase: Client, openai_client: AzureOpenAI, model_name: str = "gpt-4o") -> Dict:
     """
     Synthesize all historical learnings into comprehensive insights.
     This is the most agentic function - it reasons about all past data.
     """
-    # Get all relevant data
-    all_learnings = (
-        supabase.table("call_learnings")
-        .select("*")
-        .order("created_at", desc=True)
-        .limit(100)
-        .execute()
-    )
-
-    all_patterns = (
-        supabase.table("learning_patterns")
-        .select("*")
-        .eq("is_active", True)
-        .order("confidence_score", desc=True)
-        .execute()
-    )
-
-    all_calls = (
-        supabase.table("calls")
-        .select("outcome, transcript, created_at")
-        .order("created_at", desc=True)
-        .limit(50)
-        .execute()
-    )
-
-    version_history = (
-        supabase.table("agent_versions")
-        .select("version, conversion_rate, total_calls, created_at")
-        .order("created_at", desc=True)
-        .execute()
-    )
-
-    # Analyze patterns
-    successful_learnings = [l for l in (all_learnings.data or []) if l.get("outcome") == "booked"]
-    failed_learnings = [l for l in (all_learnings.data or []) if l.get("outcome") == "not_booked"]
+    request, statistics = build_synthesis_request(supabase, model_name)
+    synthesis = complete_json(openai_client, **request)
+    synthesis["statistics"] = statistics
+    return synthesis
 
-    # Extract common themes
-    worked_phrases = [l.get("what_worked", "") for l in successful_learnings if l.get("what_worked")]
-    failed_phrases = [l.get("what_failed", "") for l in failed_learnings if l.get("what_failed")]
 
-    worked_counter = Counter(worked_phrases)
-    failed_counter = Counter(failed_phrases)
+async def synthesize_all_learnings_async(
+    supabase: Client, openai_client: AsyncAzureOpenAI, model_name: str = "gpt-4o"
+) -> Dict:
+    """Async variant of `synthesize_all_learnings`; Supabase work runs in a worker thread."""
+    request, statistics = await asyncio.to_thread(build_synthesis_request, supabase, model_name)
+    synthesis = await complete_json_async(openai_client, **request)
+    synthesis["statistics"] = statistics
+    return synthesis
 
-    # Extract objection patterns
-    all_objections = []
-    for learning in all_learnings.data or []:
-        all_objections.extend(learning.get("objection_types", []))
 
-    objection_counter = Counter(all_objections)
+def build_synthesis_request(supabase: Client, model_name: str = "gpt-4o") -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Build the synthesis completion request plus the raw statistics attached to its result."""
+    # Aggregates over every learning, not a recent window (seeded once by a streaming scan)
+    stats = learning_stats.summary(supabase, top=10)
 
-    # Calculate conversion by engagement level
-    engagement_conversion = {}
-    for learning in all_learnings.data or []:
-        level = learning.get("engagement_level", "medium")
-        if level not in engagement_conversion:
-            engagement_conversion[level] = {"total": 0, "booked": 0}
-        engagement_conversion[level]["total"] += 1
-        if learning.get("outcome") == "booked":
-            engagement_conversion[level]["booked"] += 1
+    all_patterns = active_patterns(supabase)
+    version_history = list_versions(supabase, "version, conversion_rate, total_calls, created_at")
 
     # Build synthesis prompt for AI
-    synthesis_prompt = f"""Synthesize all learnings from {len(all_learnings.data or [])} analyzed calls.
+    synthesis_prompt = f"""Synthesize all learnings from {stats["total_learnings"]} analyzed calls.
 
-SUCCESSFUL CALLS ({len(successful_learnings)}):
+SUCCESSFUL CALLS ({stats["booked"]}):
 Top patterns that worked (frequency):
-{chr(10).join(f"- {phrase} (appeared {count} times)" for phrase, count in worked_counter.most_common(10))}
+{chr(10).join(f"- {e['value']} (appeared {e['count']} times)" for e in stats["what_worked"])}
 
-FAILED CALLS ({len(failed_learnings)}):
+FAILED CALLS ({stats["not_booked"]}):
 Top patterns that failed (frequency):
-{chr(10).join(f"- {phrase} (appeared {count} times)" for phrase, count in failed_counter.most_common(10))}
+{chr(10).join(f"- {e['value']} (appeared {e['count']} times)" for e in stats["what_failed"])}
 
 OBJECTION PATTERNS:
-{chr(10).join(f"- {obj}: {count} occurrences" for obj, count in objection_counter.most_common(10))}
+{chr(10).join(f"- {e['value']}: {e['count']} occurrences" for e in stats["objections"])}
 
 ENGAGEMENT LEVEL CONVERSION:
-{chr(10).join(f"- {level}: {data['booked']}/{data['total']} = {data['booked']/data['total']:.1%}" for level, data in engagement_conversion.items())}
+{chr(10).join(f"- {level}: {data['booked']}/{data['total']} = {data['booked']/data['total']:.1%}" for level, data in stats["engagement_conversion"].items())}
 
-IDENTIFIED PATTERNS ({len(all_patterns.data or [])}):
-{chr(10).join(f"- {p.get('pattern_type')}: {p.get('pattern_description')} (confidence: {p.get('confidence_score', 0):.2f}, success rate: {p.get('success_rate', 0):.1%})" for p in (all_patterns.data or [])[:15])}
+IDENTIFIED PATTERNS ({len(all_patterns)}):
+{chr(10).join(f"- {p.get('pattern_type')}: {p.get('pattern_description')} (confidence: {p.get('confidence_score', 0):.2f}, success rate: {p.get('success_rate', 0):.1%})" for p in all_patterns[:15])}
 
 VERSION HISTORY:
-{chr(10).join(f"- {v.get('version')}: {v.get('conversion_rate', 0):.1%} conversion ({v.get('total_calls', 0)} calls)" for v in (version_history.data or [])[:5])}
+{chr(10).join(f"- {v.get('version')}: {v.get('conversion_rate', 0):.1%} conversion ({v.get('total_calls', 0)} calls)" for v in version_history[:5])}
 
 Synthesize this into actionable insights. Return JSON:
 {{
@@ -131,34 +98,30 @@ Synthesize this into actionable insights. Return JSON:
   "evolution_trend": "how the agent has improved over time"
 }}"""
 
-    response = openai_client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
+    request = {
+        "model": model_name,
+        "messages": [
             {
                 "role": "system",
                 "content": "You synthesize sales call learnings into actionable insights. Return detailed JSON only.",
             },
             {"role": "user", "content": synthesis_prompt},
         ],
-        response_format={"type": "json_object"},
-        temperature=0.7,
-        max_tokens=3000,
-    )
+        "temperature": 0.7,
+        "max_tokens": 3000,
+    }
 
-    content = response.choices[0].message.content or "{}"
-    synthesis = json.loads(content)
-
-    # Add raw statistics
-    synthesis["statistics"] = {
-        "total_calls_analyzed": len(all_learnings.data or []),
-        "successful_calls": len(successful_learnings),
-        "failed_calls": len(failed_learnings),
-        "overall_conversion": len(successful_learnings) / len(all_learnings.data) if all_learnings.data else 0,
-        "patterns_identified": len(all_patterns.data or []),
-        "high_confidence_patterns": len([p for p in (all_patterns.data or []) if p.get("confidence_score", 0) > 0.5]),
+    # Raw statistics
+    statistics = {
+        "total_calls_analyzed": stats["total_learnings"],
+        "successful_calls": stats["booked"],
+        "failed_calls": stats["not_booked"],
+        "overall_conversion": stats["conversion"],
+        "patterns_identified": len(all_patterns),
+        "high_confidence_patterns": len([p for p in all_patterns if p.get("confidence_score", 0) > 0.5]),
     }
 
-    return synthesis
+    return request, statistics
 
 
 def get_learning_summary(supabase: Client) -> Dict:
@@ -169,18 +132,13 @@ def get_learning_summary(supabase: Client) -> Dict:
     trends = detect_trends(supabase)
 
     # Get pattern counts
-    patterns = (
-        supabase.table("learning_patterns")
-        .select("pattern_type, confidence_score")
-        .eq("is_active", True)
-        .execute()
-    )
+    patterns = active_patterns(supabase, "pattern_type, confidence_score", order=())
 
     high_conf_success = len(
-        [p for p in (patterns.data or []) if p.get("pattern_type") == "success_pattern" and p.get("confidence_score", 0) > 0.5]
+        [p for p in patterns if p.get("pattern_type") == "success_pattern" and p.get("confidence_score", 0) > 0.5]
     )
     high_conf_failure = len(
-        [p for p in (patterns.data or []) if p.get("pattern_type") == "failure_pattern" and p.get("confidence_score", 0) > 0.5]
+        [p for p in patterns if p.get("pattern_type") == "failure_pattern" and p.get("confidence_score", 0) > 0.5]
     )
 
     return {
@@ -192,7 +150,7 @@ def get_learning_summary(supabase: Client) -> Dict:
         "patterns": {
             "high_confidence_success": high_conf_success,
             "high_confidence_failure": high_conf_failure,
-            "total": len(patterns.data or []),
+            "total": len(patterns),
         },
         "top_learnings": {
             "worked": learnings.get("what_worked", [])[:5],
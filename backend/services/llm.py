@@ -0,0 +1,169 @@
+"""LLM helpers - the single place JSON chat completions are issued (sync and async)."""
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import openai
+from openai import AsyncAzureOpenAI, AzureOpenAI
+
+from . import metrics
+from .llm_cache import CompletionCache, completion_cache_key
+from .rate_limiter import AdaptiveRateLimiter, estimate_tokens
+
+_completion_cache: Optional[CompletionCache] = None
+_rate_limiter: Optional[AdaptiveRateLimiter] = None
+_max_attempts = 5
+
+
+def set_completion_cache(cache: Optional[CompletionCache]) -> None:
+    """Install the cache consulted by every completion (None disables caching)."""
+    global _completion_cache
+    _completion_cache = cache
+
+
+def completion_cache_stats() -> Dict[str, Any]:
+    if _completion_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **_completion_cache.stats()}
+
+
+def set_rate_limiter(limiter: Optional[AdaptiveRateLimiter], max_attempts: int = 5) -> None:
+    """Install the limiter every completion waits on (None disables it) and the attempts per completion."""
+    global _rate_limiter, _max_attempts
+    _rate_limiter = limiter
+    _max_attempts = max(1, max_attempts)
+
+
+def rate_limiter_status() -> Dict[str, Any]:
+    if _rate_limiter is None:
+        return {"enabled": False}
+    return {"enabled": True, "max_attempts": _max_attempts, **_rate_limiter.status()}
+
+
+def _retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """Seconds to wait before retrying after `error`, or None if it is not worth retrying."""
+    if isinstance(error, openai.RateLimitError):
+        headers = error.response.headers if error.response is not None else {}
+        try:
+            if headers.get("retry-after-ms"):
+                return float(headers["retry-after-ms"]) / 1000
+            if headers.get("retry-after"):
+                return float(headers["retry-after"])
+        except ValueError:
+            pass
+    elif not isinstance(error, (openai.APIConnectionError, openai.InternalServerError)):
+        return None
+    return min(30.0, 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+
+def _attempt_failed(model: str, error: Exception, attempt: int, admitted_at: float) -> Optional[float]:
+    """Release the limiter slot; returns how long to sleep before retrying, or None to give up."""
+    rate_limited = isinstance(error, openai.RateLimitError)
+    delay = _retry_delay(error, attempt)
+    if _rate_limiter is not None:
+        _rate_limiter.release(admitted_at, rate_limited=rate_limited, retry_after=delay if rate_limited else None)
+    if delay is None or attempt >= _max_attempts:
+        return None
+    metrics.llm_retries.inc(model=model, reason="rate_limited" if rate_limited else "transient")
+    print(f"⏳ Completion failed ({type(error).__name__}), retrying in {delay:.1f}s")
+    # After a 429 the limiter already holds every admission for Retry-After
+    return 0.0 if rate_limited and _rate_limiter is not None else delay
+
+
+def _cached(params: Dict[str, Any]) -> Tuple[Optional[str], Optional[Dict]]:
+    if _completion_cache is None:
+        return None, None
+    key = completion_cache_key(params)
+    content = _completion_cache.get(key)
+    return key, json.loads(content) if content is not None else None
+
+
+def _store(key: Optional[str], content: str) -> None:
+    if key is not None and _completion_cache is not None:
+        _completion_cache.set(key, content)
+
+
+async def _cached_async(params: Dict[str, Any]) -> Tuple[Optional[str], Optional[Dict]]:
+    if _completion_cache is None:
+        return None, None
+    key = completion_cache_key(params)
+    content = await _completion_cache.get_async(key)
+    return key, json.loads(content) if content is not None else None
+
+
+async def _store_async(key: Optional[str], content: str) -> None:
+    if key is not None and _completion_cache is not None:
+        await _completion_cache.set_async(key, content)
+
+
+def complete_json(openai_client: AzureOpenAI, **params: Any) -> Dict:
+    """
+    Run a JSON-mode chat completion and return the parsed object.
+    Waits for the rate limiter at the caller's priority; 429s and transient errors are retried.
+    """
+    key, cached = _cached(params)
+    if cached is not None:
+        metrics.llm_cache_hits.inc(model=params.get("model", ""))
+        return cached
+    model = params.get("model", "")
+    tokens = estimate_tokens(params)
+    attempt = 0
+    while True:
+        attempt += 1
+        admitted_at = _rate_limiter.acquire_sync(tokens) if _rate_limiter is not None else 0.0
+        started = time.perf_counter()
+        try:
+            response = openai_client.chat.completions.create(response_format={"type": "json_object"}, **params)
+        except Exception as e:
+            metrics.observe_llm(model, started, error=True)
+            delay = _attempt_failed(model, e, attempt, admitted_at)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            continue
+        if _rate_limiter is not None:
+            _rate_limiter.release(admitted_at)
+        break
+    metrics.observe_llm(model, started, response)
+    content = response.choices[0].message.content or "{}"
+    result = json.loads(content)
+    _store(key, content)
+    return result
+
+
+async def complete_json_async(openai_client: AsyncAzureOpenAI, **params: Any) -> Dict:
+    """Async variant of `complete_json`; never blocks the event loop on the completion or the disk cache."""
+    key, cached = await _cached_async(params)
+    if cached is not None:
+        metrics.llm_cache_hits.inc(model=params.get("model", ""))
+        return cached
+    model = params.get("model", "")
+    tokens = estimate_tokens(params)
+    attempt = 0
+    while True:
+        attempt += 1
+        admitted_at = await _rate_limiter.acquire(tokens) if _rate_limiter is not None else 0.0
+        started = time.perf_counter()
+        try:
+            response = await openai_client.chat.completions.create(response_format={"type": "json_object"}, **params)
+        except asyncio.CancelledError:
+            if _rate_limiter is not None:
+                _rate_limiter.release(admitted_at)
+            raise
+        except Exception as e:
+            metrics.observe_llm(model, started, error=True)
+            delay = _attempt_failed(model, e, attempt, admitted_at)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        if _rate_limiter is not None:
+            _rate_limiter.release(admitted_at)
+        break
+    metrics.observe_llm(model, started, response)
+    content = response.choices[0].message.content or "{}"
+    result = json.loads(content)
+    await _store_async(key, content)
+    return result
@@ -0,0 +1,220 @@
+"""Completion cache - memory and SQLite tiers for chat completions keyed on normalized inputs."""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+def completion_cache_key(params: Dict[str, Any]) -> str:
+    """sha256 over model, messages and sampling parameters, with message whitespace normalized."""
+    normalized = dict(params)
+    normalized["messages"] = [
+        {**message, "content": " ".join(str(message.get("content", "")).split())}
+        for message in params.get("messages", [])
+    ]
+    canonical = json.dumps(normalized, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """Interface for completion caches: raw response content stored by key."""
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, content: str) -> None:
+        raise NotImplementedError
+
+    async def get_async(self, key: str) -> Optional[str]:
+        """`get` for async callers; runs in a worker thread unless the cache never blocks."""
+        return await asyncio.to_thread(self.get, key)
+
+    async def set_async(self, key: str, content: str) -> None:
+        await asyncio.to_thread(self.set, key, content)
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class MemoryCompletionCache(CompletionCache):
+    """In-process LRU with a TTL."""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 86400.0) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, content: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), content)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get_async(self, key: str) -> Optional[str]:
+        return self.get(key)
+
+    async def set_async(self, key: str, content: str) -> None:
+        self.set(key, content)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "max_entries": self.max_entries}
+
+
+class SQLiteCompletionCache(CompletionCache):
+    """On-disk tier: survives restarts; evicts expired entries, then least recently used."""
+
+    def __init__(self, db_path: str, max_entries: int = 10000, ttl_seconds: float = 86400.0) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS completion_cache (
+                  key TEXT PRIMARY KEY,
+                  content TEXT NOT NULL,
+                  created_at REAL NOT NULL,
+                  last_used_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_completion_cache_last_used ON completion_cache(last_used_at)"
+            )
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, created_at FROM completion_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM completion_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE completion_cache SET last_used_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, content: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completion_cache (key, content, created_at, last_used_at) VALUES (?, ?, ?, ?)",
+                (key, content, now, now),
+            )
+            self._conn.execute("DELETE FROM completion_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                """
+                DELETE FROM completion_cache WHERE key IN (
+                  SELECT key FROM completion_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM completion_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM completion_cache").fetchone()[0]
+        return {"entries": entries, "max_entries": self.max_entries}
+
+
+class TieredCompletionCache(CompletionCache):
+    """Memory in front of disk; disk hits are promoted to memory. Counts hits and misses."""
+
+    def __init__(self, memory: CompletionCache, disk: Optional[CompletionCache] = None) -> None:
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self._counts = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def get(self, key: str) -> Optional[str]:
+        content = self.memory.get(key)
+        if content is not None:
+            self._count("memory_hits")
+            return content
+        if self.disk is not None:
+            content = self.disk.get(key)
+            if content is not None:
+                self._count("disk_hits")
+                self.memory.set(key, content)
+                return content
+        self._count("misses")
+        return None
+
+    def set(self, key: str, content: str) -> None:
+        self.memory.set(key, content)
+        if self.disk is not None:
+            self.disk.set(key, content)
+
+    async def get_async(self, key: str) -> Optional[str]:
+        # Memory is checked on the loop; only a memory miss goes to disk, in a worker thread
+        content = await self.memory.get_async(key)
+        if content is not None:
+            self._count("memory_hits")
+            return content
+        if self.disk is not None:
+            content = await self.disk.get_async(key)
+            if content is not None:
+                self._count("disk_hits")
+                await self.memory.set_async(key, content)
+                return content
+        self._count("misses")
+        return None
+
+    async def set_async(self, key: str, content: str) -> None:
+        await self.memory.set_async(key, content)
+        if self.disk is not None:
+            await self.disk.set_async(key, content)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        hits = counts["memory_hits"] + counts["disk_hits"]
+        lookups = hits + counts["misses"]
+        return {
+            **counts,
+            "hits": hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk is not None else None,
+        }
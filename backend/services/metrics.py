@@ -0,0 +1,243 @@
+"""
+Metrics - in-process counters, gauges and histograms rendered in Prometheus text format.
+
+Covers every storage query (by table, operation and calling function), every chat
+completion (latency, tokens, model), Vapi assistant updates and the analysis queue.
+Values are per process; scrape each worker separately.
+"""
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Builder methods that decide what kind of statement a storage query is
+QUERY_OPERATIONS = {"select", "insert", "update", "upsert", "delete"}
+# Query helpers are skipped when labelling a query's call site with the code that asked for it
+QUERY_HELPER_MODULES = {"services.repositories", "services.pagination"}
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_format(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_format(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # labels -> (per-bucket counts, sum, count)
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((key, [list(s[0]), s[1], s[2]]) for key, s in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, ('le', _format(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_format(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+
+    def _register(self, metric: _Metric) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+db_query_seconds = registry.histogram(
+    "ruya_db_query_duration_seconds",
+    "Storage query latency by table, operation and calling function.",
+    ["table", "operation", "call_site"],
+)
+db_query_errors = registry.counter(
+    "ruya_db_query_errors_total", "Storage queries that raised.", ["table", "operation", "call_site"]
+)
+llm_request_seconds = registry.histogram(
+    "ruya_llm_request_duration_seconds", "Chat completion latency.", ["model", "status"]
+)
+llm_tokens = registry.counter("ruya_llm_tokens_total", "Chat completion tokens.", ["model", "type"])
+llm_cache_hits = registry.counter("ruya_llm_cache_hits_total", "Completions served from the completion cache.", ["model"])
+llm_retries = registry.counter("ruya_llm_retries_total", "Chat completions retried, by reason.", ["model", "reason"])
+llm_concurrency_limit = registry.gauge("ruya_llm_concurrency_limit", "Adaptive limit on concurrent completions.")
+llm_in_flight = registry.gauge("ruya_llm_in_flight", "Completions currently admitted by the rate limiter.")
+llm_waiting = registry.gauge("ruya_llm_waiting", "Completions waiting for the rate limiter, by priority.", ["priority"])
+vapi_request_seconds = registry.histogram(
+    "ruya_vapi_request_duration_seconds", "Vapi assistant PATCH latency.", ["status"]
+)
+queue_jobs = registry.gauge("ruya_analysis_queue_jobs", "Analysis jobs by status.", ["status"])
+queue_in_flight = registry.gauge("ruya_analysis_in_flight", "Analyses currently running.")
+event_subscribers = registry.gauge("ruya_event_stream_subscribers", "Dashboard clients connected to /api/events.")
+
+
+def observe_llm(model: str, started: float, response: Any = None, error: bool = False) -> None:
+    """Record one chat completion; `response.usage` supplies token counts when present."""
+    llm_request_seconds.observe(time.perf_counter() - started, model=model, status="error" if error else "ok")
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        llm_tokens.inc(getattr(usage, "prompt_tokens", 0) or 0, model=model, type="prompt")
+        llm_tokens.inc(getattr(usage, "completion_tokens", 0) or 0, model=model, type="completion")
+
+
+class InstrumentedQuery:
+    """Wraps a query builder; `execute()` is timed under the builder's table and operation."""
+
+    def __init__(self, builder: Any, table: str, operation: str = "select") -> None:
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._builder, name)
+        operation = name if name in QUERY_OPERATIONS else self._operation
+        if not callable(attr):
+            return InstrumentedQuery(attr, self._table, operation) if hasattr(attr, "execute") else attr
+
+        def call(*args: Any, **kwargs: Any) -> Any:
+            result = attr(*args, **kwargs)
+            return InstrumentedQuery(result, self._table, operation) if hasattr(result, "execute") else result
+
+        return call
+
+    def execute(self) -> Any:
+        caller = sys._getframe(1)
+        while caller.f_back is not None and caller.f_globals.get("__name__") in QUERY_HELPER_MODULES:
+            caller = caller.f_back
+        call_site = f"{caller.f_globals.get('__name__', '?')}.{caller.f_code.co_name}"
+        started = time.perf_counter()
+        try:
+            return self._builder.execute()
+        except Exception:
+            db_query_errors.inc(table=self._table, operation=self._operation, call_site=call_site)
+            raise
+        finally:
+            db_query_seconds.observe(
+                time.perf_counter() - started, table=self._table, operation=self._operation, call_site=call_site
+            )
+
+
+class InstrumentedStorage:
+    """Storage client wrapper that times every query; everything else passes through."""
+
+    def __init__(self, client: Any) -> None:
+        self._client = client
+
+    def table(self, name: str) -> InstrumentedQuery:
+        return InstrumentedQuery(self._client.table(name), name)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+
+def instrument_storage(client: Any) -> InstrumentedStorage:
+    return InstrumentedStorage(client)
+
+
+def render_metrics() -> str:
+    return registry.render()
@@ -0,0 +1,57 @@
+"""Pagination - offset and keyset paging over PostgREST queries, and opaque keyset cursors."""
+import base64
+import binascii
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+PAGE_SIZE = 1000
+
+
+def fetch_all(query_factory, page_size: int = PAGE_SIZE) -> Iterable[Dict[str, Any]]:
+    """Page through a Supabase query with `.range()` (PostgREST caps unpaged selects)."""
+    start = 0
+    while True:
+        page = query_factory().range(start, start + page_size - 1).execute()
+        rows = page.data or []
+        yield from rows
+        if len(rows) < page_size:
+            return
+        start += page_size
+
+
+def fetch_keyset_page(
+    query_factory, after: Optional[Dict[str, Any]], page_size: int, desc: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    One page of a query ordered by (created_at, id), strictly after the `after` row's key in
+    that direction. Unlike `.range()` offsets, each page costs the same however deep it is.
+    """
+    if after is None:
+        first = query_factory().order("created_at", desc=desc).order("id", desc=desc)
+        return first.limit(page_size).execute().data or []
+    key_created, key_id = after["created_at"], after["id"]
+    # Rows sharing the last timestamp first, then the following timestamps
+    tied = query_factory().eq("created_at", key_created)
+    tied = tied.lt("id", key_id) if desc else tied.gt("id", key_id)
+    rows = tied.order("id", desc=desc).limit(page_size).execute().data or []
+    if len(rows) < page_size:
+        rest = query_factory()
+        rest = rest.lt("created_at", key_created) if desc else rest.gt("created_at", key_created)
+        rest = rest.order("created_at", desc=desc).order("id", desc=desc)
+        rows += rest.limit(page_size - len(rows)).execute().data or []
+    return rows
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Opaque cursor for the (created_at, id) key of `row`."""
+    key = json.dumps([row["created_at"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(key.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """The `after` key for `fetch_keyset_page`; raises ValueError for a malformed cursor."""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    return {"created_at": created_at, "id": row_id}
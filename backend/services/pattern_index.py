@@ -0,0 +1,188 @@
+"""Pattern index - in-memory lookup of learning patterns by normalized text, shared tokens and embeddings."""
+import re
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from supabase import Client
+
+from .repositories import iter_active_patterns, iter_learnings
+
+PREFIX_CHARS = 50
+SIMILARITY_THRESHOLD = 0.6
+
+_NON_WORD = re.compile(r"[^a-z0-9\s]+")
+_SPACES = re.compile(r"\s+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "was", "were", "with",
+}
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", (text or "").lower())).strip()
+
+
+def tokenize(text: str) -> Set[str]:
+    return {token for token in normalize_text(text).split() if token not in _STOPWORDS}
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class PatternIndex:
+    """
+    All active learning patterns plus per-phrase learning outcomes, indexed by normalized
+    text and by token, so confirmations and near-duplicate checks resolve without queries.
+    It is seeded from Supabase once and updated as patterns and learnings are written.
+    Hold `lock` across a find-then-write sequence so concurrent analyses can't both create
+    the same pattern. With an embedding index attached, paraphrases are matched too.
+    """
+
+    def __init__(self, similarity_threshold: float = SIMILARITY_THRESHOLD) -> None:
+        self.similarity_threshold = similarity_threshold
+        self.lock = threading.RLock()
+        self._seeded = False
+        self._patterns: Dict[str, Dict[str, Any]] = {}
+        self._by_description: Dict[str, str] = {}
+        self._pattern_tokens: Dict[str, Set[str]] = defaultdict(set)
+        self._learning_outcomes: Dict[str, List[int]] = {}
+        self._learning_tokens: Dict[str, Set[str]] = defaultdict(set)
+        self.embeddings = None
+
+    def attach_embeddings(self, embeddings) -> None:
+        """Use an `EmbeddingIndex` for semantic near-duplicate matching."""
+        with self.lock:
+            self.embeddings = embeddings
+            if self._seeded:
+                embeddings.sync(self._embedding_items())
+
+    def ensure_seeded(self, supabase: Client) -> None:
+        with self.lock:
+            if self._seeded:
+                return
+            self.load(iter_active_patterns(supabase), iter_learnings(supabase, "what_worked, outcome"))
+
+    def load(self, patterns: Iterable[Dict[str, Any]], learnings: Iterable[Dict[str, Any]]) -> None:
+        """Seed from active pattern rows and `{what_worked, outcome}` learning rows."""
+        with self.lock:
+            for row in patterns:
+                self.upsert(row, embed=False)
+            if self.embeddings is not None:
+                # One batched pass; only patterns missing from the persisted index are embedded
+                self.embeddings.sync(self._embedding_items())
+            for row in learnings:
+                self._add_learning(row.get("what_worked") or "", row.get("outcome"))
+            self._seeded = True
+
+    def reset(self) -> None:
+        with self.lock:
+            self._seeded = False
+            self._patterns.clear()
+            self._by_description.clear()
+            self._pattern_tokens.clear()
+            self._learning_outcomes.clear()
+            self._learning_tokens.clear()
+
+    def upsert(self, row: Dict[str, Any], embed: bool = True) -> None:
+        """Add or replace a pattern row; inactive rows are removed from the index."""
+        with self.lock:
+            pattern_id = row["id"]
+            previous = self._patterns.pop(pattern_id, None)
+            if previous is not None:
+                key = normalize_text(previous.get("pattern_description", ""))
+                if self._by_description.get(key) == pattern_id:
+                    del self._by_description[key]
+                for token in tokenize(previous.get("pattern_description", "")):
+                    self._pattern_tokens[token].discard(pattern_id)
+            if row.get("is_active") is False:
+                if self.embeddings is not None:
+                    self.embeddings.remove(pattern_id)
+                return
+            self._patterns[pattern_id] = row
+            if embed and self.embeddings is not None:
+                self.embeddings.add(pattern_id, row.get("pattern_type", ""), row.get("pattern_description", ""))
+            self._by_description.setdefault(normalize_text(row.get("pattern_description", "")), pattern_id)
+            for token in tokenize(row.get("pattern_description", "")):
+                self._pattern_tokens[token].add(pattern_id)
+
+    def _embedding_items(self) -> List[Tuple[str, str, str]]:
+        return [(p["id"], p.get("pattern_type", ""), p.get("pattern_description", "")) for p in self._patterns.values()]
+
+    def get(self, pattern_id: str) -> Optional[Dict[str, Any]]:
+        return self._patterns.get(pattern_id)
+
+    def find_by_description(self, description: str) -> Optional[Dict[str, Any]]:
+        """Active pattern whose description matches after normalization."""
+        pattern_id = self._by_description.get(normalize_text(description))
+        return self._patterns.get(pattern_id) if pattern_id else None
+
+    def find_similar(self, text: str, pattern_type: str) -> Optional[Dict[str, Any]]:
+        """
+        Best near-duplicate of `text` among active patterns of `pattern_type`: a pattern that
+        contains the text's first 50 normalized characters, shares enough tokens with it, or
+        (with embeddings attached) is semantically close enough.
+        """
+        prefix = normalize_text(text)[:PREFIX_CHARS]
+        tokens = tokenize(text)
+        best, best_score = None, 0.0
+        for pattern_id in self._candidates(self._pattern_tokens, tokens):
+            pattern = self._patterns[pattern_id]
+            if pattern.get("pattern_type") != pattern_type:
+                continue
+            description = pattern.get("pattern_description", "")
+            if prefix and prefix in normalize_text(description):
+                return pattern
+            score = _jaccard(tokens, tokenize(description))
+            if score >= self.similarity_threshold and score > best_score:
+                best, best_score = pattern, score
+        if best is None and self.embeddings is not None:
+            match = self.embeddings.most_similar(text, pattern_type)
+            if match is not None:
+                best = self._patterns.get(match[0])
+        return best
+
+    def record_learning(self, what_worked: str, outcome: Optional[str]) -> None:
+        """Count a newly stored learning (ignored until seeded, since seeding will load it)."""
+        with self.lock:
+            if self._seeded:
+                self._add_learning(what_worked, outcome)
+
+    def _add_learning(self, what_worked: str, outcome: Optional[str]) -> None:
+        key = normalize_text(what_worked)
+        if not key:
+            return
+        with self.lock:
+            counts = self._learning_outcomes.get(key)
+            if counts is None:
+                counts = self._learning_outcomes[key] = [0, 0]
+                for token in tokenize(key):
+                    self._learning_tokens[token].add(key)
+            counts[1] += 1
+            if outcome == "booked":
+                counts[0] += 1
+
+    def learning_success_rate(self, what_worked: str, default: float = 0.5) -> float:
+        """Booking rate across learnings whose what_worked is similar to this one."""
+        prefix = normalize_text(what_worked)[:PREFIX_CHARS]
+        tokens = tokenize(what_worked)
+        booked = total = 0
+        for key in self._candidates(self._learning_tokens, tokens):
+            if (prefix and prefix in key) or _jaccard(tokens, tokenize(key)) >= self.similarity_threshold:
+                booked += self._learning_outcomes[key][0]
+                total += self._learning_outcomes[key][1]
+        return booked / total if total else default
+
+    @staticmethod
+    def _candidates(index: Dict[str, Set[str]], tokens: Set[str]) -> Set[str]:
+        candidates: Set[str] = set()
+        for token in tokens:
+            candidates |= index.get(token, set())
+        return candidates
+
+
+pattern_index = PatternIndex()
@@ -1,30 +1,70 @@
 """Advanced prompt builder - agentic prompt optimization using all historical data."""
+import asyncio
+import hashlib
 import json
-from typing import Any, Dict, List, Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 
 from supabase import Client
 
+from .llm import complete_json, complete_json_async
+from .repositories import active_patterns, get_version, insert_prompt_snapshot, latest_prompt_snapshot
+from .version_cache import ACTIVE_VERSION_TTL_SECONDS, active_version_cache, get_active_version
+
+PROMPT_CACHE_SIZE = 32
+
+# Built prompts keyed by a hash of their inputs, and the input hash last snapshotted per version
+_prompt_cache: "OrderedDict[str, str]" = OrderedDict()
+_snapshot_hashes: Dict[str, str] = {}
+_prompt_cache_lock = threading.Lock()
+
+# Bumped by every write that changes a prompt input in this process. Together with the active
+# version cache's generation it keys the last built prompt, which is then served without any
+# query; the TTL bounds staleness from writes made by other workers.
+_inputs_generation = 0
+_latest_prompt: Optional[Tuple[Tuple[int, int], float, str]] = None
+
+
+def invalidate_prompt() -> None:
+    """A prompt input (learning, pattern, trend window, prompt snapshot) changed."""
+    global _inputs_generation
+    with _prompt_cache_lock:
+        _inputs_generation += 1
+
+
+def _prompt_key() -> Tuple[int, int]:
+    return active_version_cache.generation, _inputs_generation
+
+
+def hash_prompt_inputs(inputs: Dict[str, Any]) -> str:
+    """Content address for a prompt: sha256 of its canonicalized inputs."""
+    canonical = json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
 
 def build_optimized_prompt(supabase: Client, openai_client=None) -> str:
     """
     Build highly optimized prompt using all historical learnings, patterns, and trends.
     This is the agentic, self-improving prompt builder that learns from everything.
     """
+    global _latest_prompt
+    # Nothing written since the last build: serve it without querying anything
+    key = _prompt_key()
+    with _prompt_cache_lock:
+        if _latest_prompt is not None:
+            latest_key, built_at, prompt = _latest_prompt
+            if latest_key == key and time.monotonic() - built_at < ACTIVE_VERSION_TTL_SECONDS:
+                return prompt
+
     # Get current strategy
-    current_version = (
-        supabase.table("agent_versions")
-        .select("*")
-        .eq("is_active", True)
-        .order("created_at", desc=True)
-        .limit(1)
-        .execute()
-    )
+    version_info = get_active_version(supabase)
 
-    if not current_version.data:
+    if not version_info:
         return "You are a real estate sales agent. Book property viewing appointments."
 
-    strategy = current_version.data[0].get("strategy_json", {})
-    version_info = current_version.data[0]
+    strategy = version_info.get("strategy_json", {})
 
     # Get comprehensive learnings
     from .analyzer import get_learnings, detect_trends
@@ -33,26 +73,70 @@ def build_optimized_prompt(supabase: Client, openai_client=None) -> str:
     trends = detect_trends(supabase)
 
     # Get high-confidence patterns
-    high_confidence_patterns = (
-        supabase.table("learning_patterns")
-        .select("*")
-        .eq("is_active", True)
-        .gte("confidence_score", 0.5)
-        .order("confidence_score", desc=True)
-        .order("success_rate", desc=True)
-        .limit(10)
-        .execute()
+    high_confidence_patterns = active_patterns(
+        supabase,
+        "pattern_type, pattern_description, confidence_score, success_rate",
+        order=("confidence_score", "success_rate"),
+        min_confidence=0.5,
+        limit=10,
     )
 
-    # Get prompt evolution history
-    prompt_history = (
-        supabase.table("prompt_evolution")
-        .select("*")
-        .order("created_at", desc=True)
-        .limit(5)
-        .execute()
+    # Get prompt evolution history (only the latest changes are rendered)
+    latest_snapshot = latest_prompt_snapshot(supabase, columns="changes_made")
+    recent_changes = (latest_snapshot.get("changes_made") or []) if latest_snapshot else []
+
+    version = version_info.get("version", "unknown")
+    inputs_hash = hash_prompt_inputs(
+        {
+            "version": version,
+            "strategy": strategy,
+            "conversion_rate": version_info.get("conversion_rate", 0),
+            "total_calls": version_info.get("total_calls", 0),
+            "learnings": learnings,
+            "trend": trends.get("trend"),
+            "top_objections": trends.get("top_objections", []),
+            "patterns": high_confidence_patterns,
+            "recent_changes": recent_changes,
+        }
     )
 
+    with _prompt_cache_lock:
+        final_prompt = _prompt_cache.get(inputs_hash)
+        if final_prompt is not None:
+            _prompt_cache.move_to_end(inputs_hash)
+
+    if final_prompt is None:
+        final_prompt = render_prompt(
+            version_info, learnings, trends, high_confidence_patterns, recent_changes
+        )
+        with _prompt_cache_lock:
+            _prompt_cache[inputs_hash] = final_prompt
+            while len(_prompt_cache) > PROMPT_CACHE_SIZE:
+                _prompt_cache.popitem(last=False)
+
+    # Store this prompt version for tracking, only when its inputs changed
+    with _prompt_cache_lock:
+        changed = _snapshot_hashes.get(version) != inputs_hash
+        _snapshot_hashes[version] = inputs_hash
+    if changed:
+        store_prompt_snapshot(supabase, version, final_prompt)
+
+    with _prompt_cache_lock:
+        # Keyed by the generations read before the inputs, so a write made meanwhile forces a rebuild
+        _latest_prompt = (key, time.monotonic(), final_prompt)
+    return final_prompt
+
+
+def render_prompt(
+    version_info: Dict[str, Any],
+    learnings: Dict[str, Any],
+    trends: Dict[str, Any],
+    patterns: List[Dict[str, Any]],
+    recent_changes: List[str],
+) -> str:
+    """Render the agent prompt from the active version and the learning inputs."""
+    strategy = version_info.get("strategy_json", {})
+
     # Extract strategy components
     opening = strategy.get("opening", {})
     objection_handling = strategy.get("objection_handling", {})
@@ -90,7 +174,7 @@ def build_optimized_prompt(supabase: Client, openai_client=None) -> str:
     )
 
     # Add high-confidence success patterns
-    success_patterns = [p for p in (high_confidence_patterns.data or []) if p.get("pattern_type") == "success_pattern"]
+    success_patterns = [p for p in patterns if p.get("pattern_type") == "success_pattern"]
     if success_patterns:
         prompt_parts.append("=== PROVEN SUCCESS PATTERNS (High Confidence) ===")
         for i, pattern in enumerate(success_patterns[:5], 1):
@@ -112,7 +196,7 @@ def build_optimized_prompt(supabase: Client, openai_client=None) -> str:
         prompt_parts.append("")
 
     # Add failure patterns to avoid
-    failure_patterns = [p for p in (high_confidence_patterns.data or []) if p.get("pattern_type") == "failure_pattern"]
+    failure_patterns = [p for p in patterns if p.get("pattern_type") == "failure_pattern"]
     if failure_patterns:
         prompt_parts.append("=== PATTERNS TO AVOID (High Confidence) ===")
         for i, pattern in enumerate(failure_patterns[:5], 1):
@@ -170,13 +254,11 @@ def build_optimized_prompt(supabase: Client, openai_client=None) -> str:
     )
 
     # Add iterative improvement notes
-    if prompt_history.data:
-        last_prompt = prompt_history.data[0]
-        if last_prompt.get("changes_made"):
-            prompt_parts.append("=== RECENT IMPROVEMENTS ===")
-            for change in last_prompt.get("changes_made", [])[:3]:
-                prompt_parts.append(f"- {change}")
-            prompt_parts.append("")
+    if recent_changes:
+        prompt_parts.append("=== RECENT IMPROVEMENTS ===")
+        for change in recent_changes[:3]:
+            prompt_parts.append(f"- {change}")
+        prompt_parts.append("")
 
     # Final instructions
     prompt_parts.extend(
@@ -192,90 +274,78 @@ def build_optimized_prompt(supabase: Client, openai_client=None) -> str:
         ]
     )
 
-    final_prompt = "\n".join(prompt_parts)
-
-    # Store this prompt version for tracking
-    store_prompt_snapshot(supabase, version_info.get("version", "unknown"), final_prompt)
-
-    return final_prompt
+    return "\n".join(prompt_parts)
 
 
 def store_prompt_snapshot(supabase: Client, version: str, prompt: str) -> None:
     """Store prompt snapshot for evolution tracking."""
     # Get current stats
-    current_version = (
-        supabase.table("agent_versions")
-        .select("total_calls, conversion_rate")
-        .eq("version", version)
-        .limit(1)
-        .execute()
-    )
+    stats = get_version(supabase, version, "total_calls, conversion_rate")
 
-    if current_version.data:
-        stats = current_version.data[0]
+    if stats:
         # Check if this prompt version already exists
-        existing = (
-            supabase.table("prompt_evolution")
-            .select("*")
-            .eq("version", version)
-            .order("created_at", desc=True)
-            .limit(1)
-            .execute()
-        )
+        existing = latest_prompt_snapshot(supabase, version)
 
         changes = []
-        if existing.data:
-            # Compare to previous version
-            prev_prompt = existing.data[0].get("prompt_snapshot", "")
-            if prev_prompt != prompt:
-                changes = ["Prompt updated with latest learnings"]
-
-        supabase.table("prompt_evolution").insert(
+        if existing:
+            # Compare to previous version; identical prompts are not snapshotted again
+            prev_prompt = existing.get("prompt_snapshot", "")
+            if prev_prompt == prompt:
+                return
+            changes = ["Prompt updated with latest learnings"]
+
+        insert_prompt_snapshot(
+            supabase,
             {
                 "version": version,
                 "prompt_snapshot": prompt,
                 "changes_made": changes,
                 "calls_count": stats.get("total_calls", 0),
                 "conversion_rate": stats.get("conversion_rate", 0.0),
-            }
-        ).execute()
+            },
+        )
+        # The next prompt renders these changes
+        invalidate_prompt()
 
 
-def get_prompt_improvement_suggestions(supabase: Client, openai_client=None) -> Dict:
+def get_prompt_improvement_suggestions(supabase: Client, openai_client=None, model_name: str = "gpt-4o") -> Dict:
     """
     Use AI to suggest prompt improvements based on all historical data.
     This is the most agentic function - it reasons about what to improve.
     """
+    request = build_suggestions_request(supabase, model_name)
+    if request is None:
+        return {"suggestions": [], "reasoning": "No active version"}
+    return complete_json(openai_client, **request)
+
+
+async def get_prompt_improvement_suggestions_async(
+    supabase: Client, openai_client=None, model_name: str = "gpt-4o"
+) -> Dict:
+    """Async variant of `get_prompt_improvement_suggestions`; Supabase work runs in a worker thread."""
+    request = await asyncio.to_thread(build_suggestions_request, supabase, model_name)
+    if request is None:
+        return {"suggestions": [], "reasoning": "No active version"}
+    return await complete_json_async(openai_client, **request)
+
+
+def build_suggestions_request(supabase: Client, model_name: str = "gpt-4o") -> Optional[Dict[str, Any]]:
+    """Build the prompt-improvement completion request, or None when there is no active version."""
     from .analyzer import get_learnings, detect_trends
 
     learnings = get_learnings(supabase, limit=20)
     trends = detect_trends(supabase)
 
     # Get recent performance
-    current_version = (
-        supabase.table("agent_versions")
-        .select("*")
-        .eq("is_active", True)
-        .order("created_at", desc=True)
-        .limit(1)
-        .execute()
-    )
+    version_info = get_active_version(supabase)
 
-    if not current_version.data:
-        return {"suggestions": [], "reasoning": "No active version"}
+    if not version_info:
+        return None
 
-    version_info = current_version.data[0]
     strategy = version_info.get("strategy_json", {})
 
     # Get patterns
-    patterns = (
-        supabase.table("learning_patterns")
-        .select("*")
-        .eq("is_active", True)
-        .order("confidence_score", desc=True)
-        .limit(15)
-        .execute()
-    )
+    patterns = active_patterns(supabase, limit=15)
 
     improvement_prompt = f"""You are an expert at optimizing sales prompts based on data.
 
@@ -294,7 +364,7 @@ FAILURES FROM {len(learnings.get('what_failed', []))} FAILED CALLS:
 {chr(10).join(f"- {item}" for item in learnings.get('what_failed', [])[:10])}
 
 IDENTIFIED PATTERNS:
-{chr(10).join(f"- {p.get('pattern_type')}: {p.get('pattern_description')} (confidence: {p.get('confidence_score', 0):.2f})" for p in (patterns.data or [])[:10])}
+{chr(10).join(f"- {p.get('pattern_type')}: {p.get('pattern_description')} (confidence: {p.get('confidence_score', 0):.2f})" for p in patterns[:10])}
 
 Analyze and suggest 3-5 specific, actionable improvements to the prompt/strategy.
 Focus on:
@@ -318,16 +388,12 @@ Return JSON:
   "reasoning": "overall analysis"
 }}"""
 
-    response = openai_client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
+    return {
+        "model": model_name,
+        "messages": [
             {"role": "system", "content": "You optimize sales prompts based on data. Return JSON only."},
             {"role": "user", "content": improvement_prompt},
         ],
-        response_format={"type": "json_object"},
-        temperature=0.8,
-        max_tokens=2000,
-    )
-
-    content = response.choices[0].message.content or "{}"
-    return json.loads(content)
+        "temperature": 0.8,
+        "max_tokens": 2000,
+    }
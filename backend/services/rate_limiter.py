@@ -0,0 +1,240 @@
+"""Rate limiter - shared client-side limits for Azure OpenAI: token buckets, AIMD concurrency and priorities."""
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class Priority(IntEnum):
+    """Lower values are served first."""
+
+    LIVE = 0  # analysis of calls as they complete
+    DASHBOARD = 1  # API requests from the dashboard
+    BATCH = 2  # background strategy work and scripts
+
+
+_priority: ContextVar[Priority] = ContextVar("llm_priority", default=Priority.DASHBOARD)
+
+
+def current_priority() -> Priority:
+    return _priority.get()
+
+
+@contextmanager
+def llm_priority(priority: Priority) -> Iterator[None]:
+    """Completions issued inside this block (including tasks and threads it starts) use `priority`."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def estimate_tokens(params: Dict[str, Any]) -> int:
+    """Prompt tokens at ~4 characters each plus max_tokens, as Azure counts requests against TPM."""
+    prompt_chars = sum(len(message.get("content") or "") for message in params.get("messages", []))
+    return prompt_chars // 4 + int(params.get("max_tokens") or 0)
+
+
+class TokenBucket:
+    """Refills at `per_minute / 60` per second up to `capacity`; a rate of 0 means unlimited."""
+
+    def __init__(self, per_minute: float, burst_seconds: float = 10.0) -> None:
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (requests larger than the bucket wait for a full one)."""
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount: float) -> None:
+        if self.rate:
+            self.level -= min(amount, self.capacity)
+
+
+class _Waiter:
+    __slots__ = ("priority", "tokens", "granted", "admitted_at", "cancelled", "event", "loop", "future")
+
+    def __init__(self, priority: Priority, tokens: int) -> None:
+        self.priority = priority
+        self.tokens = tokens
+        self.granted = False
+        self.admitted_at = 0.0
+        self.cancelled = False
+        self.event: Optional[threading.Event] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.future: Optional[asyncio.Future] = None
+
+    def wake(self) -> None:
+        if self.event is not None:
+            self.event.set()
+        elif self.loop is not None and self.future is not None:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self) -> None:
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class AdaptiveRateLimiter:
+    """
+    Admits completions under a requests-per-minute and a tokens-per-minute bucket and an
+    adaptive concurrency limit. The limit grows by one per limit's worth of successes and
+    halves on a 429 (AIMD); a Retry-After also pauses every admission until it passes.
+    Waiters are admitted strictly by priority, so live analysis goes ahead of dashboard
+    and batch work. Usable from threads (`acquire_sync`) and the event loop (`acquire`).
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+    ) -> None:
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.limit = float(self.max_concurrency)
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._waiters: List[Any] = []
+        self._seq = itertools.count()
+        self._stats = {"admitted": 0, "rate_limited": 0, "decreases": 0}
+
+    # --- admission -------------------------------------------------------------
+
+    def _dispatch(self, caller: Optional[_Waiter] = None) -> Optional[float]:
+        """
+        Admit waiters in priority order; returns seconds until the head could be admitted, or
+        None if it only waits for a release. A head blocked by the buckets or a pause that is
+        not `caller` is woken, so that it sleeps with that timeout rather than indefinitely.
+        """
+        woken: List[_Waiter] = []
+        wait: Optional[float] = None
+        while self._waiters:
+            waiter = self._waiters[0][2]
+            if waiter.cancelled:
+                heapq.heappop(self._waiters)
+                continue
+            if self._in_flight >= int(self.limit):
+                break  # a release will dispatch again
+            now = time.monotonic()
+            wait = max(
+                self._paused_until - now,
+                self._requests.wait_time(1, now),
+                self._tokens.wait_time(waiter.tokens, now),
+            )
+            if wait > 0:
+                if waiter is not caller:
+                    woken.append(waiter)
+                break
+            wait = None
+            heapq.heappop(self._waiters)
+            self._requests.take(1)
+            self._tokens.take(waiter.tokens)
+            self._in_flight += 1
+            self._stats["admitted"] += 1
+            waiter.granted = True
+            waiter.admitted_at = now
+            woken.append(waiter)
+        for waiter in woken:
+            waiter.wake()
+        return wait
+
+    def _enqueue(self, waiter: _Waiter) -> Optional[float]:
+        heapq.heappush(self._waiters, (int(waiter.priority), next(self._seq), waiter))
+        return self._dispatch(waiter)
+
+    def acquire_sync(self, tokens: int = 0, priority: Optional[Priority] = None) -> float:
+        """Block until admitted; returns the admission time to pass to `release`."""
+        waiter = _Waiter(current_priority() if priority is None else priority, tokens)
+        waiter.event = threading.Event()
+        with self._lock:
+            wait = self._enqueue(waiter)
+        while not waiter.granted:
+            waiter.event.wait(timeout=max(wait, 0.01) if wait is not None else None)
+            waiter.event.clear()
+            with self._lock:
+                wait = self._dispatch(waiter) if not waiter.granted else None
+        return waiter.admitted_at
+
+    async def acquire(self, tokens: int = 0, priority: Optional[Priority] = None) -> float:
+        """Wait until admitted; returns the admission time to pass to `release`."""
+        waiter = _Waiter(current_priority() if priority is None else priority, tokens)
+        waiter.loop = asyncio.get_running_loop()
+        with self._lock:
+            wait = self._enqueue(waiter)
+        try:
+            while not waiter.granted:
+                waiter.future = waiter.loop.create_future()
+                if waiter.granted:
+                    break
+                try:
+                    await asyncio.wait_for(waiter.future, timeout=max(wait, 0.01) if wait is not None else None)
+                except asyncio.TimeoutError:
+                    pass
+                with self._lock:
+                    wait = self._dispatch(waiter) if not waiter.granted else None
+        except asyncio.CancelledError:
+            with self._lock:
+                waiter.cancelled = True
+                granted = waiter.granted
+            if granted:
+                self.release(waiter.admitted_at)
+            raise
+        return waiter.admitted_at
+
+    def release(
+        self, admitted_at: float = 0.0, rate_limited: bool = False, retry_after: Optional[float] = None
+    ) -> None:
+        """Return a slot; report whether the completion was rejected with a 429."""
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            now = time.monotonic()
+            if rate_limited:
+                self._stats["rate_limited"] += 1
+                if retry_after:
+                    self._paused_until = max(self._paused_until, now + retry_after)
+                # Halve once per burst: 429s for requests admitted before the last decrease don't count again
+                if admitted_at >= self._last_decrease:
+                    self.limit = max(float(self.min_concurrency), self.limit / 2)
+                    self._last_decrease = now
+                    self._stats["decreases"] += 1
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            self._dispatch()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            waiting: Dict[str, int] = {priority.name.lower(): 0 for priority in Priority}
+            for _, _, waiter in self._waiters:
+                if not waiter.cancelled:
+                    waiting[Priority(waiter.priority).name.lower()] += 1
+            return {
+                "concurrency_limit": int(self.limit),
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self._in_flight,
+                "waiting": waiting,
+                "paused_for_seconds": round(max(0.0, self._paused_until - time.monotonic()), 3),
+                "requests_per_minute": self._requests.rate * 60,
+                "tokens_per_minute": self._tokens.rate * 60,
+                **self._stats,
+            }
@@ -0,0 +1,201 @@
+"""
+Repositories - the reads and writes the app makes on calls, agent_versions, call_learnings,
+learning_patterns and prompt_evolution.
+
+Services go through these functions instead of building table queries themselves, so every
+query a table serves is listed here. They take the storage client as their first argument
+and are written against the PostgREST builder, which both backends implement: the
+Supabase client, and `LocalStorageClient` on SQLite (see services/storage.py).
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from supabase import Client
+
+from .pagination import fetch_all, fetch_keyset_page
+
+DECIDED = ("booked", "not_booked")
+
+
+def _first(result: Any) -> Optional[Dict[str, Any]]:
+    return result.data[0] if result.data else None
+
+
+# calls
+
+
+def get_call(supabase: Client, call_id: str, columns: str = "*") -> Optional[Dict[str, Any]]:
+    return _first(supabase.table("calls").select(columns).eq("id", call_id).limit(1).execute())
+
+
+def get_call_by_vapi_id(supabase: Client, vapi_call_id: str, columns: str = "*") -> Optional[Dict[str, Any]]:
+    return _first(supabase.table("calls").select(columns).eq("vapi_call_id", vapi_call_id).limit(1).execute())
+
+
+def insert_call_once(supabase: Client, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Insert a call unless its vapi_call_id is already stored; None for a duplicate."""
+    return _first(supabase.table("calls").upsert(row, on_conflict="vapi_call_id", ignore_duplicates=True).execute())
+
+
+def update_call(supabase: Client, call_id: str, values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Update one call; returns the updated row, or None if it does not exist."""
+    return _first(supabase.table("calls").update(values).eq("id", call_id).execute())
+
+
+def recent_calls(
+    supabase: Client,
+    columns: str,
+    limit: int,
+    outcome: Optional[str] = None,
+    agent_version: Optional[str] = None,
+    analyzed: bool = False,
+) -> List[Dict[str, Any]]:
+    """Newest calls first, optionally only one outcome, one version, or calls with an analysis."""
+    query = supabase.table("calls").select(columns)
+    if outcome is not None:
+        query = query.eq("outcome", outcome)
+    if agent_version is not None:
+        query = query.eq("agent_version", agent_version)
+    if analyzed:
+        query = query.not_.is_("analysis_json", "null")
+    return query.order("created_at", desc=True).limit(limit).execute().data or []
+
+
+def calls_page(
+    supabase: Client, columns: str, after: Optional[Dict[str, Any]], page_size: int, desc: bool = False
+) -> List[Dict[str, Any]]:
+    """One keyset page of calls ordered by (created_at, id)."""
+    return fetch_keyset_page(lambda: supabase.table("calls").select(columns), after, page_size, desc=desc)
+
+
+def iter_decided_calls(
+    supabase: Client, columns: str, since: Optional[str] = None, newest_first: bool = False
+) -> Iterable[Dict[str, Any]]:
+    """Every booked or not_booked call (created at or after `since`), paged."""
+
+    def query():
+        q = supabase.table("calls").select(columns).in_("outcome", list(DECIDED))
+        if since is not None:
+            q = q.gte("created_at", since)
+        return q.order("created_at", desc=newest_first)
+
+    return fetch_all(query)
+
+
+# agent_versions
+
+
+def get_version(supabase: Client, version: str, columns: str = "*") -> Optional[Dict[str, Any]]:
+    return _first(supabase.table("agent_versions").select(columns).eq("version", version).limit(1).execute())
+
+
+def list_versions(supabase: Client, columns: str = "*") -> List[Dict[str, Any]]:
+    """Every version, newest first."""
+    return supabase.table("agent_versions").select(columns).order("created_at", desc=True).execute().data or []
+
+
+def fetch_active_version(supabase: Client) -> Optional[Dict[str, Any]]:
+    """The newest version with is_active set (uncached; see version_cache)."""
+    return _first(
+        supabase.table("agent_versions")
+        .select("*")
+        .eq("is_active", True)
+        .order("created_at", desc=True)
+        .limit(1)
+        .execute()
+    )
+
+
+def create_version(supabase: Client, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Insert a version row as given; strategy changes go through strategy_lock.insert_version."""
+    return _first(supabase.table("agent_versions").insert(row).execute())
+
+
+def deactivate_version(supabase: Client, version: str) -> None:
+    supabase.table("agent_versions").update({"is_active": False}).eq("version", version).execute()
+
+
+# call_learnings
+
+
+def insert_learnings(supabase: Client, rows: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return supabase.table("call_learnings").insert(list(rows)).execute().data or []
+
+
+def delete_learnings_for_calls(supabase: Client, call_ids: Sequence[str]) -> None:
+    supabase.table("call_learnings").delete().in_("call_id", list(call_ids)).execute()
+
+
+def count_learnings(supabase: Client, since: Optional[str] = None, inclusive: bool = True) -> int:
+    """Learnings created since `since` (all of them without it); counted by the database."""
+    query = supabase.table("call_learnings").select("id", count="exact", head=True)
+    if since is not None:
+        query = query.gte("created_at", since) if inclusive else query.gt("created_at", since)
+    return query.execute().count or 0
+
+
+def recent_learnings(supabase: Client, columns: str, limit: int) -> List[Dict[str, Any]]:
+    """Newest learnings first."""
+    return (
+        supabase.table("call_learnings").select(columns).order("created_at", desc=True).limit(limit).execute().data
+        or []
+    )
+
+
+def iter_learnings(supabase: Client, columns: str) -> Iterable[Dict[str, Any]]:
+    """Every learning, oldest first, paged with offsets."""
+    return fetch_all(lambda: supabase.table("call_learnings").select(columns).order("created_at"))
+
+
+def learnings_page(
+    supabase: Client, columns: str, after: Optional[Dict[str, Any]], page_size: int
+) -> List[Dict[str, Any]]:
+    """One keyset page of learnings ordered by (created_at, id)."""
+    return fetch_keyset_page(lambda: supabase.table("call_learnings").select(columns), after, page_size)
+
+
+# learning_patterns
+
+
+def active_patterns(
+    supabase: Client,
+    columns: str = "*",
+    order: Sequence[str] = ("confidence_score",),
+    min_confidence: Optional[float] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Active patterns sorted by the `order` columns, each descending."""
+    query = supabase.table("learning_patterns").select(columns).eq("is_active", True)
+    if min_confidence is not None:
+        query = query.gte("confidence_score", min_confidence)
+    for column in order:
+        query = query.order(column, desc=True)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.execute().data or []
+
+
+def iter_active_patterns(supabase: Client) -> Iterable[Dict[str, Any]]:
+    """Every active pattern, oldest first, paged with offsets."""
+    return fetch_all(lambda: supabase.table("learning_patterns").select("*").eq("is_active", True).order("created_at"))
+
+
+def upsert_patterns(supabase: Client, rows: Sequence[Dict[str, Any]]) -> None:
+    """Insert new patterns and overwrite existing ones (matched on id) in one request."""
+    supabase.table("learning_patterns").upsert(list(rows), on_conflict="id").execute()
+
+
+# prompt_evolution
+
+
+def latest_prompt_snapshot(
+    supabase: Client, version: Optional[str] = None, columns: str = "*"
+) -> Optional[Dict[str, Any]]:
+    """The newest prompt snapshot, of `version` if given."""
+    query = supabase.table("prompt_evolution").select(columns)
+    if version is not None:
+        query = query.eq("version", version)
+    return _first(query.order("created_at", desc=True).limit(1).execute())
+
+
+def insert_prompt_snapshot(supabase: Client, row: Dict[str, Any]) -> None:
+    supabase.table("prompt_evolution").insert(row).execute()
@@ -0,0 +1,615 @@
+"""
+Storage backends - Supabase, or a local SQLite database behind the same query-builder interface.
+
+Services read and write calls, agent_versions, call_learnings, learning_patterns and
+prompt_evolution through services/repositories.py, which builds PostgREST-style queries
+(`client.table(...).select(...).eq(...).order(...).execute()`). `LocalStorageClient`
+implements the subset of that builder the repositories and the remaining small tables
+use, on top of SQLite with the tables, constraints and triggers of `supabase-schema.sql`.
+Point `STORAGE_BACKEND=sqlite` at a file (or `:memory:`) to run and benchmark the whole
+pipeline without a Supabase project.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+SCHEMA_SQL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "supabase-schema.sql")
+
+# SQLite port of supabase-schema.sql. UUID/TIMESTAMPTZ are TEXT, JSONB and TEXT[] are
+# JSON-encoded TEXT, BOOLEAN is INTEGER. Keep in sync with the Postgres schema.
+LOCAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS agent_versions (
+  id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+  version TEXT NOT NULL UNIQUE,
+  strategy_json TEXT NOT NULL,
+  total_calls INTEGER DEFAULT 0,
+  total_bookings INTEGER DEFAULT 0,
+  conversion_rate REAL DEFAULT 0.0,
+  is_active INTEGER DEFAULT 1,
+  lease_holder TEXT,
+  created_at TEXT DEFAULT (now()),
+  updated_at TEXT DEFAULT (now())
+);
+
+CREATE TABLE IF NOT EXISTS calls (
+  id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+  vapi_call_id TEXT UNIQUE,
+  agent_version TEXT REFERENCES agent_versions(version),
+  transcript TEXT,
+  outcome TEXT CHECK (outcome IN ('booked', 'not_booked', 'pending')),
+  duration_seconds INTEGER,
+  analysis_json TEXT,
+  customer_phone TEXT,
+  call_metadata TEXT,
+  created_at TEXT DEFAULT (now())
+);
+
+CREATE INDEX IF NOT EXISTS idx_calls_agent_version ON calls(agent_version);
+CREATE INDEX IF NOT EXISTS idx_calls_outcome ON calls(outcome);
+-- Keyset pagination of calls orders by (created_at, id); this index serves both directions
+DROP INDEX IF EXISTS idx_calls_created_at;
+CREATE INDEX IF NOT EXISTS idx_calls_created_at_id ON calls(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_agent_versions_active ON agent_versions(is_active);
+
+CREATE TABLE IF NOT EXISTS agent_stats (
+  id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+  total_calls INTEGER NOT NULL DEFAULT 0,
+  total_bookings INTEGER NOT NULL DEFAULT 0,
+  versions_created INTEGER NOT NULL DEFAULT 0,
+  current_version TEXT,
+  updated_at TEXT DEFAULT (now())
+);
+
+INSERT INTO agent_stats (id, total_calls, total_bookings, versions_created, current_version)
+SELECT
+  1,
+  COALESCE(SUM(total_calls), 0),
+  COALESCE(SUM(total_bookings), 0),
+  COUNT(*),
+  (SELECT version FROM agent_versions WHERE is_active = 1 ORDER BY created_at DESC LIMIT 1)
+FROM agent_versions
+WHERE true
+ON CONFLICT (id) DO NOTHING;
+
+-- Delta triggers: one call moves its version's and the global totals by at most 1
+DROP TRIGGER IF EXISTS trigger_update_agent_stats_insert;
+CREATE TRIGGER trigger_update_agent_stats_insert
+AFTER INSERT ON calls
+WHEN NEW.outcome IN ('booked', 'not_booked')
+BEGIN
+  UPDATE agent_versions
+  SET
+    total_calls = COALESCE(total_calls, 0) + 1,
+    total_bookings = COALESCE(total_bookings, 0) + (NEW.outcome IS 'booked'),
+    conversion_rate = CASE
+      WHEN COALESCE(total_calls, 0) + 1 > 0
+      THEN CAST(COALESCE(total_bookings, 0) + (NEW.outcome IS 'booked') AS REAL) / (COALESCE(total_calls, 0) + 1)
+      ELSE 0
+    END,
+    updated_at = now()
+  WHERE version = NEW.agent_version AND NEW.outcome IN ('booked', 'not_booked');
+  UPDATE agent_stats
+  SET total_calls = total_calls + 1, total_bookings = total_bookings + (NEW.outcome IS 'booked'), updated_at = now()
+  WHERE id = 1;
+END;
+
+DROP TRIGGER IF EXISTS trigger_update_agent_stats_update;
+CREATE TRIGGER trigger_update_agent_stats_update
+AFTER UPDATE OF outcome, agent_version ON calls
+WHEN OLD.outcome IS NOT NEW.outcome OR OLD.agent_version IS NOT NEW.agent_version
+BEGIN
+  UPDATE agent_versions
+  SET
+    total_calls = COALESCE(total_calls, 0) - 1,
+    total_bookings = COALESCE(total_bookings, 0) - (OLD.outcome IS 'booked'),
+    conversion_rate = CASE
+      WHEN COALESCE(total_calls, 0) - 1 > 0
+      THEN CAST(COALESCE(total_bookings, 0) - (OLD.outcome IS 'booked') AS REAL) / (COALESCE(total_calls, 0) - 1)
+      ELSE 0
+    END,
+    updated_at = now()
+  WHERE version = OLD.agent_version AND OLD.outcome IN ('booked', 'not_booked');
+  UPDATE agent_versions
+  SET
+    total_calls = COALESCE(total_calls, 0) + 1,
+    total_bookings = COALESCE(total_bookings, 0) + (NEW.outcome IS 'booked'),
+    conversion_rate = CASE
+      WHEN COALESCE(total_calls, 0) + 1 > 0
+      THEN CAST(COALESCE(total_bookings, 0) + (NEW.outcome IS 'booked') AS REAL) / (COALESCE(total_calls, 0) + 1)
+      ELSE 0
+    END,
+    updated_at = now()
+  WHERE version = NEW.agent_version AND NEW.outcome IN ('booked', 'not_booked');
+  UPDATE agent_stats
+  SET
+    total_calls = total_calls
+      - (OLD.outcome IS 'booked' OR OLD.outcome IS 'not_booked')
+      + (NEW.outcome IS 'booked' OR NEW.outcome IS 'not_booked'),
+    total_bookings = total_bookings - (OLD.outcome IS 'booked') + (NEW.outcome IS 'booked'),
+    updated_at = now()
+  WHERE id = 1;
+END;
+
+DROP TRIGGER IF EXISTS trigger_update_agent_stats_delete;
+CREATE TRIGGER trigger_update_agent_stats_delete
+AFTER DELETE ON calls
+WHEN OLD.outcome IN ('booked', 'not_booked')
+BEGIN
+  UPDATE agent_versions
+  SET
+    total_calls = COALESCE(total_calls, 0) - 1,
+    total_bookings = COALESCE(total_bookings, 0) - (OLD.outcome IS 'booked'),
+    conversion_rate = CASE
+      WHEN COALESCE(total_calls, 0) - 1 > 0
+      THEN CAST(COALESCE(total_bookings, 0) - (OLD.outcome IS 'booked') AS REAL) / (COALESCE(total_calls, 0) - 1)
+      ELSE 0
+    END,
+    updated_at = now()
+  WHERE version = OLD.agent_version AND OLD.outcome IN ('booked', 'not_booked');
+  UPDATE agent_stats
+  SET total_calls = total_calls - 1, total_bookings = total_bookings - (OLD.outcome IS 'booked'), updated_at = now()
+  WHERE id = 1;
+END;
+
+DROP TRIGGER IF EXISTS trigger_update_agent_stats_versions_insert;
+CREATE TRIGGER trigger_update_agent_stats_versions_insert
+AFTER INSERT ON agent_versions
+BEGIN
+  UPDATE agent_stats
+  SET
+    versions_created = versions_created + 1,
+    current_version = (SELECT version FROM agent_versions WHERE is_active = 1 ORDER BY created_at DESC LIMIT 1),
+    updated_at = now()
+  WHERE id = 1;
+END;
+
+DROP TRIGGER IF EXISTS trigger_update_agent_stats_versions_update;
+CREATE TRIGGER trigger_update_agent_stats_versions_update
+AFTER UPDATE OF is_active ON agent_versions
+BEGIN
+  UPDATE agent_stats
+  SET
+    current_version = (SELECT version FROM agent_versions WHERE is_active = 1 ORDER BY created_at DESC LIMIT 1),
+    updated_at = now()
+  WHERE id = 1;
+END;
+
+DROP TRIGGER IF EXISTS trigger_update_agent_stats_versions_delete;
+CREATE TRIGGER trigger_update_agent_stats_versions_delete
+AFTER DELETE ON agent_versions
+BEGIN
+  UPDATE agent_stats
+  SET
+    versions_created = versions_created - 1,
+    current_version = (SELECT version FROM agent_versions WHERE is_active = 1 ORDER BY created_at DESC LIMIT 1),
+    updated_at = now()
+  WHERE id = 1;
+END;
+
+CREATE TABLE IF NOT EXISTS call_learnings (
+  id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+  call_id TEXT REFERENCES calls(id),
+  outcome TEXT CHECK (outcome IN ('booked', 'not_booked')),
+  what_worked TEXT,
+  what_failed TEXT,
+  key_phrase TEXT,
+  objection_types TEXT,
+  engagement_level TEXT,
+  conversion_factors TEXT,
+  created_at TEXT DEFAULT (now())
+);
+
+CREATE TABLE IF NOT EXISTS learning_patterns (
+  id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+  pattern_type TEXT NOT NULL,
+  pattern_description TEXT NOT NULL,
+  pattern_data TEXT,
+  frequency INTEGER DEFAULT 1,
+  success_rate REAL,
+  confidence_score REAL DEFAULT 0.0,
+  first_seen_at TEXT DEFAULT (now()),
+  last_seen_at TEXT DEFAULT (now()),
+  is_active INTEGER DEFAULT 1,
+  created_at TEXT DEFAULT (now()),
+  updated_at TEXT DEFAULT (now())
+);
+
+CREATE TABLE IF NOT EXISTS prompt_evolution (
+  id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+  version TEXT NOT NULL,
+  prompt_snapshot TEXT NOT NULL,
+  changes_made TEXT,
+  calls_count INTEGER DEFAULT 0,
+  conversion_rate REAL DEFAULT 0.0,
+  created_at TEXT DEFAULT (now())
+);
+
+CREATE INDEX IF NOT EXISTS idx_call_learnings_call_id ON call_learnings(call_id);
+CREATE INDEX IF NOT EXISTS idx_call_learnings_outcome ON call_learnings(outcome);
+-- The learning statistics scan pages call_learnings by (created_at, id)
+DROP INDEX IF EXISTS idx_call_learnings_created_at;
+CREATE INDEX IF NOT EXISTS idx_call_learnings_created_at_id ON call_learnings(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_learning_patterns_type ON learning_patterns(pattern_type);
+CREATE INDEX IF NOT EXISTS idx_learning_patterns_active ON learning_patterns(is_active);
+CREATE INDEX IF NOT EXISTS idx_prompt_evolution_version ON prompt_evolution(version);
+
+CREATE TABLE IF NOT EXISTS strategy_leases (
+  name TEXT PRIMARY KEY,
+  holder TEXT NOT NULL,
+  expires_at TEXT NOT NULL,
+  acquired_at TEXT DEFAULT (now())
+);
+
+DROP TRIGGER IF EXISTS trigger_fence_agent_version_insert;
+CREATE TRIGGER trigger_fence_agent_version_insert
+BEFORE INSERT ON agent_versions
+WHEN NEW.lease_holder IS NOT NULL AND NOT EXISTS (
+  SELECT 1 FROM strategy_leases WHERE holder = NEW.lease_holder AND expires_at > now()
+)
+BEGIN
+  SELECT RAISE(ABORT, 'strategy lease not held');
+END;
+
+CREATE TABLE IF NOT EXISTS learning_syntheses (
+  id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+  version INTEGER NOT NULL UNIQUE,
+  synthesis TEXT NOT NULL,
+  model TEXT,
+  generated_at TEXT NOT NULL,
+  created_at TEXT DEFAULT (now())
+);
+"""
+
+# Port of rebuild_agent_stats(): recount totals after writing calls with the triggers dropped
+REBUILD_STATS_SQL = """
+UPDATE agent_versions SET
+  total_calls = (SELECT COUNT(*) FROM calls WHERE agent_version = agent_versions.version AND outcome IN ('booked', 'not_booked')),
+  total_bookings = (SELECT COUNT(*) FROM calls WHERE agent_version = agent_versions.version AND outcome = 'booked'),
+  conversion_rate = COALESCE((
+    SELECT CAST(SUM(outcome = 'booked') AS REAL) / COUNT(*)
+    FROM calls WHERE agent_version = agent_versions.version AND outcome IN ('booked', 'not_booked')
+  ), 0),
+  updated_at = now();
+
+UPDATE agent_stats SET
+  total_calls = (SELECT COUNT(*) FROM calls WHERE outcome IN ('booked', 'not_booked')),
+  total_bookings = (SELECT COUNT(*) FROM calls WHERE outcome = 'booked'),
+  versions_created = (SELECT COUNT(*) FROM agent_versions),
+  current_version = (SELECT version FROM agent_versions WHERE is_active = 1 ORDER BY created_at DESC LIMIT 1),
+  updated_at = now()
+WHERE id = 1;
+"""
+
+JSON_COLUMNS = {
+    "agent_versions": {"strategy_json"},
+    "calls": {"analysis_json", "call_metadata"},
+    "call_learnings": {"objection_types", "conversion_factors"},
+    "learning_patterns": {"pattern_data"},
+    "prompt_evolution": {"changes_made"},
+    "learning_syntheses": {"synthesis"},
+}
+BOOL_COLUMNS = {
+    "agent_versions": {"is_active"},
+    "learning_patterns": {"is_active"},
+}
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+# PostgREST JSON projection: `alias:column->>key` selects one JSON field as text
+_JSON_FIELD = re.compile(r"^(?:([A-Za-z_][A-Za-z0-9_]*):)?([A-Za-z_][A-Za-z0-9_]*)->>([A-Za-z_][A-Za-z0-9_]*)$")
+
+
+class StorageError(Exception):
+    """Raised by the local backend for constraint violations and unsupported queries."""
+
+
+def _now() -> str:
+    # Fixed-width so timestamps sort lexicographically, like timestamptz in Postgres
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+
+
+def _identifier(name: str) -> str:
+    if not _IDENTIFIER.match(name):
+        raise StorageError(f"Unsupported column or table name: {name!r}")
+    return name
+
+
+def _select_column(name: str) -> str:
+    field = _JSON_FIELD.match(name)
+    if not field:
+        return _identifier(name)
+    alias, column, key = field.groups()
+    return f"json_extract({column}, '$.{key}') AS {alias or key}"
+
+
+def baseline_strategy() -> Optional[str]:
+    """The v1.0 strategy JSON seeded by supabase-schema.sql, read from that file."""
+    try:
+        with open(SCHEMA_SQL_PATH, encoding="utf-8") as f:
+            schema = f.read()
+    except OSError:
+        return None
+    match = re.search(r"INSERT INTO agent_versions.*?VALUES\s*\(\s*'v1\.0',\s*'(.*?)'::jsonb", schema, re.DOTALL)
+    return match.group(1).replace("''", "'") if match else None
+
+
+class StorageResult:
+    """Mirrors the `.data` / `.count` shape of postgrest responses."""
+
+    def __init__(self, data: List[Dict[str, Any]], count: Optional[int] = None) -> None:
+        self.data = data
+        self.count = count
+
+
+class LocalQuery:
+    """Query builder over one SQLite table; chain filters, then `execute()`."""
+
+    def __init__(self, client: "LocalStorageClient", table: str) -> None:
+        self._client = client
+        self._table = _identifier(table)
+        self._action = "select"
+        self._columns = "*"
+        self._count: Optional[str] = None
+        self._head = False
+        self._values: List[Dict[str, Any]] = []
+        self._on_conflict: Optional[str] = None
+        self._ignore_duplicates = False
+        self._where: List[Tuple[str, List[Any]]] = []
+        self._order: List[str] = []
+        self._limit: Optional[int] = None
+        self._offset: Optional[int] = None
+        self._negate = False
+
+    # --- actions -----------------------------------------------------------------
+
+    def select(self, *columns: str, count: Optional[str] = None, head: Optional[bool] = None) -> "LocalQuery":
+        names = [c.strip() for column in (columns or ("*",)) for c in column.split(",") if c.strip()]
+        self._columns = "*" if "*" in names else ", ".join(_select_column(name) for name in names)
+        self._count = count
+        self._head = bool(head)
+        return self
+
+    def insert(self, values: Union[Dict[str, Any], List[Dict[str, Any]]], **_: Any) -> "LocalQuery":
+        self._action = "insert"
+        self._values = [values] if isinstance(values, dict) else list(values)
+        return self
+
+    def upsert(
+        self,
+        values: Union[Dict[str, Any], List[Dict[str, Any]]],
+        on_conflict: str = "id",
+        ignore_duplicates: bool = False,
+        **_: Any,
+    ) -> "LocalQuery":
+        self._action = "upsert"
+        self._values = [values] if isinstance(values, dict) else list(values)
+        self._on_conflict = on_conflict or "id"
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, values: Dict[str, Any], **_: Any) -> "LocalQuery":
+        self._action = "update"
+        self._values = [values]
+        return self
+
+    def delete(self, **_: Any) -> "LocalQuery":
+        self._action = "delete"
+        return self
+
+    # --- filters -----------------------------------------------------------------
+
+    @property
+    def not_(self) -> "LocalQuery":
+        self._negate = True
+        return self
+
+    def _filter(self, sql: str, params: Sequence[Any] = ()) -> "LocalQuery":
+        if self._negate:
+            sql = f"NOT ({sql})"
+            self._negate = False
+        self._where.append((sql, list(params)))
+        return self
+
+    def eq(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(f"{_identifier(column)} = ?", [self._client.encode(self._table, column, value)])
+
+    def neq(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(f"{_identifier(column)} != ?", [self._client.encode(self._table, column, value)])
+
+    def gt(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(f"{_identifier(column)} > ?", [value])
+
+    def gte(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(f"{_identifier(column)} >= ?", [value])
+
+    def lt(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(f"{_identifier(column)} < ?", [value])
+
+    def lte(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(f"{_identifier(column)} <= ?", [value])
+
+    def ilike(self, column: str, pattern: str) -> "LocalQuery":
+        # SQLite LIKE is case-insensitive for ASCII, matching Postgres ILIKE closely enough
+        return self._filter(f"{_identifier(column)} LIKE ?", [pattern])
+
+    def in_(self, column: str, values: Iterable[Any]) -> "LocalQuery":
+        values = [self._client.encode(self._table, column, v) for v in values]
+        if not values:
+            return self._filter("0")
+        return self._filter(f"{_identifier(column)} IN ({', '.join('?' for _ in values)})", values)
+
+    def is_(self, column: str, value: Any) -> "LocalQuery":
+        if value is None or str(value).lower() == "null":
+            return self._filter(f"{_identifier(column)} IS NULL")
+        return self._filter(f"{_identifier(column)} = ?", [1 if str(value).lower() == "true" else 0])
+
+    def order(self, column: str, desc: bool = False, **_: Any) -> "LocalQuery":
+        self._order.append(f"{_identifier(column)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, size: int, **_: Any) -> "LocalQuery":
+        self._limit = int(size)
+        return self
+
+    def range(self, start: int, end: int, **_: Any) -> "LocalQuery":
+        self._offset = int(start)
+        self._limit = int(end) - int(start) + 1
+        return self
+
+    # --- execution ---------------------------------------------------------------
+
+    def _where_sql(self) -> Tuple[str, List[Any]]:
+        if not self._where:
+            return "", []
+        params: List[Any] = []
+        for _, p in self._where:
+            params.extend(p)
+        return " WHERE " + " AND ".join(f"({sql})" for sql, _ in self._where), params
+
+    def execute(self) -> StorageResult:
+        with self._client.lock:
+            self._client.query_counts[self._table] += 1
+            try:
+                return getattr(self, f"_execute_{self._action}")()
+            except sqlite3.IntegrityError as e:
+                raise StorageError(str(e)) from e
+
+    def _execute_select(self) -> StorageResult:
+        where, params = self._where_sql()
+        count = None
+        if self._count:
+            count = self._client.conn.execute(f"SELECT COUNT(*) FROM {self._table}{where}", params).fetchone()[0]
+        if self._head:
+            return StorageResult([], count)
+        sql = f"SELECT {self._columns} FROM {self._table}{where}"
+        if self._order:
+            sql += " ORDER BY " + ", ".join(self._order)
+        if self._limit is not None or self._offset is not None:
+            sql += f" LIMIT {self._limit if self._limit is not None else -1} OFFSET {self._offset or 0}"
+        rows = self._client.conn.execute(sql, params).fetchall()
+        return StorageResult([self._client.decode(self._table, row) for row in rows], count)
+
+    def _execute_insert(self) -> StorageResult:
+        return self._write_rows(conflict_clause="")
+
+    def _execute_upsert(self) -> StorageResult:
+        target = ", ".join(_identifier(c.strip()) for c in self._on_conflict.split(","))
+        if self._ignore_duplicates:
+            return self._write_rows(conflict_clause=f" ON CONFLICT({target}) DO NOTHING")
+        return self._write_rows(conflict_clause=f" ON CONFLICT({target}) DO UPDATE SET {{updates}}")
+
+    def _write_rows(self, conflict_clause: str) -> StorageResult:
+        conn = self._client.conn
+        inserted: List[Dict[str, Any]] = []
+        conn.execute("BEGIN")
+        try:
+            for values in self._values:
+                columns = [_identifier(c) for c in values]
+                encoded = [self._client.encode(self._table, c, values[c]) for c in columns]
+                clause = conflict_clause.replace(
+                    "{updates}", ", ".join(f"{c} = excluded.{c}" for c in columns) or "id = id"
+                )
+                if columns:
+                    sql = (
+                        f"INSERT INTO {self._table} ({', '.join(columns)}) "
+                        f"VALUES ({', '.join('?' for _ in columns)}){clause} RETURNING *"
+                    )
+                else:
+                    sql = f"INSERT INTO {self._table} DEFAULT VALUES RETURNING *"
+                inserted.extend(self._client.decode(self._table, row) for row in conn.execute(sql, encoded).fetchall())
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return StorageResult(inserted)
+
+    def _execute_update(self) -> StorageResult:
+        values = self._values[0]
+        columns = [_identifier(c) for c in values]
+        where, params = self._where_sql()
+        sql = f"UPDATE {self._table} SET {', '.join(f'{c} = ?' for c in columns)}{where} RETURNING *"
+        encoded = [self._client.encode(self._table, c, values[c]) for c in columns]
+        rows = self._client.conn.execute(sql, encoded + params).fetchall()
+        return StorageResult([self._client.decode(self._table, row) for row in rows])
+
+    def _execute_delete(self) -> StorageResult:
+        where, params = self._where_sql()
+        rows = self._client.conn.execute(f"DELETE FROM {self._table}{where} RETURNING *", params).fetchall()
+        return StorageResult([self._client.decode(self._table, row) for row in rows])
+
+
+class LocalStorageClient:
+    """SQLite stand-in for the Supabase client, schema-compatible with supabase-schema.sql."""
+
+    def __init__(self, db_path: str = ":memory:") -> None:
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        # Executed queries per table, for benchmarks
+        self.query_counts: Counter = Counter()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.create_function("gen_random_uuid", 0, lambda: str(uuid.uuid4()))
+        self.conn.create_function("now", 0, _now)
+        with self.lock:
+            self.conn.execute("PRAGMA foreign_keys = ON")
+            if db_path != ":memory:":
+                self.conn.execute("PRAGMA journal_mode=WAL")
+            self._migrate()
+            self.conn.executescript(LOCAL_SCHEMA)
+            self._seed_baseline()
+
+    def _migrate(self) -> None:
+        """Add columns introduced after a database file was created."""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(agent_versions)")}
+        if columns and "lease_holder" not in columns:
+            self.conn.execute("ALTER TABLE agent_versions ADD COLUMN lease_holder TEXT")
+
+    def _seed_baseline(self) -> None:
+        strategy = baseline_strategy()
+        if strategy is None:
+            return
+        self.conn.execute(
+            "INSERT INTO agent_versions (version, strategy_json, is_active) VALUES ('v1.0', ?, 1) "
+            "ON CONFLICT(version) DO NOTHING",
+            (json.dumps(json.loads(strategy)),),
+        )
+
+    def table(self, name: str) -> LocalQuery:
+        return LocalQuery(self, name)
+
+    def encode(self, table: str, column: str, value: Any) -> Any:
+        if value is None:
+            return None
+        if column in JSON_COLUMNS.get(table, ()):
+            return json.dumps(value)
+        if isinstance(value, bool):
+            return int(value)
+        if isinstance(value, (dict, list)):
+            return json.dumps(value)
+        return value
+
+    def decode(self, table: str, row: sqlite3.Row) -> Dict[str, Any]:
+        record = dict(row)
+        for column in JSON_COLUMNS.get(table, ()):
+            if isinstance(record.get(column), str):
+                record[column] = json.loads(record[column])
+        for column in BOOL_COLUMNS.get(table, ()):
+            if record.get(column) is not None:
+                record[column] = bool(record[column])
+        return record
+
+
+def create_storage_client(backend: str, supabase_url: Optional[str] = None, supabase_key: Optional[str] = None, sqlite_path: str = ":memory:"):
+    """Build the storage client for `backend` ("supabase" or "sqlite")."""
+    if backend == "sqlite":
+        return LocalStorageClient(sqlite_path)
+    if backend != "supabase":
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend!r}")
+    from supabase import create_client
+
+    return create_client(supabase_url, supabase_key)
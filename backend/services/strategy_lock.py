@@ -0,0 +1,164 @@
+"""Strategy lock - single-flight guard for work that creates agent versions (mutation, optimization)."""
+import asyncio
+import os
+import socket
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from supabase import Client
+
+from .repositories import create_version
+
+STRATEGY_LEASE_SECONDS = float(os.getenv("STRATEGY_LEASE_SECONDS", "300"))
+
+T = TypeVar("T")
+
+# Holder of the lease the current strategy change runs under (seen by its worker threads too)
+_lease_holder: ContextVar[Optional[str]] = ContextVar("strategy_lease_holder", default=None)
+LEASE_LOST_MESSAGE = "strategy lease not held"
+
+
+class LeaseHeld(Exception):
+    """Another worker is already changing the strategy."""
+
+
+def _timestamp(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+
+
+class StrategyLock:
+    """
+    Only one strategy change runs at a time.
+    In-process, an asyncio lock serializes mutation and optimization, and concurrent callers
+    of the same operation await the in-flight run and share its result instead of starting
+    another LLM call. Across workers, the holder also owns a row in `strategy_leases`; it
+    is claimed with an insert-if-absent and taken over only once expired, so a crashed
+    worker blocks others for at most `lease_seconds`. While the operation runs (it may wait
+    behind live work in the rate limiter) the lease is renewed every third of that; if it
+    was taken over anyway, the operation is cancelled. Cancellation is only a shortcut: the
+    version insert itself is fenced on the lease (see `insert_version`).
+    """
+
+    def __init__(self, name: str = "strategy", lease_seconds: float = STRATEGY_LEASE_SECONDS) -> None:
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.holder_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = asyncio.Lock()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    def _acquire_lease(self, supabase: Client) -> str:
+        holder = f"{self.holder_prefix}:{uuid.uuid4().hex[:8]}"
+        now = datetime.now(timezone.utc)
+        expires_at = _timestamp(now + timedelta(seconds=self.lease_seconds))
+        claimed = (
+            supabase.table("strategy_leases")
+            .upsert(
+                {"name": self.name, "holder": holder, "expires_at": expires_at},
+                on_conflict="name",
+                ignore_duplicates=True,
+            )
+            .execute()
+        )
+        if claimed.data:
+            return holder
+        # The row exists: take it over only if its holder let it expire
+        taken = (
+            supabase.table("strategy_leases")
+            .update({"holder": holder, "expires_at": expires_at})
+            .eq("name", self.name)
+            .lt("expires_at", _timestamp(now))
+            .execute()
+        )
+        if taken.data:
+            return holder
+        raise LeaseHeld("A strategy update is already running on another worker")
+
+    def _renew_lease(self, supabase: Client, holder: str) -> bool:
+        expires_at = _timestamp(datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds))
+        renewed = (
+            supabase.table("strategy_leases")
+            .update({"expires_at": expires_at})
+            .eq("name", self.name)
+            .eq("holder", holder)
+            .execute()
+        )
+        return bool(renewed.data)
+
+    async def _keep_lease(self, supabase: Client, holder: str, work: asyncio.Future, lost: asyncio.Event) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                renewed = await asyncio.to_thread(self._renew_lease, supabase, holder)
+            except Exception as e:
+                print(f"⚠️ Could not renew the {self.name} lease: {e}")
+                continue
+            if not renewed:
+                lost.set()
+                work.cancel()
+                return
+
+    def _release_lease(self, supabase: Client, holder: str) -> None:
+        supabase.table("strategy_leases").delete().eq("name", self.name).eq("holder", holder).execute()
+
+    async def run(self, supabase: Client, operation: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run `fn` as the only strategy change; joins an in-flight run of the same `operation`."""
+        in_flight = self._in_flight.get(operation)
+        if in_flight is not None:
+            return await asyncio.shield(in_flight)
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._in_flight[operation] = future
+        try:
+            async with self._lock:
+                holder = await asyncio.to_thread(self._acquire_lease, supabase)
+                # The task copies the context now, so `fn` and its threads see the holder
+                token = _lease_holder.set(holder)
+                try:
+                    work = asyncio.ensure_future(fn())
+                finally:
+                    _lease_holder.reset(token)
+                lost = asyncio.Event()
+                heartbeat = asyncio.create_task(self._keep_lease(supabase, holder, work, lost))
+                try:
+                    result = await work
+                except asyncio.CancelledError:
+                    if not lost.is_set():
+                        raise
+                    raise LeaseHeld(f"The {self.name} lease was taken over by another worker")
+                finally:
+                    heartbeat.cancel()
+                    await asyncio.to_thread(self._release_lease, supabase, holder)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved: there may be no one waiting on this run
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._in_flight.pop(operation, None)
+
+
+def insert_version(supabase: Client, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Insert an agent_versions row and return it. Inside `StrategyLock.run` the row carries the
+    lease holder and the database rejects it unless that lease is still held (raised as LeaseHeld).
+    """
+    holder = _lease_holder.get()
+    if holder is not None:
+        row = {**row, "lease_holder": holder}
+    try:
+        return create_version(supabase, row)
+    except Exception as e:
+        if LEASE_LOST_MESSAGE in str(e):
+            raise LeaseHeld("The strategy lease was lost before the new version was written") from e
+        raise
+
+
+strategy_lock = StrategyLock()
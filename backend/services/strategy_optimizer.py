@@ -1,32 +1,38 @@
 """Strategy optimizer - agentic function that updates strategy_json in database based on all learnings."""
+import asyncio
 import json
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI
 from supabase import Client
 
+from .counters import call_counters
+from .llm import complete_json_async
+from .repositories import active_patterns, deactivate_version, get_version, recent_calls as fetch_recent_calls
+from .strategy_lock import insert_version
+from .version_cache import get_active_version, invalidate_active_version
+
 
 async def optimize_strategy_from_learnings(
-    supabase: Client, openai_client: AzureOpenAI, model_name: str = "gpt-4o"
+    supabase: Client, openai_client: AsyncAzureOpenAI, model_name: str = "gpt-4o"
 ) -> Dict[str, Any]:
     """
     Agentic function that analyzes all learnings and creates an improved strategy.
     This actually updates the agent_versions table with a new version.
     """
+    current, request = await asyncio.to_thread(build_optimization_request, supabase, model_name)
+    improved_strategy = await complete_json_async(openai_client, **request)
+    return await asyncio.to_thread(apply_optimized_strategy, supabase, current, improved_strategy)
+
+
+def build_optimization_request(supabase: Client, model_name: str = "gpt-4o") -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Load the active version and build the optimization completion request for it."""
     # Get current active version
-    current_version = (
-        supabase.table("agent_versions")
-        .select("*")
-        .eq("is_active", True)
-        .order("created_at", desc=True)
-        .limit(1)
-        .execute()
-    )
+    current = get_active_version(supabase)
 
-    if not current_version.data:
+    if not current:
         raise ValueError("No active agent version found")
 
-    current = current_version.data[0]
     current_strategy = current.get("strategy_json", {})
     current_version_num = current.get("version", "v1.0")
 
@@ -38,30 +44,14 @@ async def optimize_strategy_from_learnings(
     history = get_historical_context(supabase, limit=30)
 
     # Get high-confidence patterns
-    patterns = (
-        supabase.table("learning_patterns")
-        .select("*")
-        .eq("is_active", True)
-        .gte("confidence_score", 0.4)
-        .order("confidence_score", desc=True)
-        .order("success_rate", desc=True)
-        .limit(15)
-        .execute()
-    )
+    patterns = active_patterns(supabase, order=("confidence_score", "success_rate"), min_confidence=0.4, limit=15)
 
     # Get recent call performance
-    recent_calls = (
-        supabase.table("calls")
-        .select("outcome, transcript")
-        .eq("agent_version", current_version_num)
-        .order("created_at", desc=True)
-        .limit(20)
-        .execute()
-    )
+    recent_calls = fetch_recent_calls(supabase, "outcome, transcript", 20, agent_version=current_version_num)
 
     # Build comprehensive optimization prompt
-    success_patterns = [p for p in (patterns.data or []) if p.get("pattern_type") == "success_pattern"]
-    failure_patterns = [p for p in (patterns.data or []) if p.get("pattern_type") == "failure_pattern"]
+    success_patterns = [p for p in patterns if p.get("pattern_type") == "success_pattern"]
+    failure_patterns = [p for p in patterns if p.get("pattern_type") == "failure_pattern"]
 
     optimization_prompt = f"""You are optimizing a real estate sales agent's strategy based on comprehensive data analysis.
 
@@ -87,8 +77,8 @@ HIGH-CONFIDENCE FAILURE PATTERNS ({len(failure_patterns)}):
 {chr(10).join(f"- {p.get('pattern_description')} (confidence: {p.get('confidence_score', 0):.2f})" for p in failure_patterns[:10])}
 
 RECENT CALL OUTCOMES:
-- Successful: {sum(1 for c in (recent_calls.data or []) if c.get('outcome') == 'booked')}
-- Failed: {sum(1 for c in (recent_calls.data or []) if c.get('outcome') == 'not_booked')}
+- Successful: {sum(1 for c in recent_calls if c.get('outcome') == 'booked')}
+- Failed: {sum(1 for c in recent_calls if c.get('outcome') == 'not_booked')}
 
 Analyze this data and create an IMPROVED strategy. Make specific, actionable changes to:
 1. Opening (greeting, intro)
@@ -133,22 +123,24 @@ Return JSON with the complete new strategy:
 Make changes based on what actually worked in successful calls and what failed in unsuccessful calls.
 Be specific and actionable. Keep what works, improve what doesn't."""
 
-    response = openai_client.chat.completions.create(
-        model=model_name,
-        messages=[
+    request = {
+        "model": model_name,
+        "messages": [
             {
                 "role": "system",
                 "content": "You optimize sales strategies based on real data. Return complete JSON only.",
             },
             {"role": "user", "content": optimization_prompt},
         ],
-        response_format={"type": "json_object"},
-        temperature=0.8,
-        max_tokens=4000,
-    )
+        "temperature": 0.8,
+        "max_tokens": 4000,
+    }
+    return current, request
 
-    content = response.choices[0].message.content or "{}"
-    improved_strategy = json.loads(content)
+
+def apply_optimized_strategy(supabase: Client, current: Dict[str, Any], improved_strategy: Dict[str, Any]) -> Dict[str, Any]:
+    """Store the optimizer's output as the new active version and snapshot its prompt."""
+    current_version_num = current.get("version", "v1.0")
 
     # Extract the strategy_json (everything except version, description, changes_made, reasoning)
     strategy_json = {
@@ -163,27 +155,24 @@ Be specific and actionable. Keep what works, improve what doesn't."""
 
     new_version = improved_strategy.get("version", increment_version(current_version_num))
 
-    # Deactivate current version
-    supabase.table("agent_versions").update({"is_active": False}).eq("version", current_version_num).execute()
-
-    # Create new version
-    insert_result = (
-        supabase.table("agent_versions")
-        .insert(
-            {
-                "version": new_version,
-                "strategy_json": strategy_json,
-                "is_active": True,
-                "total_calls": 0,
-                "total_bookings": 0,
-                "conversion_rate": 0.0,
-            }
-        )
-        .execute()
+    # Create new version (fenced on the strategy lease), then deactivate the current one
+    inserted = insert_version(
+        supabase,
+        {
+            "version": new_version,
+            "strategy_json": strategy_json,
+            "is_active": True,
+            "total_calls": 0,
+            "total_bookings": 0,
+            "conversion_rate": 0.0,
+        },
     )
 
-    if not insert_result.data:
+    if not inserted:
         raise ValueError("Failed to create new version")
+    deactivate_version(supabase, current_version_num)
+    invalidate_active_version()
+    call_counters.version_created(new_version)
 
     # Store prompt snapshot
     from .prompt_builder import build_optimized_prompt, store_prompt_snapshot
@@ -223,28 +212,12 @@ def increment_version(version: str) -> str:
 
 def get_strategy_comparison(supabase: Client, version1: str, version2: str) -> Dict[str, Any]:
     """Compare two strategy versions."""
-    v1 = (
-        supabase.table("agent_versions")
-        .select("*")
-        .eq("version", version1)
-        .limit(1)
-        .execute()
-    )
-
-    v2 = (
-        supabase.table("agent_versions")
-        .select("*")
-        .eq("version", version2)
-        .limit(1)
-        .execute()
-    )
+    v1_data = get_version(supabase, version1)
+    v2_data = get_version(supabase, version2)
 
-    if not v1.data or not v2.data:
+    if not v1_data or not v2_data:
         raise ValueError("One or both versions not found")
 
-    v1_data = v1.data[0]
-    v2_data = v2.data[0]
-
     return {
         "version1": {
             "version": v1_data.get("version"),
@@ -0,0 +1,116 @@
+"""Synthesis store - the latest materialized learning synthesis and how stale it is."""
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from supabase import Client
+
+from .repositories import count_learnings
+
+SYNTHESIS_REFRESH_LEARNINGS = int(os.getenv("SYNTHESIS_REFRESH_LEARNINGS", "20"))
+SYNTHESIS_TTL_SECONDS = float(os.getenv("SYNTHESIS_TTL_SECONDS", "60"))
+
+
+def _timestamp(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+
+
+class SynthesisStore:
+    """
+    Caches the newest `learning_syntheses` row and the number of learnings stored since its
+    inputs were read. Learnings written by this process are counted as they happen, so the
+    refresh check costs no queries; both values are reloaded at most every `ttl_seconds`,
+    which bounds staleness from regenerations and learnings on other workers.
+    """
+
+    def __init__(
+        self, refresh_learnings: int = SYNTHESIS_REFRESH_LEARNINGS, ttl_seconds: float = SYNTHESIS_TTL_SECONDS
+    ) -> None:
+        self.refresh_learnings = max(1, refresh_learnings)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._row: Optional[Dict[str, Any]] = None
+        self._new_learnings = 0
+        self._loaded_at: Optional[float] = None
+
+    def _ensure_loaded(self, supabase: Client) -> None:
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl_seconds:
+                return
+        latest = supabase.table("learning_syntheses").select("*").order("version", desc=True).limit(1).execute()
+        row = latest.data[0] if latest.data else None
+        new_learnings = count_learnings(supabase, since=row["generated_at"] if row else None, inclusive=False)
+        with self._lock:
+            # A newer version stored by this process meanwhile wins over what was just read
+            if self._row is None or row is None or row["version"] >= self._row["version"]:
+                self._row = row
+                self._new_learnings = new_learnings
+            self._loaded_at = time.monotonic()
+
+    def latest(self, supabase: Client) -> Optional[Dict[str, Any]]:
+        self._ensure_loaded(supabase)
+        return self._row
+
+    def record_learning(self) -> None:
+        with self._lock:
+            self._new_learnings += 1
+
+    def due(self, supabase: Client) -> bool:
+        """True once `refresh_learnings` learnings arrived since the latest synthesis (or none exists)."""
+        self._ensure_loaded(supabase)
+        with self._lock:
+            if self._row is None:
+                return self._new_learnings > 0
+            return self._new_learnings >= self.refresh_learnings
+
+    def begin(self) -> Dict[str, Any]:
+        """Mark the start of a regeneration: learnings counted after this stay 'new'."""
+        with self._lock:
+            return {"generated_at": _timestamp(datetime.now(timezone.utc)), "counted": self._new_learnings}
+
+    def save(self, supabase: Client, marker: Dict[str, Any], synthesis: Dict[str, Any], model: str) -> Dict[str, Any]:
+        """Store `synthesis` as the next version, generated from inputs read at `marker`."""
+        latest = supabase.table("learning_syntheses").select("version").order("version", desc=True).limit(1).execute()
+        version = (latest.data[0]["version"] if latest.data else 0) + 1
+        result = (
+            supabase.table("learning_syntheses")
+            .insert(
+                {"version": version, "synthesis": synthesis, "model": model, "generated_at": marker["generated_at"]}
+            )
+            .execute()
+        )
+        row = result.data[0]
+        with self._lock:
+            if self._row is None or row["version"] > self._row["version"]:
+                self._row = row
+                self._new_learnings = max(0, self._new_learnings - marker["counted"])
+        return row
+
+    def status(self, supabase: Client) -> Dict[str, Any]:
+        """Version, generation time and staleness of the latest synthesis."""
+        self._ensure_loaded(supabase)
+        with self._lock:
+            row, new_learnings = self._row, self._new_learnings
+        age = None
+        if row is not None:
+            generated = datetime.fromisoformat(row["generated_at"].replace("Z", "+00:00"))
+            age = round((datetime.now(timezone.utc) - generated).total_seconds(), 1)
+        return {
+            "version": row["version"] if row else None,
+            "generated_at": row["generated_at"] if row else None,
+            "model": row.get("model") if row else None,
+            "age_seconds": age,
+            "learnings_since": new_learnings,
+            "stale": row is None or new_learnings >= self.refresh_learnings,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._row = None
+            self._new_learnings = 0
+            self._loaded_at = None
+
+
+synthesis_store = SynthesisStore()
@@ -0,0 +1,238 @@
+"""Trend engine - streaming conversion and objection aggregates behind detect_trends."""
+import os
+import threading
+from collections import Counter, OrderedDict, deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, List, Optional
+
+from supabase import Client
+
+from .repositories import iter_decided_calls, recent_calls, recent_learnings
+from .prompt_builder import invalidate_prompt
+
+TREND_CALL_WINDOW = int(os.getenv("TREND_CALL_WINDOW", "50"))
+TREND_LEARNING_WINDOW = int(os.getenv("TREND_LEARNING_WINDOW", "30"))
+TREND_VERSION_WINDOW = int(os.getenv("TREND_VERSION_WINDOW", "100"))
+TREND_DAY_WINDOW = int(os.getenv("TREND_DAY_WINDOW", "30"))
+
+DECIDED = ("booked", "not_booked")
+
+
+def _day(created_at: Optional[str]) -> str:
+    if created_at:
+        try:
+            return datetime.fromisoformat(created_at.replace("Z", "+00:00")).date().isoformat()
+        except ValueError:
+            pass
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+class _OutcomeWindow:
+    """Sliding window of the last `size` decided calls with a running booked count."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.outcomes: "OrderedDict[str, str]" = OrderedDict()
+        self.booked = 0
+
+    def set(self, call_id: str, outcome: str) -> None:
+        previous = self.outcomes.get(call_id)
+        if previous is None:
+            self.outcomes[call_id] = outcome
+            if len(self.outcomes) > self.size and self.outcomes.popitem(last=False)[1] == "booked":
+                self.booked -= 1
+        else:
+            # Outcome corrected in place (e.g. not_booked -> booked)
+            self.outcomes[call_id] = outcome
+            self.booked -= previous == "booked"
+        self.booked += outcome == "booked"
+
+    def rate(self) -> float:
+        return self.booked / len(self.outcomes) if self.outcomes else 0.0
+
+
+class TrendAggregator:
+    """
+    Maintains the aggregates `detect_trends` needs, updated in O(1) per event:
+    - the last `call_window` calls (any outcome) for recent-vs-previous conversion,
+    - objection counts over the last `learning_window` learnings,
+    - a sliding window of decided outcomes per agent version,
+    - booked/total per calendar day for the last `day_window` days.
+    Seeded from Supabase once, then fed by call, outcome and learning writes.
+    """
+
+    def __init__(
+        self,
+        call_window: int = TREND_CALL_WINDOW,
+        learning_window: int = TREND_LEARNING_WINDOW,
+        version_window: int = TREND_VERSION_WINDOW,
+        day_window: int = TREND_DAY_WINDOW,
+    ) -> None:
+        self.call_window = call_window
+        self.learning_window = learning_window
+        self.version_window = version_window
+        self.day_window = day_window
+
+        self._lock = threading.Lock()
+        self._seeded = False
+        # call_id -> outcome, newest last
+        self._recent_calls: "OrderedDict[str, str]" = OrderedDict()
+        # call_id -> [agent_version, day, outcome] for recently seen calls, so outcome changes adjust counts
+        self._call_meta: "OrderedDict[str, List[Optional[str]]]" = OrderedDict()
+        self._objections: Deque[List[str]] = deque()
+        self._objection_counter: Counter = Counter()
+        self._by_version: Dict[str, _OutcomeWindow] = {}
+        self._by_day: "OrderedDict[str, List[int]]" = OrderedDict()
+
+    def ensure_seeded(self, supabase: Client) -> None:
+        if self._seeded:
+            return
+        calls = recent_calls(supabase, "id, outcome, agent_version, created_at", self.call_window)
+        learnings = recent_learnings(supabase, "objection_types, outcome", self.learning_window)
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=self.day_window)).isoformat()
+        decided_calls = list(iter_decided_calls(supabase, "id, outcome, agent_version, created_at", since=cutoff))
+
+        with self._lock:
+            if self._seeded:
+                return
+            for call in decided_calls:
+                self._set_outcome(call["id"], call.get("agent_version"), _day(call.get("created_at")), call["outcome"])
+            for call in reversed(calls):
+                self._push_recent(call["id"], call.get("outcome") or "pending")
+                if call["id"] not in self._call_meta:
+                    self._remember(call["id"], call.get("agent_version"), _day(call.get("created_at")), call.get("outcome"))
+            for learning in reversed(learnings):
+                self._push_objections(learning.get("objection_types") or [])
+            self._seeded = True
+
+    def _push_recent(self, call_id: str, outcome: str) -> None:
+        self._recent_calls[call_id] = outcome
+        self._recent_calls.move_to_end(call_id)
+        while len(self._recent_calls) > self.call_window:
+            self._recent_calls.popitem(last=False)
+
+    def _remember(self, call_id: str, version: Optional[str], day: str, outcome: Optional[str]) -> None:
+        self._call_meta[call_id] = [version, day, outcome]
+        self._call_meta.move_to_end(call_id)
+        while len(self._call_meta) > max(10 * self.call_window, self.version_window):
+            self._call_meta.popitem(last=False)
+
+    def _push_objections(self, objections: List[str]) -> None:
+        if len(self._objections) == self.learning_window:
+            self._objection_counter.subtract(self._objections.popleft())
+        self._objections.append(list(objections))
+        self._objection_counter.update(objections)
+
+    def _set_outcome(
+        self, call_id: str, version: Optional[str], day: str, outcome: str, previous: Optional[str] = None
+    ) -> None:
+        """Count a decided outcome, undoing the call's previous decided outcome if any."""
+        meta = self._call_meta.get(call_id)
+        if meta:
+            previous = meta[2]
+        if previous in DECIDED:
+            bucket = self._by_day.get(day)
+            if bucket is not None:
+                bucket[1] -= 1
+                bucket[0] -= previous == "booked"
+        self._remember(call_id, version, day, outcome)
+
+        if version:
+            window = self._by_version.get(version)
+            if window is None:
+                window = self._by_version[version] = _OutcomeWindow(self.version_window)
+            window.set(call_id, outcome)
+        bucket = self._by_day.get(day)
+        if bucket is None:
+            bucket = self._by_day[day] = [0, 0]
+            # Days arrive roughly in order; keep only the newest `day_window`
+            while len(self._by_day) > self.day_window:
+                self._by_day.pop(min(self._by_day))
+        bucket[1] += 1
+        bucket[0] += outcome == "booked"
+
+    def record_call(self, call_id: str, version: Optional[str], created_at: Optional[str] = None) -> None:
+        """A call was ingested (outcome still pending)."""
+        with self._lock:
+            if not self._seeded:
+                return
+            self._push_recent(call_id, "pending")
+            self._remember(call_id, version, _day(created_at), "pending")
+        # The recent-calls window feeds the prompt's trend line
+        invalidate_prompt()
+
+    def remembers(self, call_id: str) -> bool:
+        """Whether the call's previous outcome is known here (if not, pass it to `record_outcome`)."""
+        with self._lock:
+            return not self._seeded or call_id in self._call_meta
+
+    def record_outcome(
+        self,
+        call_id: str,
+        outcome: str,
+        version: Optional[str] = None,
+        created_at: Optional[str] = None,
+        previous_outcome: Optional[str] = None,
+    ) -> None:
+        """
+        A call's outcome was set. `previous_outcome` (read from the row before the write) is
+        only used for calls evicted from memory, so a correction replaces their counted outcome.
+        """
+        with self._lock:
+            if not self._seeded:
+                return
+            if call_id in self._recent_calls:
+                self._recent_calls[call_id] = outcome
+            if outcome in DECIDED:
+                meta = self._call_meta.get(call_id)
+                known_version, day = (meta[0], meta[1]) if meta else (version, _day(created_at))
+                self._set_outcome(call_id, known_version or version, day, outcome, previous_outcome)
+
+    def record_learning(self, objection_types: List[str]) -> None:
+        with self._lock:
+            if self._seeded:
+                self._push_objections(objection_types or [])
+
+    def detect(self, supabase: Client) -> Dict[str, Any]:
+        self.ensure_seeded(supabase)
+        with self._lock:
+            outcomes = list(reversed(self._recent_calls.values()))  # newest first
+            top_objections = [obj for obj, count in self._objection_counter.most_common() if count > 0][:5]
+            by_version = {version: window.rate() for version, window in self._by_version.items()}
+            by_day = {day: bucket[0] / bucket[1] for day, bucket in sorted(self._by_day.items()) if bucket[1]}
+
+        if len(outcomes) < 10:
+            return {"trend": "insufficient_data", "message": "Need at least 10 calls to detect trends"}
+
+        # Calculate recent conversion rate
+        recent_outcomes = outcomes[:20]
+        recent_conversion = sum(1 for o in recent_outcomes if o == "booked") / len(recent_outcomes)
+
+        # Compare to older calls
+        older_outcomes = outcomes[20:40]
+        older_conversion = sum(1 for o in older_outcomes if o == "booked") / len(older_outcomes) if older_outcomes else 0
+
+        trend_direction = "improving" if recent_conversion > older_conversion else "declining" if recent_conversion < older_conversion else "stable"
+
+        return {
+            "trend": trend_direction,
+            "recent_conversion_rate": recent_conversion,
+            "previous_conversion_rate": older_conversion,
+            "top_objections": top_objections,
+            "total_calls_analyzed": len(outcomes),
+            "conversion_by_version": by_version,
+            "conversion_by_day": by_day,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._seeded = False
+            self._recent_calls.clear()
+            self._call_meta.clear()
+            self._objections.clear()
+            self._objection_counter.clear()
+            self._by_version.clear()
+            self._by_day.clear()
+
+
+trend_aggregator = TrendAggregator()
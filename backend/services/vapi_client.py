@@ -0,0 +1,185 @@
+"""Vapi client - one pooled connection to the Vapi API and debounced assistant prompt updates."""
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from . import metrics
+
+VAPI_BASE_URL = "https://api.vapi.ai"
+
+
+def assistant_payload(system_prompt: str) -> Dict[str, Any]:
+    return {
+        "model": {
+            "provider": "openai",
+            "model": "gpt-4",
+            "messages": [{"role": "system", "content": system_prompt}],
+        }
+    }
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class VapiAssistantUpdater:
+    """
+    Pushes strategy prompts to the Vapi assistant over a long-lived pooled client.
+    `submit()` only records the latest version; a background task waits until no newer
+    version has arrived for `debounce_seconds` and then PATCHes that one, so a burst of
+    mutations results in a single push. Failed pushes are retried with exponential backoff
+    unless a newer version supersedes them.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        assistant_id: Optional[str],
+        debounce_seconds: float = 2.0,
+        max_attempts: int = 5,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        http2: bool = False,
+        timeout: float = 30.0,
+        base_url: str = VAPI_BASE_URL,
+    ) -> None:
+        self.api_key = api_key
+        self.assistant_id = assistant_id
+        self.debounce_seconds = debounce_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.http2 = http2
+        self.timeout = timeout
+        self.base_url = base_url
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Optional[Tuple[str, str]] = None
+        self._deadline = 0.0
+        self._status: Dict[str, Any] = {
+            "last_pushed_version": None,
+            "last_pushed_at": None,
+            "last_error": None,
+            "last_error_at": None,
+            "pushes": 0,
+            "failures": 0,
+            "coalesced": 0,
+        }
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key and self.assistant_id)
+
+    def _make_client(self) -> httpx.AsyncClient:
+        http2 = self.http2 and _http2_available()
+        if self.http2 and not http2:
+            print("⚠️ VAPI_HTTP2 is set but the h2 package is missing (pip install 'httpx[http2]'); using HTTP/1.1")
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=http2,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=4, max_keepalive_connections=2),
+            headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+        )
+
+    async def start(self) -> None:
+        if self.configured and self._client is None:
+            self._client = self._make_client()
+
+    async def stop(self) -> None:
+        """Stop the debounce task, push any still-pending prompt once, and close the pool."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._pending is not None:
+            version, prompt = self._pending
+            self._pending = None
+            try:
+                await self._patch(version, prompt)
+            except Exception as e:
+                self._record_failure(e)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def submit(self, version: str, system_prompt: str) -> None:
+        """Schedule `version`'s prompt to be pushed, replacing any not-yet-pushed version."""
+        if not self.configured:
+            raise RuntimeError("Missing VAPI_API_KEY or VAPI_ASSISTANT_ID/assistant_id")
+        if self._pending is not None:
+            self._status["coalesced"] += 1
+        self._pending = (version, system_prompt)
+        self._deadline = time.monotonic() + self.debounce_seconds
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while self._pending is not None:
+            # Debounce: keep waiting while newer versions keep arriving
+            delay = self._deadline - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            version, prompt = self._pending
+            self._pending = None
+            await self._push_with_retry(version, prompt)
+
+    async def _push_with_retry(self, version: str, prompt: str) -> None:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self._patch(version, prompt)
+                return
+            except httpx.HTTPStatusError as e:
+                self._record_failure(e)
+                status = e.response.status_code
+                if status < 500 and status != 429:
+                    return
+            except Exception as e:
+                # Transport errors and anything unexpected are retried like a 5xx
+                self._record_failure(e)
+            if attempt == self.max_attempts or self._pending is not None:
+                # Out of attempts, or a newer version supersedes this one
+                return
+            delay = min(self.max_backoff, self.base_backoff * (2 ** (attempt - 1)))
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+    async def _patch(self, version: str, prompt: str) -> None:
+        if self._client is None:
+            self._client = self._make_client()
+        started = time.perf_counter()
+        status = "error"
+        try:
+            res = await self._client.patch(f"/assistant/{self.assistant_id}", json=assistant_payload(prompt))
+            status = str(res.status_code)
+            res.raise_for_status()
+        finally:
+            metrics.vapi_request_seconds.observe(time.perf_counter() - started, status=status)
+        self._status["last_pushed_version"] = version
+        self._status["last_pushed_at"] = datetime.now(timezone.utc).isoformat()
+        self._status["pushes"] += 1
+        print(f"📡 Pushed strategy {version} to Vapi assistant")
+
+    def _record_failure(self, error: Exception) -> None:
+        self._status["failures"] += 1
+        self._status["last_error"] = f"{type(error).__name__}: {error}"
+        self._status["last_error_at"] = datetime.now(timezone.utc).isoformat()
+        print(f"⚠️ Vapi assistant update failed: {error}")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "configured": self.configured,
+            "http2": bool(self._client is not None and self.http2 and _http2_available()),
+            "pending_version": self._pending[0] if self._pending else None,
+            "debounce_seconds": self.debounce_seconds,
+            **self._status,
+        }
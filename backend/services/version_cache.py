@@ -0,0 +1,65 @@
+"""Active agent version cache - one shared copy of the current strategy row per process."""
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from supabase import Client
+
+from .repositories import fetch_active_version
+
+ACTIVE_VERSION_TTL_SECONDS = float(os.getenv("ACTIVE_VERSION_TTL_SECONDS", "30"))
+
+
+class ActiveVersionCache:
+    """
+    Caches the `agent_versions` row with `is_active = true`.
+    Writers that insert, deactivate or change the stats of a version call `invalidate()`;
+    the TTL only bounds staleness from writes made by other processes.
+    """
+
+    def __init__(self, ttl_seconds: float = ACTIVE_VERSION_TTL_SECONDS) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._row: Optional[Dict[str, Any]] = None
+        self._loaded_at: Optional[float] = None
+        self._generation = 0
+
+    def get(self, supabase: Client) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl_seconds:
+                return self._row
+            generation = self._generation
+
+        row = fetch_active_version(supabase)
+
+        with self._lock:
+            # Don't cache a read that raced with an invalidation
+            if generation == self._generation:
+                self._row = row
+                self._loaded_at = time.monotonic()
+        return row
+
+    @property
+    def generation(self) -> int:
+        """Bumped by every `invalidate`; lets derived caches (the built prompt) notice writes."""
+        return self._generation
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._row = None
+            self._loaded_at = None
+
+
+active_version_cache = ActiveVersionCache()
+
+
+def get_active_version(supabase: Client) -> Optional[Dict[str, Any]]:
+    """Get the active agent version, from cache when fresh."""
+    return active_version_cache.get(supabase)
+
+
+def invalidate_active_version() -> None:
+    """Drop the cached active version; call after any write to agent_versions or call outcomes."""
+    active_version_cache.invalidate()
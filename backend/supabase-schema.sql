@@ -11,6 +11,7 @@ CREATE TABLE IF NOT EXISTS agent_versions (
   total_bookings INTEGER DEFAULT 0,
   conversion_rate FLOAT DEFAULT 0.0,
   is_active BOOLEAN DEFAULT true,
+  lease_holder TEXT,
   created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
   updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
@@ -33,55 +34,161 @@ CREATE TABLE IF NOT EXISTS calls (
 -- Index for faster queries
 CREATE INDEX IF NOT EXISTS idx_calls_agent_version ON calls(agent_version);
 CREATE INDEX IF NOT EXISTS idx_calls_outcome ON calls(outcome);
-CREATE INDEX IF NOT EXISTS idx_calls_created_at ON calls(created_at DESC);
+-- Keyset pagination of calls orders by (created_at, id); this index serves both directions
+DROP INDEX IF EXISTS idx_calls_created_at;
+CREATE INDEX IF NOT EXISTS idx_calls_created_at_id ON calls(created_at DESC, id DESC);
 CREATE INDEX IF NOT EXISTS idx_agent_versions_active ON agent_versions(is_active);
 
--- Function to update agent_versions stats after each call
+-- Table: agent_stats
+-- Single row of totals across all versions, maintained by the triggers below,
+-- so the overall dashboard stats are one primary-key read
+CREATE TABLE IF NOT EXISTS agent_stats (
+  id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+  total_calls INTEGER NOT NULL DEFAULT 0,
+  total_bookings INTEGER NOT NULL DEFAULT 0,
+  versions_created INTEGER NOT NULL DEFAULT 0,
+  current_version TEXT,
+  updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Created from the per-version totals the first time this schema runs
+INSERT INTO agent_stats (id, total_calls, total_bookings, versions_created, current_version)
+SELECT
+  1,
+  COALESCE(SUM(total_calls), 0),
+  COALESCE(SUM(total_bookings), 0),
+  COUNT(*),
+  (SELECT version FROM agent_versions WHERE is_active ORDER BY created_at DESC LIMIT 1)
+FROM agent_versions
+ON CONFLICT (id) DO NOTHING;
+
+-- Adds a delta to one version's totals and to the global totals
+CREATE OR REPLACE FUNCTION apply_agent_stats_delta(p_version TEXT, p_calls INTEGER, p_bookings INTEGER)
+RETURNS VOID AS $$
+BEGIN
+  IF p_calls = 0 AND p_bookings = 0 THEN
+    RETURN;
+  END IF;
+  UPDATE agent_versions
+  SET
+    total_calls = COALESCE(total_calls, 0) + p_calls,
+    total_bookings = COALESCE(total_bookings, 0) + p_bookings,
+    conversion_rate = CASE
+      WHEN COALESCE(total_calls, 0) + p_calls > 0
+      THEN CAST(COALESCE(total_bookings, 0) + p_bookings AS FLOAT) / (COALESCE(total_calls, 0) + p_calls)
+      ELSE 0
+    END,
+    updated_at = NOW()
+  WHERE version = p_version;
+  UPDATE agent_stats
+  SET
+    total_calls = total_calls + p_calls,
+    total_bookings = total_bookings + p_bookings,
+    updated_at = NOW()
+  WHERE id = 1;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to update agent_versions stats after each call.
+-- Only the changed row is counted: a call adds 1 to its version's total once it has a
+-- booked/not_booked outcome (and 1 to bookings when booked); an outcome change, version
+-- change or delete moves those counts, so every write is O(1) instead of re-counting calls.
 CREATE OR REPLACE FUNCTION update_agent_version_stats()
 RETURNS TRIGGER AS $$
+DECLARE
+  old_calls INTEGER := 0;
+  old_bookings INTEGER := 0;
+  new_calls INTEGER := 0;
+  new_bookings INTEGER := 0;
 BEGIN
-  -- Only update if outcome is set
-  IF NEW.outcome IS NOT NULL AND NEW.outcome != 'pending' THEN
-    UPDATE agent_versions
-    SET 
-      total_calls = (
-        SELECT COUNT(*) 
-        FROM calls 
-        WHERE agent_version = NEW.agent_version 
-        AND outcome != 'pending'
-      ),
-      total_bookings = (
-        SELECT COUNT(*) 
-        FROM calls 
-        WHERE agent_version = NEW.agent_version 
-        AND outcome = 'booked'
-      ),
-      conversion_rate = (
-        SELECT 
-          CASE 
-            WHEN COUNT(*) > 0 
-            THEN CAST(SUM(CASE WHEN outcome = 'booked' THEN 1 ELSE 0 END) AS FLOAT) / COUNT(*)
-            ELSE 0
-          END
-        FROM calls 
-        WHERE agent_version = NEW.agent_version 
-        AND outcome != 'pending'
-      ),
-      updated_at = NOW()
-    WHERE version = NEW.agent_version;
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    IF OLD.outcome IN ('booked', 'not_booked') THEN
+      old_calls := 1;
+      old_bookings := CASE WHEN OLD.outcome = 'booked' THEN 1 ELSE 0 END;
+    END IF;
   END IF;
-  
-  RETURN NEW;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    IF NEW.outcome IN ('booked', 'not_booked') THEN
+      new_calls := 1;
+      new_bookings := CASE WHEN NEW.outcome = 'booked' THEN 1 ELSE 0 END;
+    END IF;
+  END IF;
+
+  IF TG_OP = 'UPDATE' AND OLD.agent_version IS NOT DISTINCT FROM NEW.agent_version THEN
+    PERFORM apply_agent_stats_delta(NEW.agent_version, new_calls - old_calls, new_bookings - old_bookings);
+  ELSE
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+      PERFORM apply_agent_stats_delta(OLD.agent_version, -old_calls, -old_bookings);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+      PERFORM apply_agent_stats_delta(NEW.agent_version, new_calls, new_bookings);
+    END IF;
+  END IF;
+
+  RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
 -- Trigger to auto-update stats
 DROP TRIGGER IF EXISTS trigger_update_agent_stats ON calls;
 CREATE TRIGGER trigger_update_agent_stats
-  AFTER INSERT OR UPDATE OF outcome ON calls
+  AFTER INSERT OR DELETE OR UPDATE OF outcome, agent_version ON calls
   FOR EACH ROW
   EXECUTE FUNCTION update_agent_version_stats();
 
+-- Keeps the version count and the current (latest active) version in agent_stats
+CREATE OR REPLACE FUNCTION update_agent_stats_versions()
+RETURNS TRIGGER AS $$
+BEGIN
+  UPDATE agent_stats
+  SET
+    versions_created = versions_created + CASE TG_OP WHEN 'INSERT' THEN 1 WHEN 'DELETE' THEN -1 ELSE 0 END,
+    current_version = (SELECT version FROM agent_versions WHERE is_active ORDER BY created_at DESC LIMIT 1),
+    updated_at = NOW()
+  WHERE id = 1;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_update_agent_stats_versions ON agent_versions;
+CREATE TRIGGER trigger_update_agent_stats_versions
+  AFTER INSERT OR DELETE OR UPDATE OF is_active ON agent_versions
+  FOR EACH ROW
+  EXECUTE FUNCTION update_agent_stats_versions();
+
+-- Recounts every version's totals and the global row from calls. The triggers keep them
+-- exact; run this only after writing to calls with triggers disabled (e.g. a bulk COPY):
+--   SELECT rebuild_agent_stats();
+CREATE OR REPLACE FUNCTION rebuild_agent_stats()
+RETURNS VOID AS $$
+BEGIN
+  UPDATE agent_versions av
+  SET
+    total_calls = COALESCE(c.calls, 0),
+    total_bookings = COALESCE(c.bookings, 0),
+    conversion_rate = CASE WHEN COALESCE(c.calls, 0) > 0 THEN CAST(c.bookings AS FLOAT) / c.calls ELSE 0 END,
+    updated_at = NOW()
+  FROM (
+    SELECT
+      v.version,
+      COUNT(calls.id) FILTER (WHERE calls.outcome IN ('booked', 'not_booked')) AS calls,
+      COUNT(calls.id) FILTER (WHERE calls.outcome = 'booked') AS bookings
+    FROM agent_versions v
+    LEFT JOIN calls ON calls.agent_version = v.version
+    GROUP BY v.version
+  ) c
+  WHERE av.version = c.version;
+  UPDATE agent_stats
+  SET
+    total_calls = (SELECT COUNT(*) FROM calls WHERE outcome IN ('booked', 'not_booked')),
+    total_bookings = (SELECT COUNT(*) FROM calls WHERE outcome = 'booked'),
+    versions_created = (SELECT COUNT(*) FROM agent_versions),
+    current_version = (SELECT version FROM agent_versions WHERE is_active ORDER BY created_at DESC LIMIT 1),
+    updated_at = NOW()
+  WHERE id = 1;
+END;
+$$ LANGUAGE plpgsql;
+
 -- Insert baseline v1.0 strategy
 INSERT INTO agent_versions (version, strategy_json, is_active) 
 VALUES (
@@ -166,10 +273,59 @@ CREATE TABLE IF NOT EXISTS prompt_evolution (
 -- Index for faster queries
 CREATE INDEX IF NOT EXISTS idx_call_learnings_call_id ON call_learnings(call_id);
 CREATE INDEX IF NOT EXISTS idx_call_learnings_outcome ON call_learnings(outcome);
+-- The learning statistics scan pages call_learnings by (created_at, id)
+DROP INDEX IF EXISTS idx_call_learnings_created_at;
+CREATE INDEX IF NOT EXISTS idx_call_learnings_created_at_id ON call_learnings(created_at, id);
 CREATE INDEX IF NOT EXISTS idx_learning_patterns_type ON learning_patterns(pattern_type);
 CREATE INDEX IF NOT EXISTS idx_learning_patterns_active ON learning_patterns(is_active);
 CREATE INDEX IF NOT EXISTS idx_prompt_evolution_version ON prompt_evolution(version);
 
+-- Table: strategy_leases
+-- At most one worker mutates or optimizes the strategy at a time; expired leases can be taken over
+CREATE TABLE IF NOT EXISTS strategy_leases (
+  name TEXT PRIMARY KEY,
+  holder TEXT NOT NULL,
+  expires_at TIMESTAMPTZ NOT NULL,
+  acquired_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- A version written under a strategy lease carries the holder; the insert fails unless that
+-- lease is still held, so a worker whose lease was taken over cannot create a version.
+-- FOR SHARE makes a concurrent takeover wait until the insert has committed.
+ALTER TABLE agent_versions ADD COLUMN IF NOT EXISTS lease_holder TEXT;
+
+CREATE OR REPLACE FUNCTION fence_agent_version_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF NEW.lease_holder IS NOT NULL THEN
+    PERFORM 1 FROM strategy_leases
+    WHERE holder = NEW.lease_holder AND expires_at > NOW()
+    FOR SHARE;
+    IF NOT FOUND THEN
+      RAISE EXCEPTION 'strategy lease not held';
+    END IF;
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_fence_agent_version_insert ON agent_versions;
+CREATE TRIGGER trigger_fence_agent_version_insert
+  BEFORE INSERT ON agent_versions
+  FOR EACH ROW
+  EXECUTE FUNCTION fence_agent_version_insert();
+
+-- Table: learning_syntheses
+-- Materialized synthesis of all learnings; a new version is stored each time it is regenerated
+CREATE TABLE IF NOT EXISTS learning_syntheses (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  version INTEGER NOT NULL UNIQUE,
+  synthesis JSONB NOT NULL,
+  model TEXT,
+  generated_at TIMESTAMPTZ NOT NULL, -- when its inputs were read; later learnings make it stale
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
 -- Create a view for easy dashboard queries
 CREATE OR REPLACE VIEW dashboard_stats AS
 SELECT 
@@ -15,20 +15,24 @@ interface AgentVersion {
   conversion_rate: number;
   is_active: boolean;
   created_at: string;
-  strategy_json: any;
+  description: string | null;
 }
 
 interface Call {
   id: string;
   vapi_call_id: string;
   agent_version: string;
-  transcript: string;
   outcome: string;
   duration_seconds: number;
-  analysis_json: any;
   created_at: string;
 }
 
+// Transcripts, analyses and strategy bodies are fetched on demand, not with the lists
+interface CallDetail extends Call {
+  transcript: string;
+  analysis_json: any;
+}
+
 interface OverallStats {
   total_calls: number;
   total_bookings: number;
@@ -41,6 +45,8 @@ const Dashboard = () => {
   const [overallStats, setOverallStats] = useState<OverallStats | null>(null);
   const [versions, setVersions] = useState<AgentVersion[]>([]);
   const [recentCalls, setRecentCalls] = useState<Call[]>([]);
+  const [strategies, setStrategies] = useState<Record<string, any>>({});
+  const [callDetails, setCallDetails] = useState<Record<string, CallDetail>>({});
   const [loading, setLoading] = useState(true);
   const [mutating, setMutating] = useState(false);
 
@@ -68,6 +74,28 @@ const Dashboard = () => {
     }
   };
 
+  const loadStrategy = async (version: string) => {
+    if (strategies[version]) return;
+    try {
+      const res = await fetch(`${API_BASE}/api/stats/versions/${encodeURIComponent(version)}`);
+      const data = await res.json();
+      setStrategies((prev) => ({ ...prev, [version]: data.strategy_json }));
+    } catch (error) {
+      console.error('Error fetching strategy:', error);
+    }
+  };
+
+  const loadCall = async (id: string) => {
+    if (callDetails[id]) return;
+    try {
+      const res = await fetch(`${API_BASE}/api/calls/${encodeURIComponent(id)}`);
+      const data = await res.json();
+      setCallDetails((prev) => ({ ...prev, [id]: data }));
+    } catch (error) {
+      console.error('Error fetching call:', error);
+    }
+  };
+
   const triggerMutation = async () => {
     try {
       setMutating(true);
@@ -88,8 +116,47 @@ const Dashboard = () => {
 
   useEffect(() => {
     fetchData();
-    const interval = setInterval(fetchData, 10000); // Refresh every 10s
-    return () => clearInterval(interval);
+
+    // Pushed deltas instead of polling; the browser reconnects and resumes on its own
+    const events = new EventSource(`${API_BASE}/api/events`);
+    const applyTotals = (data: any) => {
+      if (data.stats) setOverallStats(data.stats);
+      const row: AgentVersion | undefined = data.version_stats;
+      if (row) {
+        setVersions((prev) =>
+          prev.some((v) => v.version === row.version)
+            ? prev.map((v) => (v.version === row.version ? row : v))
+            : [row, ...prev]
+        );
+      }
+    };
+    const setOutcome = (e: MessageEvent) => {
+      const data = JSON.parse(e.data);
+      applyTotals(data);
+      setRecentCalls((prev) => prev.map((c) => (c.id === data.call_id ? { ...c, outcome: data.outcome } : c)));
+      setCallDetails((prev) => {
+        const { [data.call_id]: _stale, ...rest } = prev;
+        return rest;
+      });
+    };
+    events.addEventListener('call_ingested', (e) => {
+      const data = JSON.parse((e as MessageEvent).data);
+      applyTotals(data);
+      setRecentCalls((prev) => [data.call, ...prev.filter((c) => c.id !== data.call.id)].slice(0, 10));
+    });
+    events.addEventListener('analysis_stored', (e) => setOutcome(e as MessageEvent));
+    events.addEventListener('outcome_updated', (e) => setOutcome(e as MessageEvent));
+    events.addEventListener('version_created', (e) => {
+      const data = JSON.parse((e as MessageEvent).data);
+      if (!data.version_stats) return fetchData();
+      setOverallStats(data.stats);
+      setVersions((prev) => [
+        data.version_stats,
+        ...prev.filter((v) => v.version !== data.version).map((v) => ({ ...v, is_active: false })),
+      ]);
+    });
+    events.addEventListener('resync', () => fetchData());
+    return () => events.close();
   }, []);
 
   if (loading) {
@@ -195,7 +262,7 @@ const Dashboard = () => {
                     </div>
                   </div>
                   <CardDescription>
-                    {version.strategy_json?.description || 'No description'}
+                    {version.description || 'No description'}
                   </CardDescription>
                 </CardHeader>
                 <CardContent>
@@ -217,12 +284,15 @@ const Dashboard = () => {
                   </div>
                   
                   {/* Show strategy preview */}
-                  <details className="mt-4">
+                  <details
+                    className="mt-4"
+                    onToggle={(e) => (e.currentTarget as HTMLDetailsElement).open && loadStrategy(version.version)}
+                  >
                     <summary className="cursor-pointer text-sm font-medium text-primary">
                       View Strategy Details
                     </summary>
                     <pre className="mt-2 p-4 bg-muted rounded-lg text-xs overflow-x-auto">
-                      {JSON.stringify(version.strategy_json, null, 2)}
+                      {strategies[version.version] ? JSON.stringify(strategies[version.version], null, 2) : 'Loading...'}
                     </pre>
                   </details>
                 </CardContent>
@@ -253,36 +323,26 @@ const Dashboard = () => {
                     </CardDescription>
                   </CardHeader>
                   <CardContent>
-                    {call.analysis_json && (
-                      <div className="space-y-2 mb-4">
-                        <div className="flex items-center gap-2">
-                          <span className="text-sm font-medium">Engagement:</span>
-                          <span className="text-sm">{call.analysis_json.engagement_score}/10</span>
-                        </div>
-                        <div className="flex items-center gap-2">
-                          <span className="text-sm font-medium">Tone:</span>
-                          <span className="text-sm">{call.analysis_json.emotional_tone}</span>
-                        </div>
-                        {call.analysis_json.objections?.length > 0 && (
-                          <div>
-                            <span className="text-sm font-medium">Objections:</span>
-                            <div className="flex gap-2 mt-1">
-                              {call.analysis_json.objections.map((obj: string, i: number) => (
-                                <Badge key={i} variant="outline">{obj}</Badge>
-                              ))}
-                            </div>
-                          </div>
-                        )}
-                      </div>
-                    )}
-                    
-                    <details className="mt-4">
+                    <details
+                      onToggle={(e) => (e.currentTarget as HTMLDetailsElement).open && loadCall(call.id)}
+                    >
                       <summary className="cursor-pointer text-sm font-medium text-primary">
-                        View Transcript
+                        View Analysis &amp; Transcript
                       </summary>
-                      <div className="mt-2 p-4 bg-muted rounded-lg text-sm whitespace-pre-wrap">
-                        {call.transcript || 'No transcript available'}
-                      </div>
+                      {callDetails[call.id] ? (
+                        <>
+                          {callDetails[call.id].analysis_json && (
+                            <pre className="mt-2 p-4 bg-muted rounded-lg text-xs overflow-x-auto">
+                              {JSON.stringify(callDetails[call.id].analysis_json, null, 2)}
+                            </pre>
+                          )}
+                          <div className="mt-2 p-4 bg-muted rounded-lg text-sm whitespace-pre-wrap">
+                            {callDetails[call.id].transcript || 'No transcript available'}
+                          </div>
+                        </>
+                      ) : (
+                        <div className="mt-2 text-sm text-muted-foreground">Loading...</div>
+                      )}
                     </details>
                   </CardContent>
                 </Card>